@@ -0,0 +1,19 @@
+"""ASGI entry point, alongside the WSGI run.py.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+PULSEPAL_INFERENCE_WORKERS and PULSEPAL_INFERENCE_QUEUE size the inference pool;
+PULSEPAL_INFERENCE_EXECUTOR=process runs it as workers forked after the model
+loads, so they share one copy of it. PULSEPAL_WSGI_THREADS (default 32) sizes
+the thread pool that runs every other route through Flask; keep
+PULSEPAL_CHAT_MAX_WAITERS (held /api/chat/sync long-polls, default 16) below it.
+"""
+from healthapp import create_app
+from healthapp.asgi import create_asgi_app
+
+flask_app = create_app()
+app = create_asgi_app(flask_app)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,113 @@
+"""Appointment queries on a large history: indexed keyset pages and calendars versus OFFSET and table scans.
+
+Run from the backend directory:
+
+    python benchmarks/appointments_bench.py [--rows 1000000] [--doctors 20] [--patients 50000]
+
+Fills a temporary SQLite database with up to `--rows` appointments (a doctor's
+slot is never booked twice, so colliding draws are dropped) spread over ten
+years, then times (median of 20 runs each):
+
+  doctor_week          appointments.doctor_week: one doctor's calendar week
+  doctor_week_scan     the same query with the indexes disabled (NOT INDEXED)
+  conflict_check       appointments.find_conflict for one slot
+  keyset_page_first    first page of a doctor's list (list_appointments)
+  keyset_page_deep     a page 90% of the way through that doctor's history
+  offset_page_deep     the same deep page fetched with LIMIT/OFFSET
+
+Prints one JSON document with latencies in milliseconds.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from healthapp import db
+from healthapp import appointments
+from healthapp.models import Appointment, ensure_indexes
+
+from bench_common import insert_rows, insert_users, timed
+
+EPOCH = datetime(2016, 1, 4)
+
+
+def fill(path, rows, doctors, patients, seed=0):
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    insert_users(connection, doctors, patients)
+    slots = 10 * 365 * 16  # ten years of 30-minute slots, 8 hours a day
+
+    def appointment(i):
+        slot = rng.randrange(slots)
+        start = EPOCH + timedelta(days=slot // 16, minutes=8 * 60 + 30 * (slot % 16))
+        return (i, rng.randint(doctors + 1, doctors + patients), rng.randint(1, doctors),
+                start.isoformat(sep=' '), rng.choice(('scheduled', 'completed', 'completed', 'cancelled')))
+    insert_rows(connection, 'INSERT OR IGNORE INTO appointment (id, patient_id, doctor_id, appointment_date, status) '
+                            'VALUES (?, ?, ?, ?, ?)', (appointment(i) for i in range(1, rows + 1)))
+    connection.commit()
+    count = connection.execute('SELECT count(*) FROM appointment').fetchone()[0]
+    connection.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--patients', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'appointments.sqlite3')
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.engine.dispose()
+            started = time.perf_counter()
+            rows = fill(path, args.rows, args.doctors, args.patients)
+            fill_seconds = time.perf_counter() - started
+            ensure_indexes(db.engine)
+
+            doctor = 1
+            total = db.session.execute(text('SELECT count(*) FROM appointment WHERE doctor_id = :d'), {'d': doctor}).scalar()
+            deep_offset = int(total * 0.9)
+            deep_date, deep_id = db.session.execute(text(
+                'SELECT appointment_date, id FROM appointment WHERE doctor_id = :d '
+                'ORDER BY appointment_date, id LIMIT 1 OFFSET :o'), {'d': doctor, 'o': deep_offset - 1}).one()
+            cursor = appointments.encode_cursor(SimpleNamespace(appointment_date=datetime.fromisoformat(deep_date), id=deep_id))
+            week = EPOCH + timedelta(weeks=300)
+            scan = text('SELECT * FROM appointment NOT INDEXED WHERE doctor_id = :d AND appointment_date >= :s '
+                        "AND appointment_date < :e AND status != 'cancelled' ORDER BY appointment_date, id")
+            by_date = (Appointment.query.filter(Appointment.doctor_id == doctor)
+                       .order_by(Appointment.appointment_date, Appointment.id))
+
+            report = {
+                'rows': rows,
+                'doctor_rows': total,
+                'fill_seconds': round(fill_seconds, 1),
+                'doctor_week': timed(lambda: appointments.doctor_week(doctor, week)),
+                'doctor_week_scan': timed(lambda: db.session.execute(
+                    scan, {'d': doctor, 's': week, 'e': week + timedelta(days=7)}).fetchall(), runs=3),
+                'conflict_check': timed(lambda: appointments.find_conflict(doctor, week + timedelta(hours=10))),
+                'keyset_page_first': timed(lambda: appointments.list_appointments(doctor, as_doctor=True)),
+                'keyset_page_deep': timed(lambda: appointments.list_appointments(doctor, as_doctor=True, cursor=cursor)),
+                'offset_page_deep': timed(lambda: by_date.limit(appointments.DEFAULT_PAGE_SIZE + 1).offset(deep_offset).all()),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""p50/p99 latency of /api/chatbot at high concurrency: WSGI (run.py's server) versus ASGI (asgi.py on uvicorn).
+
+Run from the backend directory:
+
+    python benchmarks/asgi_vs_wsgi_bench.py [--concurrency 500] [--requests 5000]
+
+Each server is started in its own process on a free port; a single asyncio
+client then keeps `--concurrency` connections busy until `--requests`
+requests have completed. 503 answers (load shed by the ASGI inference pool)
+are counted separately from successes. Prints one JSON document.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench_common import percentiles
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MESSAGES = [
+    "I have a headache and fever",
+    "my stomach hurts and I feel dizzy",
+    "cough, chest pain, breathlessness",
+    "itchy skin rash with no fever",
+    "I've been throwing up and have loose stools",
+]
+
+# Both servers run with request logging silenced so stdout is not the bottleneck
+WSGI_SERVER = """
+import logging, os, sys
+sys.stdout = open(os.devnull, 'w')
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+from healthapp import create_app
+from healthapp.chatbot_engine import ensure_model_loaded
+app = create_app()
+ensure_model_loaded()
+app.run(host='127.0.0.1', port={port}, threaded=True)
+"""
+
+ASGI_SERVER = """
+import os, sys
+sys.stdout = open(os.devnull, 'w')
+import uvicorn
+from healthapp.chatbot_engine import ensure_model_loaded
+from asgi import app
+ensure_model_loaded()
+uvicorn.run(app, host='127.0.0.1', port={port}, log_level='error', backlog=2048)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # urlopen raises HTTPError for the 503 answered while the model warms up
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=1):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not become ready')
+
+
+async def post(connection, port, body):
+    """One keep-alive POST /api/chatbot on `connection` ([reader, writer] or empty); returns the status code"""
+    if not connection:
+        connection[:] = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = connection
+    writer.write(
+        f'POST /api/chatbot HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+    )
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    keep_alive = True
+    while True:
+        line = (await reader.readline()).strip().lower()
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection' and value.strip() == b'close':
+            keep_alive = False
+    await reader.readexactly(length)
+    if not keep_alive:
+        writer.close()
+        connection.clear()
+    return status
+
+
+async def load(port, concurrency, requests):
+    # A raw asyncio client: HTTP client libraries cost more CPU per request than
+    # the endpoint under test at this concurrency, which would skew the result
+    latencies = []
+    counts = {'ok': 0, 'shed': 0, 'failed': 0}
+    remaining = iter(range(requests))
+    bodies = [json.dumps({'message': message}).encode() for message in MESSAGES]
+
+    async def connection():
+        conn = []
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                status = await post(conn, port, bodies[i % len(bodies)])
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                counts['failed'] += 1
+                conn.clear()
+                continue
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                counts['ok'] += 1
+                latencies.append(elapsed)
+            elif status == 503:
+                counts['shed'] += 1
+            else:
+                counts['failed'] += 1
+        if conn:
+            conn[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latency = percentiles(latencies, 'ms', digits=2)
+    if latencies:
+        latency['max_ms'] = round(max(latencies) * 1e3, 2)
+    return {**counts, 'requests_per_second': round(requests / wall, 1), **latency}
+
+
+def run_server(source, concurrency, requests):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    server = subprocess.Popen([sys.executable, '-c', source.format(port=port)], cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_ready(port)
+        return asyncio.run(load(port, concurrency, requests))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'wsgi': run_server(WSGI_SERVER, args.concurrency, args.requests),
+        'asgi': run_server(ASGI_SERVER, args.concurrency, args.requests),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Helpers shared by the benchmark scripts in this directory; not a benchmark itself.
+
+The scripts run as `python benchmarks/<name>.py`, which puts this directory
+on sys.path, so they import it as `bench_common`.
+"""
+import time
+
+UNIT_SCALE = {'us': 1e6, 'ms': 1e3}
+
+
+def percentiles(samples, unit='us', digits=1):
+    """p50 and p99 of durations in seconds, as {'p50_<unit>', 'p99_<unit>'}; {} for no samples"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    scale = UNIT_SCALE[unit]
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * scale, digits)
+    return {f'p50_{unit}': pick(0.50), f'p99_{unit}': pick(0.99)}
+
+
+def timed(fn, runs=20, before=None):
+    """Median wall time of `runs` calls in milliseconds; `before` runs untimed ahead of each call"""
+    samples = []
+    for _ in range(runs):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(sorted(samples)[len(samples) // 2] * 1e3, 3)
+
+
+def insert_users(connection, doctors, patients):
+    """Users 1..doctors are doctors, the next `patients` ids patients"""
+    connection.executemany(
+        'INSERT INTO user (id, name, email, password, role) VALUES (?, ?, ?, ?, ?)',
+        [(i, f'user{i}', f'user{i}@example.com', 'x', 'doctor' if i <= doctors else 'patient')
+         for i in range(1, doctors + patients + 1)])
+
+
+def insert_rows(connection, sql, rows, batch_size=50000):
+    """executemany over an iterable of rows, `batch_size` at a time so it is never held in full"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            connection.executemany(sql, batch)
+            batch = []
+    connection.executemany(sql, batch)
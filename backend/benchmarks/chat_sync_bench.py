@@ -0,0 +1,131 @@
+"""Chat queries on a large message history, and what an idle poll costs.
+
+Run from the backend directory:
+
+    python benchmarks/chat_sync_bench.py [--messages 1000000] [--doctors 20] [--patients 20000]
+
+Fills a temporary SQLite database with `--messages` doctor/patient messages,
+then times (median of 20 runs, milliseconds):
+
+  sync_page            chat.messages_since for a busy doctor, from an old cursor
+  sync_idle_poll       chat.sync when nothing is new (answered from the
+                       chat_message table version, no query)
+  sync_idle_query      the query an idle poll would otherwise run
+  conversation_deep    chat.conversation, a page far back in a long conversation
+  unread_counts        chat.unread_counts for the doctor
+  mark_read_bulk       chat.mark_read of every unread message from one sender
+
+plus the queries per idle poll, with and without a commit to another table
+(as health records and chatbot turns make) before each poll.
+
+Prints one JSON document.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event, func
+
+from healthapp import db
+from healthapp import chat
+from healthapp.data_version import track_changes
+from healthapp.models import ChatMessage, ensure_indexes
+
+from bench_common import insert_rows, insert_users, timed
+
+
+def fill(path, messages, doctors, patients, seed=0):
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    insert_users(connection, doctors, patients)
+
+    def message(i):
+        # Doctor 1 and patient doctors+1 have one long conversation
+        if i % 10 == 0:
+            doctor, patient = 1, doctors + 1
+        else:
+            doctor, patient = rng.randint(1, doctors), rng.randint(doctors + 1, doctors + patients)
+        sender, receiver = (doctor, patient) if rng.random() < 0.5 else (patient, doctor)
+        return (i, sender, receiver, f'message {i}', '2026-01-01 00:00:00', int(i < messages * 0.99))
+    insert_rows(connection, 'INSERT INTO chat_message (id, sender_id, receiver_id, message, timestamp, is_read) '
+                            'VALUES (?, ?, ?, ?, ?, ?)', (message(i) for i in range(1, messages + 1)))
+    connection.commit()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--patients', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'chat.sqlite3')
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.engine.dispose()
+            started = time.perf_counter()
+            fill(path, args.messages, args.doctors, args.patients)
+            fill_seconds = time.perf_counter() - started
+            ensure_indexes(db.engine)
+            track_changes(db.engine)
+
+            doctor, patient = 1, args.doctors + 1
+            latest = args.messages
+            queries = []
+            event.listen(db.engine, 'before_cursor_execute', lambda *_: queries.append(1))
+            chat.sync(doctor, latest)
+            queries.clear()
+            idle_poll = timed(lambda: chat.sync(doctor, latest))
+            idle_queries = len(queries) / 20
+            other = sqlite3.connect(path)
+            other.execute('CREATE TABLE bench_other (value INTEGER)')
+
+            def commit_elsewhere():
+                other.execute('INSERT INTO bench_other VALUES (1)')
+                other.commit()
+            queries.clear()
+            timed(lambda: chat.sync(doctor, latest), before=commit_elsewhere)
+            idle_other_queries = len(queries) / 20
+            other.close()
+
+            sender = db.session.query(ChatMessage.sender_id).filter(
+                ChatMessage.receiver_id == doctor, ChatMessage.is_read == db.false()).limit(1).scalar()
+
+            def reset_unread():
+                db.session.query(ChatMessage).filter(
+                    ChatMessage.receiver_id == doctor, ChatMessage.sender_id == sender, ChatMessage.id > latest * 0.99,
+                ).update({'is_read': False}, synchronize_session=False)
+                db.session.commit()
+
+            report = {
+                'messages': args.messages,
+                'doctor_messages': db.session.query(func.count()).filter(
+                    (ChatMessage.receiver_id == doctor) | (ChatMessage.sender_id == doctor)).scalar(),
+                'fill_seconds': round(fill_seconds, 1),
+                'sync_page': timed(lambda: chat.messages_since(doctor, latest // 10)),
+                'sync_idle_poll': idle_poll,
+                'sync_idle_poll_queries': idle_queries,
+                'sync_idle_poll_queries_other_commits': idle_other_queries,
+                'sync_idle_query': timed(lambda: chat.messages_since(doctor, latest)),
+                'conversation_deep': timed(lambda: chat.conversation(doctor, patient, before_id=latest // 10)),
+                'unread_counts': timed(lambda: chat.unread_counts(doctor)),
+                'mark_read_bulk': timed(lambda: chat.mark_read(doctor, latest, sender), before=reset_unread),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
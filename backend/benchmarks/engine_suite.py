@@ -0,0 +1,221 @@
+"""Reproducible benchmark suite for the chatbot engine and the /api/chatbot endpoint.
+
+Run from the backend directory:
+
+    python benchmarks/engine_suite.py [--corpus 2000] [--requests 2000] [--cold-starts 3]
+                                      [--output results.json] [--baseline previous.json]
+
+Measures, each on its own:
+
+  cold_start         load_model in a fresh interpreter (import included), from
+                     the persisted artifact
+  map_symptoms       per-call latency of map_symptoms_to_columns
+  predict_cold       per-call latency of predict_disease with both in-process
+                     caches emptied before every call
+  predict_warm       the same calls again, answered from the caches
+  batch              predict_batch throughput over the whole corpus
+  http_chatbot       /api/chatbot requests per second through the Flask test client
+
+The corpus is generated with a fixed seed from the symptom rows of
+Data/Testing.csv and Data/dataset.csv, written the way users type them
+("skin rash", not "skin_rash"). Leave PULSEPAL_SHARED_CACHE unset so runs
+are comparable. Prints one JSON document (also written to --output); with
+--baseline, metrics more than --tolerance worse than the baseline file are
+listed under "regressions" and the exit status is 1.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, 'Data')
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_common import percentiles
+
+COLD_START = """
+import json, time
+started = time.perf_counter()
+from healthapp import chatbot_engine
+chatbot_engine.load_model()
+print(json.dumps({'total': time.perf_counter() - started, 'load_model': chatbot_engine.MODEL_LOAD_SECONDS}))
+"""
+
+# Metric paths compared against --baseline and whether a larger value is better
+TRACKED = {
+    ('cold_start', 'total_p50_ms'): False,
+    ('map_symptoms', 'p50_us'): False,
+    ('map_symptoms', 'p99_us'): False,
+    ('predict_cold', 'p50_us'): False,
+    ('predict_cold', 'p99_us'): False,
+    ('predict_warm', 'p50_us'): False,
+    ('batch', 'rows_per_second'): True,
+    ('http_chatbot', 'requests_per_second'): True,
+}
+
+
+def human(column):
+    return ' '.join(column.strip().replace('_', ' ').split())
+
+
+def load_corpus(size, seed):
+    """Symptom lists from the bundled datasets, deduplicated and shuffled with `seed`"""
+    lists = set()
+    with open(os.path.join(DATA_DIR, 'Testing.csv'), newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        for row in reader:
+            lists.add(tuple(human(header[i]) for i, value in enumerate(row[:-1]) if value.strip() == '1'))
+    with open(os.path.join(DATA_DIR, 'dataset.csv'), newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            lists.add(tuple(human(value) for value in row[1:] if value.strip()))
+    lists.discard(())
+    corpus = sorted(lists)
+    rng = random.Random(seed)
+    rng.shuffle(corpus)
+    # Users name a few symptoms, not a full dataset row
+    corpus = [list(rng.sample(symptoms, min(len(symptoms), rng.randint(1, 4)))) for symptoms in corpus]
+    while len(corpus) < size:
+        corpus.extend(corpus[:size - len(corpus)])
+    return corpus[:size]
+
+
+def cold_start(runs):
+    totals, loads = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START], cwd=BACKEND_DIR, check=True,
+            capture_output=True, text=True,
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        totals.append(timings['total'])
+        loads.append(timings['load_model'])
+    return {
+        'runs': runs,
+        'total_p50_ms': round(sorted(totals)[len(totals) // 2] * 1e3, 1),
+        'load_model_p50_ms': round(sorted(loads)[len(loads) // 2] * 1e3, 1),
+    }
+
+
+def per_call(fn, corpus, before=None):
+    samples = []
+    for symptoms in corpus:
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        fn(symptoms)
+        samples.append(time.perf_counter() - started)
+    return {**percentiles(samples), 'calls': len(samples)}
+
+
+def clear_caches(engine):
+    engine.prediction_cache.clear()
+    engine.render_cache.clear()
+
+
+def batch(engine, corpus):
+    started = time.perf_counter()
+    engine.predict_batch(corpus)
+    seconds = time.perf_counter() - started
+    return {'rows': len(corpus), 'seconds': round(seconds, 4), 'rows_per_second': round(len(corpus) / seconds, 1)}
+
+
+def http_chatbot(engine, corpus, requests):
+    from healthapp import create_app
+    from healthapp.log import configure_logging
+    client = create_app().test_client()
+    # create_app turns access logging on; it is not what is being measured
+    configure_logging('WARNING')
+    messages = [{'message': 'I have ' + ' and '.join(symptoms)} for symptoms in corpus]
+    clear_caches(engine)
+    samples = []
+    started = time.perf_counter()
+    for i in range(requests):
+        sent = time.perf_counter()
+        response = client.post('/api/chatbot', json=messages[i % len(messages)])
+        samples.append(time.perf_counter() - sent)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    seconds = time.perf_counter() - started
+    return {'requests_per_second': round(requests / seconds, 1), **percentiles(samples, 'ms'), 'calls': len(samples)}
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for (section, key), higher_is_better in TRACKED.items():
+        old = baseline.get(section, {}).get(key)
+        new = report.get(section, {}).get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({'metric': f'{section}.{key}', 'baseline': old, 'current': new,
+                                'change': round(change, 3)})
+    return regressions
+
+
+def environment(engine):
+    import numpy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'model_version': engine.MODEL_VERSION,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', type=int, default=2000, help='symptom lists per latency measurement')
+    parser.add_argument('--requests', type=int, default=2000, help='/api/chatbot requests')
+    parser.add_argument('--cold-starts', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    args = parser.parse_args()
+
+    report = {'cold_start': cold_start(args.cold_starts)}
+
+    from healthapp import chatbot_engine as engine
+    from healthapp.log import configure_logging
+    configure_logging('WARNING')
+    engine.load_model()
+    corpus = load_corpus(args.corpus, args.seed)
+
+    report['environment'] = environment(engine)
+    report['corpus'] = {'size': len(corpus), 'seed': args.seed}
+    report['map_symptoms'] = per_call(engine.map_symptoms_to_columns, corpus)
+    report['predict_cold'] = per_call(engine.predict_disease, corpus, before=lambda: clear_caches(engine))
+    for symptoms in corpus:
+        engine.predict_disease(symptoms)
+    report['predict_warm'] = per_call(engine.predict_disease, corpus)
+    report['batch'] = batch(engine, corpus)
+    report['http_chatbot'] = http_chatbot(engine, corpus, args.requests)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report['regressions'] else 0
+
+    document = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(document + '\n')
+    print(document)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Throughput of the precompiled free-text symptom extractor.
+
+Run from the backend directory:
+
+    python benchmarks/extractor_bench.py [--messages 50000]
+
+Prints one JSON document with messages per second and p50/p99 latency for
+SymptomExtractor.extract and for the legacy split-then-map path it replaced.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp import chatbot_engine
+from healthapp.symptom_extractor import split_symptom_message
+
+from bench_common import percentiles
+
+MESSAGES = [
+    "Hi, I have a sore throat and fever",
+    "my stomach hurts and I feel dizzy",
+    "no fever but a bad cough since yesterday",
+    "I don't have a headache, my back is sore",
+    "pain in my chest, not vomiting",
+    "I've been throwing up and have loose stools for two days",
+    "itchy skin rash with no fever or chills",
+    "sore knees and joint pain, feeling exhausted",
+    "headache, nausea, fatigue",
+    "I feel nauseous and my tummy aches after eating",
+    "short of breath when climbing stairs and sweating at night",
+    "hello there, can you help me",
+]
+
+
+def measure(fn, messages):
+    samples = []
+    started = time.perf_counter()
+    for message in messages:
+        start = time.perf_counter()
+        fn(message)
+        samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    return {'messages_per_second': round(len(messages) / elapsed, 1), **percentiles(samples, digits=2)}
+
+
+def legacy_path(message):
+    return chatbot_engine.map_symptoms_to_columns(split_symptom_message(message))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    chatbot_engine.ensure_model_loaded()
+    rng = random.Random(args.seed)
+    messages = [rng.choice(MESSAGES) for _ in range(args.messages)]
+
+    print(json.dumps({
+        'messages': args.messages,
+        'extractor': measure(chatbot_engine.extract_symptoms, messages),
+        'legacy_split_and_map': measure(legacy_path, messages),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Latency of the fuzzy fallback: trigram FuzzyIndex versus the old nested column scan.
+
+Run from the backend directory:
+
+    python benchmarks/fuzzy_index_bench.py [--queries 20000]
+
+The queries are misspelled or partial symptoms that the phrase matcher does
+not recognise, i.e. the ones that reach the fallback. Prints one JSON
+document with p50/p99 per symptom for both matchers and how often the old
+scan's answer differs from the index's.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp import chatbot_engine
+
+QUERIES = [
+    "hedache", "vomitting", "dizzyness", "diarhea", "sweatting", "itchyness", "feverr",
+    "blured vision", "high temprature", "stomach", "joint", "pain", "tired all the time",
+    "my toe", "xyzzy", "stiff neck muscles", "runy nose", "swolen legs", "yelow eyes", "cheast pain",
+]
+
+
+def legacy_match(symptom):
+    # The column scan this index replaced: first column sharing any word
+    clean_symptom = symptom.lower().replace(' ', '_')
+    for col in chatbot_engine.cols:
+        if clean_symptom in col.lower() or any(word in col.lower() for word in clean_symptom.split('_')):
+            return [col]
+    return []
+
+
+def measure(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return {'p50_us': round(pick(0.50), 1), 'p99_us': round(pick(0.99), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    chatbot_engine.ensure_model_loaded()
+    indexed = lambda symptom: chatbot_engine.fuzzy_match_columns([symptom])
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+
+    report = {
+        'queries': args.queries,
+        'phrases': len(chatbot_engine.fuzzy_index),
+        'trigrams': len(chatbot_engine.fuzzy_index.vocabulary),
+        'legacy_scan': measure(legacy_match, queries),
+        'fuzzy_index': measure(indexed, queries),
+        'answers': {query: {'legacy': legacy_match(query), 'index': indexed(query)} for query in QUERIES},
+    }
+    report['changed_answers'] = sum(1 for answer in report['answers'].values() if answer['legacy'] != answer['index'])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""What recording an assessment costs the request: write-behind queue versus a commit per request.
+
+Run from the backend directory:
+
+    python benchmarks/health_record_bench.py [--records 20000]
+
+Uses a temporary SQLite database. Reports, in microseconds per record:
+
+  sync_commit          db.session.add + commit of one HealthRecord, as a
+                       route writing inline would pay
+  submit               health_records.writer.submit, what the route pays now
+
+plus the writer's drain rate (rows per second, including batch linger), and
+`exit_flush_ok`: a child process that submits `--records` rows and exits
+at once must leave all of them in the database (the atexit flush).
+
+Prints one JSON document.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from healthapp import db
+from healthapp import health_records
+from healthapp.models import HealthRecord, User
+
+from bench_common import percentiles
+
+RESULT = {
+    'status': 'ok', 'symptoms': ['fever', 'headache'], 'matched_columns': ['high_fever', 'headache'],
+    'disease': 'Malaria', 'probability': 0.9, 'risk_level': 4.5, 'risk_category': 'consult',
+}
+
+CHILD = """
+import sys
+sys.path.insert(0, {root!r})
+from flask import Flask
+from healthapp import db, health_records
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///{path}'
+db.init_app(app)
+with app.app_context():
+    health_records.writer.bind(db.engine)
+result = {result!r}
+for _ in range({records}):
+    health_records.writer.submit(health_records.assessment_row(1, result, 'bench'))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'records.sqlite3')
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(id=1, name='p', email='p@example.com', password='x'))
+            db.session.commit()
+            health_records.writer.bind(db.engine)
+
+            sync_samples = []
+            for _ in range(min(args.records, 2000)):
+                started = time.perf_counter()
+                db.session.add(HealthRecord(**health_records.assessment_row(1, RESULT, 'bench')))
+                db.session.commit()
+                sync_samples.append(time.perf_counter() - started)
+
+            submit_samples = []
+            drain_started = time.perf_counter()
+            for _ in range(args.records):
+                started = time.perf_counter()
+                health_records.writer.submit(health_records.assessment_row(1, RESULT, 'bench'))
+                submit_samples.append(time.perf_counter() - started)
+            health_records.writer.flush()
+            drain_seconds = time.perf_counter() - drain_started
+            health_records.writer.close()
+            before_child = HealthRecord.query.count()
+
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            subprocess.run([sys.executable, '-c', CHILD.format(root=root, path=path, result=RESULT, records=args.records)],
+                           check=True)
+            db.session.rollback()
+            child_rows = HealthRecord.query.count() - before_child
+
+        report = {
+            'records': args.records,
+            'sync_commit': percentiles(sync_samples),
+            'submit': percentiles(submit_samples),
+            'drain_rows_per_second': round(args.records / drain_seconds),
+            'exit_flush_rows': child_rows,
+            'exit_flush_ok': child_rows == args.records,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Per-request cost of the structured logging at each level.
+
+Run from the backend directory:
+
+    python benchmarks/logging_overhead_bench.py [--requests 5000]
+
+Sends cached /api/chatbot requests through the Flask test client with the
+`healthapp` loggers at WARNING, INFO and DEBUG (output to /dev/null through
+the queue listener), and times a disabled logger.debug() call on its own.
+Prints one JSON document.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp import create_app
+from healthapp.chatbot_engine import ensure_model_loaded
+from healthapp.log import configure_logging
+
+from bench_common import percentiles
+
+
+def measure(client, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post('/api/chatbot', json={'message': 'I have a headache and fever'})
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    app = create_app()
+    ensure_model_loaded()
+    client = app.test_client()
+
+    report = {'requests': args.requests}
+    for level in ('WARNING', 'INFO', 'DEBUG'):
+        configure_logging(level, stream=devnull)
+        measure(client, 200)
+        report[level.lower()] = measure(client, args.requests)
+
+    configure_logging('INFO', stream=devnull)
+    logger = logging.getLogger('healthapp.chatbot_engine')
+    calls = 1_000_000
+    seconds = timeit.timeit(lambda: logger.debug("Matched symptoms"), number=calls)
+    report['disabled_debug_call_ns'] = round(seconds / calls * 1e9, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Memory per inference worker: forked copy-on-write pool versus independent processes.
+
+Run from the backend directory (Linux only, it reads /proc/<pid>/smaps_rollup):
+
+    python benchmarks/process_pool_memory_bench.py [--workers 1 2 4 8] [--requests 200]
+
+For each worker count it measures two layouts after every worker has served
+`--requests` chatbot requests:
+
+  forked       InferencePool.with_processes: the model is loaded once in the
+               parent and the workers fork from it
+  independent  one freshly spawned process per worker, each loading the
+               model itself (what N separate app processes do)
+
+RSS counts shared pages in every process, so it hardly changes between the
+two layouts; PSS divides shared pages among the processes sharing them and
+USS counts only private pages. Total PSS is the node's real footprint.
+Prints one JSON document.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = [
+    {'message': "I have a headache and fever"},
+    {'message': "my stomach hurts and I feel dizzy"},
+    {'message': "cough, chest pain, breathlessness", 'top_k': 3},
+    {'message': "itchy skin rash with no fever", 'format': 'html'},
+    {'message': "I've been throwing up and have loose stools", 'top_k': 5, 'estimator': 'forest'},
+]
+
+
+def memory_kb(pid):
+    """Rss, Pss and Uss (private clean + dirty) of a process in kB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                fields[name] = int(rest.split()[0])
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def summarize(pids, parent=None):
+    workers = [memory_kb(pid) for pid in pids]
+    mb = lambda kb: round(kb / 1024, 1)
+    report = {
+        'per_worker_mb': {key: mb(sum(w[key] for w in workers) / len(workers)) for key in ('rss', 'pss', 'uss')},
+        'total_pss_mb': mb(sum(w['pss'] for w in workers)),
+    }
+    if parent is not None:
+        parent_memory = memory_kb(parent)
+        report['parent_mb'] = {key: mb(value) for key, value in parent_memory.items()}
+        report['total_pss_mb'] = mb(sum(w['pss'] for w in workers) + parent_memory['pss'])
+    return report
+
+
+def quiet(fn, *args):
+    # The engine logs every request to stdout
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        return fn(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def serve(requests):
+    from healthapp.routes import chatbot_answer
+    for i in range(requests):
+        body, status, _ = chatbot_answer(MESSAGES[i % len(MESSAGES)])
+        assert status == 200, body
+
+
+async def drive_pool(pool, workers, requests):
+    from healthapp.routes import chatbot_answer
+    await asyncio.gather(*(
+        pool.run(chatbot_answer, MESSAGES[i % len(MESSAGES)]) for i in range(workers * requests)
+    ))
+
+
+def forked(workers, requests):
+    from healthapp.inference_pool import InferencePool
+    pool = InferencePool.with_processes(workers)
+    try:
+        quiet(asyncio.run, drive_pool(pool, workers, requests))
+        return summarize(pool.worker_pids, parent=os.getpid())
+    finally:
+        pool.shutdown()
+
+
+def independent_worker(requests, ready, done):
+    sys.stdout = open(os.devnull, 'w')
+    from healthapp.chatbot_engine import ensure_model_loaded
+    ensure_model_loaded()
+    serve(requests)
+    ready.release()
+    done.wait()
+
+
+def independent(workers, requests):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Semaphore(0)
+    done = context.Event()
+    processes = [context.Process(target=independent_worker, args=(requests, ready, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            ready.acquire()
+        return summarize([process.pid for process in processes])
+    finally:
+        done.set()
+        for process in processes:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    from healthapp.chatbot_engine import ensure_model_loaded
+    quiet(ensure_model_loaded)
+
+    results = []
+    for workers in args.workers:
+        results.append({
+            'workers': workers,
+            'forked': forked(workers, args.requests),
+            'independent': independent(workers, args.requests),
+        })
+    print(json.dumps({'requests_per_worker': args.requests, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Hit-path latency of the in-process and shared (SQLite WAL) prediction caches.
+
+Run from the backend directory:
+
+    python benchmarks/shared_cache_bench.py [--workers 4] [--lookups 20000]
+
+Prints one JSON document with p50/p99 lookup latency per tier; the shared
+tier is also measured with several processes reading concurrently.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp.prediction_cache import PredictionCache
+from healthapp.shared_cache import SharedPredictionCache
+
+from bench_common import percentiles
+
+VERSION = 'bench'
+KEYS = [(('cough', 'high_fever'), d, 1, 'tree', 'CalibratedClassifierCV') for d in range(1, 501)]
+VALUE = {
+    'status': 'ok', 'symptoms': ['fever', 'cough'], 'matched_columns': ['high_fever', 'cough'],
+    'disease_id': 8, 'disease': 'Chicken pox', 'probability': 1.0, 'severity_score': 5,
+    'risk_level': 1.25, 'risk_category': 'monitor', 'days': 1, 'estimator': 'tree',
+    'candidates': [{'disease_id': 8, 'disease': 'Chicken pox', 'probability': 1.0}], 'message': None,
+}
+
+
+def lookup_percentiles(samples):
+    return {**percentiles(samples, digits=2), 'lookups': len(samples)}
+
+
+def time_lookups(get, keys, lookups, seed):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(lookups):
+        key = rng.choice(keys)
+        start = time.perf_counter()
+        assert get(key) is not None
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def shared_worker(path, lookups, seed, queue):
+    cache = SharedPredictionCache(path)
+    cache.bind_version(VERSION)
+    keys = [SharedPredictionCache.make_key(k) for k in KEYS]
+    queue.put(time_lookups(cache.get, keys, lookups, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    local = PredictionCache(maxsize=len(KEYS))
+    for key in KEYS:
+        local.put(key, VALUE)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'prediction_cache.sqlite3')
+        shared = SharedPredictionCache(path)
+        shared.bind_version(VERSION)
+        for key in KEYS:
+            shared.put(SharedPredictionCache.make_key(key), VALUE)
+
+        results = {
+            'in_process': lookup_percentiles(time_lookups(local.get, KEYS, args.lookups, 0)),
+            'shared_single_process': lookup_percentiles(
+                time_lookups(shared.get, [SharedPredictionCache.make_key(k) for k in KEYS], args.lookups, 0)
+            ),
+        }
+
+        queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=shared_worker, args=(path, args.lookups, seed, queue))
+            for seed in range(args.workers)
+        ]
+        for proc in procs:
+            proc.start()
+        samples = [sample for _ in procs for sample in queue.get()]
+        for proc in procs:
+            proc.join()
+        results[f'shared_{args.workers}_processes'] = lookup_percentiles(samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Time to first byte of /api/chatbot versus the /api/chatbot/stream SSE variant.
+
+Run from the backend directory:
+
+    python benchmarks/stream_ttfb_bench.py [--requests 500]
+
+Goes through the Flask test client, so it measures the application only.
+Caches are disabled for the run so every request does the full analysis.
+Prints one JSON document with p50/p99 time to first byte and to the
+complete response for each endpoint.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('PULSEPAL_CACHE_SIZE', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp import create_app
+from healthapp.chatbot_engine import ensure_model_loaded
+
+from bench_common import percentiles
+
+MESSAGES = [
+    "I have a headache and fever",
+    "my stomach hurts and I feel dizzy",
+    "cough, chest pain, breathlessness",
+    "itchy skin rash with no fever",
+    "I've been throwing up and have loose stools",
+]
+
+
+def measure(client, path, requests):
+    first_byte = []
+    complete = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = client.post(path, json={'message': MESSAGES[i % len(MESSAGES)]}, buffered=False)
+        chunks = iter(response.response)
+        next(chunks)
+        first_byte.append(time.perf_counter() - start)
+        for _ in chunks:
+            pass
+        complete.append(time.perf_counter() - start)
+        response.close()
+    return {'first_byte': percentiles(first_byte, 'ms', digits=3), 'complete': percentiles(complete, 'ms', digits=3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    ensure_model_loaded()
+    client = app.test_client()
+    # Request logging goes to stdout; keep it out of the JSON report
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        report = {
+            'requests': args.requests,
+            'json': measure(client, '/api/chatbot', args.requests),
+            'sse': measure(client, '/api/chatbot/stream', args.requests),
+        }
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Load time and peak memory of the training matrix: pandas defaults versus the uint8 loader and its cache.
+
+Run from the backend directory:
+
+    python benchmarks/training_load_bench.py [--runs 5]
+
+Each layout is loaded in a fresh interpreter, with numpy and pandas imported
+before the clock starts:
+
+  pandas_int64   pd.read_csv defaults, then the float32 copy training used to make
+  uint8_parse    model_artifact.parse_training_csv (no cache)
+  uint8_cached   model_artifact.read_training_data with the .npy copy in place
+
+Peak memory is the growth of the process's max RSS during the load.
+Prints one JSON document with the median of `--runs` runs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOADERS = {
+    'pandas_int64': (
+        "training = pd.read_csv(os.path.join(model_artifact.DATA_DIR, 'Training.csv'))\n"
+        "matrix = training[training.columns[:-1]].to_numpy(dtype=np.float32)"
+    ),
+    'uint8_parse': "matrix = model_artifact.parse_training_csv(os.path.join(model_artifact.DATA_DIR, 'Training.csv')).matrix",
+    'uint8_cached': "matrix = np.asarray(model_artifact.read_training_data().matrix)",
+}
+
+MEASURE = """
+import os, resource, time, json
+import numpy as np
+import pandas as pd
+from healthapp import model_artifact
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+{loader}
+seconds = time.perf_counter() - started
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+print(json.dumps({{'ms': seconds * 1e3, 'peak_mb': peak_kb / 1024, 'matrix_mb': matrix.nbytes / 2**20}}))
+"""
+
+
+def run(loader):
+    output = subprocess.run(
+        [sys.executable, '-c', MEASURE.format(loader=loader)], cwd=BACKEND_DIR,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from healthapp import model_artifact
+    # Make sure the binary copy exists before the cached runs
+    model_artifact.read_training_data()
+
+    report = {'runs': args.runs}
+    for name, loader in LOADERS.items():
+        runs = [run(loader) for _ in range(args.runs)]
+        median = lambda key: round(sorted(r[key] for r in runs)[len(runs) // 2], 2)
+        report[name] = {'load_ms': median('ms'), 'peak_mb': median('peak_mb'), 'matrix_mb': median('matrix_mb')}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
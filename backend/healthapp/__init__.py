@@ -1,28 +1,58 @@
-from flask import Flask
+import logging
+import os
+import time
+from flask import Flask, g, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
+from .log import configure_logging, begin_request, end_request
+from . import metrics
+
+HTTP_REQUEST_SECONDS = metrics.Histogram(
+    'pulsepal_http_request_seconds', 'Request latency by Flask endpoint', ['endpoint'],
+    buckets=metrics.REQUEST_BUCKETS)
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.login_view = 'main.login'
 
 def create_app():
+    configure_logging()
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'yoursecretkey'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Warm the ML model on a background thread so startup never waits on it
+    app.config['CHATBOT_PRELOAD_MODEL'] = os.environ.get('PULSEPAL_PRELOAD_MODEL', '1') != '0'
+    # How long /api/chatbot waits for a warming model before answering 503
+    app.config['CHATBOT_WARMUP_TIMEOUT'] = float(os.environ.get('PULSEPAL_WARMUP_TIMEOUT', '5'))
 
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     
     # Enable CORS for frontend integration
-    CORS(app, origins=["http://localhost:3000"], supports_credentials=True)
+    app.config['CORS_ORIGINS'] = ["http://localhost:3000"]
+    CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
 
     from .routes import main
     app.register_blueprint(main)
 
+    # One structured access log line per request, tagged with a request id
+    access_log = logging.getLogger('healthapp.access')
+
+    @app.before_request
+    def start_request_log():
+        g.request_id, g.request_started = begin_request(request.headers.get('X-Request-ID'))
+
+    @app.after_request
+    def finish_request_log(response):
+        if 'request_started' in g:
+            HTTP_REQUEST_SECONDS.labels(request.endpoint or 'unmatched').observe(time.perf_counter() - g.request_started)
+            response.headers['X-Request-ID'] = g.request_id
+            end_request(access_log, g.request_started, request.method, request.path, response.status_code)
+        return response
+
     @login_manager.user_loader
     def load_user(user_id):
         from .models import User
@@ -31,5 +61,16 @@ def create_app():
     # Create tables
     with app.app_context():
         db.create_all()
+        from .models import ensure_columns, ensure_indexes
+        ensure_columns(db.engine)
+        ensure_indexes(db.engine)
+        from .data_version import track_changes
+        track_changes(db.engine)
+        from .health_records import writer
+        writer.bind(db.engine)
+
+    if app.config['CHATBOT_PRELOAD_MODEL']:
+        from .chatbot_engine import start_background_load
+        start_background_load()
 
-    return app
\ No newline at end of file
+    return app
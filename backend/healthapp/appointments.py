@@ -0,0 +1,139 @@
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import Appointment, User
+
+# Every appointment occupies one slot; bookings start on the slot grid
+SLOT_MINUTES = int(os.environ.get('PULSEPAL_APPOINTMENT_SLOT_MINUTES', '30'))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STATUSES = ('scheduled', 'completed', 'cancelled')
+
+
+class SlotConflict(Exception):
+    """The doctor already has an active appointment overlapping the requested slot"""
+
+    def __init__(self, appointment=None):
+        super().__init__("The doctor already has an appointment in this slot")
+        self.appointment = appointment
+
+
+def parse_datetime(value, field='appointment_date'):
+    """ISO 8601 string -> naive UTC datetime, the form appointments are stored in"""
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be an ISO 8601 date-time string")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{field} must be an ISO 8601 date-time string") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(appointment):
+    raw = f"{appointment.appointment_date.isoformat()}|{appointment.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(appointment_date, id) of the last row of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, _, appointment_id = raw.partition('|')
+        return datetime.fromisoformat(date), int(appointment_id)
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+
+
+def list_appointments(user_id, as_doctor=False, start=None, end=None, status=None,
+                      limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """One page of a user's appointments in (date, id) order; returns (rows, next_cursor).
+
+    Pages continue from the cursor with a row-value comparison, so every
+    page is an index range scan on (patient_id or doctor_id, appointment_date)
+    however deep into the history it is.
+    """
+    column = Appointment.doctor_id if as_doctor else Appointment.patient_id
+    query = Appointment.query.filter(column == user_id)
+    if start is not None:
+        query = query.filter(Appointment.appointment_date >= start)
+    if end is not None:
+        query = query.filter(Appointment.appointment_date < end)
+    if status is not None:
+        query = query.filter(Appointment.status == status)
+    if cursor is not None:
+        query = query.filter(tuple_(Appointment.appointment_date, Appointment.id) > tuple_(*decode_cursor(cursor)))
+    rows = query.order_by(Appointment.appointment_date, Appointment.id).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def find_conflict(doctor_id, start):
+    """The doctor's active appointment overlapping a slot starting at `start`, if any"""
+    slot = timedelta(minutes=SLOT_MINUTES)
+    return (
+        Appointment.query
+        .filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date > start - slot,
+            Appointment.appointment_date < start + slot,
+            Appointment.status != 'cancelled',
+        )
+        .order_by(Appointment.appointment_date)
+        .first()
+    )
+
+
+def check_slot(start):
+    minutes = start.hour * 60 + start.minute
+    if minutes % SLOT_MINUTES or start.second or start.microsecond:
+        raise ValueError(f"appointment_date must start on a {SLOT_MINUTES}-minute slot boundary")
+
+
+def book_appointment(patient_id, doctor_id, start, notes=None):
+    """Insert a scheduled appointment; raises ValueError for bad input and SlotConflict when taken"""
+    check_slot(start)
+    if start < datetime.now(timezone.utc).replace(tzinfo=None):
+        raise ValueError("appointment_date must not be in the past")
+    doctor = db.session.get(User, doctor_id)
+    if doctor is None or doctor.role != 'doctor':
+        raise ValueError("doctor_id does not name a doctor")
+    patient = db.session.get(User, patient_id)
+    if patient is None or patient.role != 'patient':
+        raise ValueError("patient_id does not name a patient")
+    conflict = find_conflict(doctor_id, start)
+    if conflict is not None:
+        raise SlotConflict(conflict)
+
+    appointment = Appointment(patient_id=patient_id, doctor_id=doctor_id, appointment_date=start,
+                              status='scheduled', notes=notes)
+    db.session.add(appointment)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request booked the slot between the check and the insert
+        db.session.rollback()
+        raise SlotConflict() from None
+    return appointment
+
+
+def doctor_week(doctor_id, week_start):
+    """A doctor's active appointments in the 7 days from `week_start`, in one range query"""
+    return (
+        Appointment.query
+        .filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date >= week_start,
+            Appointment.appointment_date < week_start + timedelta(days=7),
+            Appointment.status != 'cancelled',
+        )
+        .order_by(Appointment.appointment_date, Appointment.id)
+        .all()
+    )
@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+from . import db
+from . import health_records
+from .async_db import AsyncUserStore
+from .chatbot_engine import ensure_model_loaded
+from .inference_pool import InferencePool, PoolSaturated
+from .log import begin_request, end_request
+from .routes import chatbot_answer, record_assessment, DB_QUERY_SECONDS
+from . import metrics
+
+logger = logging.getLogger(__name__)
+access_log = logging.getLogger('healthapp.access')
+
+# Requests served natively bypass Flask's hooks; they get their own series here
+ASGI_REQUEST_SECONDS = metrics.Histogram(
+    'pulsepal_asgi_request_seconds', 'Latency of requests served natively by the ASGI app', ['path'],
+    buckets=metrics.REQUEST_BUCKETS)
+_async_insert_seconds = DB_QUERY_SECONDS.labels('async_insert_user')
+_async_session_user_seconds = DB_QUERY_SECONDS.labels('async_session_user')
+
+# The pool of the most recently created app, read at scrape time
+_current_pool = None
+
+
+def _pool_stat(field):
+    return lambda: {(): _current_pool.stats()[field]} if _current_pool is not None else {}
+
+
+metrics.Callback('pulsepal_inference_in_flight', 'Inference jobs running', _pool_stat('in_flight'))
+metrics.Callback('pulsepal_inference_waiting', 'Requests waiting for an inference worker', _pool_stat('waiting'))
+metrics.Callback('pulsepal_inference_rejected_total', 'Requests shed because the wait queue was full',
+                 _pool_stat('rejected'), type='counter')
+metrics.Callback('pulsepal_inference_timed_out_total', 'Requests shed after waiting too long for a worker',
+                 _pool_stat('timed_out'), type='counter')
+
+# Request bodies above this are refused before any parsing
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def read_body(receive, limit=MAX_BODY_BYTES):
+    """Collect the request body on the event loop, so slow clients never hold a worker"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+# Threads serving the routes forwarded to Flask; a long-poll holds one for its whole wait
+WSGI_THREADS = int(os.environ.get('PULSEPAL_WSGI_THREADS', '32'))
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    def __init__(self, wsgi_application, duplicate_header_limit, run):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.run = run
+
+    async def run_wsgi_app(self, body):
+        await self.run(self, body)
+
+    def call_wsgi_app(self, body):
+        """Run the WSGI app on a pool thread, sending its response as it is produced.
+
+        start_response is called on the same thread. The app's iterable is
+        always closed, as PEP 3333 asks of servers.
+        """
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request: Too many duplicate headers'})
+            return
+        iterable = self.wsgi_application(environ, self.start_response)
+        try:
+            sent = 0
+            for output in iterable:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                if self.response_content_length is not None:
+                    # Never send more than the Content-Length the app declared
+                    output = output[:self.response_content_length - sent]
+                self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+                sent += len(output)
+                if sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi that runs requests on a ThreadPoolExecutor of its own, so a slow
+    WSGI request (a /api/chat/sync long-poll) does not hold up the others"""
+
+    def __init__(self, wsgi_application, threads=WSGI_THREADS):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        # asgiref's own run_wsgi_app is thread-sensitive: every request would queue on one shared thread
+        self.run = SyncToAsync(PooledWsgiInstance.call_wsgi_app, thread_sensitive=False, executor=self.executor)
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit, self.run)(scope, receive, send)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class PulsePalASGI:
+    """ASGI front end for the Flask app.
+
+    /api/chatbot and /api/register are served natively: bodies are read
+    asynchronously, inference runs on a bounded InferencePool that answers
+    503 when saturated, and registration uses aiosqlite. /api/chatbot reads
+    Flask-Login's signed session cookie itself, so signed-in users'
+    assessments are recorded as with the Flask view. The pool is a
+    thread pool by default; PULSEPAL_INFERENCE_EXECUTOR=process forks
+    workers that share the parent's loaded model copy-on-write. Every other
+    route (including /api/login, which needs Flask-Login's session cookie)
+    goes to the unchanged Flask app through a WSGI adapter backed by a
+    PULSEPAL_WSGI_THREADS thread pool.
+    """
+
+    def __init__(self, flask_app, pool=None, user_store=None):
+        self.flask_app = flask_app
+        self.wsgi = PooledWsgiToAsgi(flask_app)
+        # In process mode the workers fork from here, after the model is loaded
+        self.pool = pool or InferencePool.from_environ(before_fork=ensure_model_loaded)
+        global _current_pool
+        _current_pool = self.pool
+        if user_store is None:
+            with flask_app.app_context():
+                user_store = AsyncUserStore(db.engine.url.database)
+        self.users = user_store
+        self.warmup_timeout = flask_app.config['CHATBOT_WARMUP_TIMEOUT']
+        self.cors_origins = set(flask_app.config.get('CORS_ORIGINS', ()))
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.session_cookie = flask_app.config['SESSION_COOKIE_NAME']
+        self.session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        self.routes = {
+            ('POST', '/api/chatbot'): self.chatbot,
+            ('POST', '/api/register'): self.register,
+            ('GET', '/api/pool'): self.pool_status,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+        # Flask logs the bridged routes itself; the native ones get the same access line here
+        request_id, started = begin_request(
+            dict(scope['headers']).get(b'x-request-id', b'').decode(errors='replace') or None)
+        status = [None]
+
+        async def send_logged(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                message['headers'] = list(message['headers']) + [(b'x-request-id', request_id.encode())]
+            await send(message)
+
+        try:
+            try:
+                body = await read_body(receive)
+            except BodyTooLarge:
+                await self.respond(scope, send_logged, {'error': 'Request body too large'}, 413)
+                return
+            if body is None:
+                return
+            await handler(scope, body, send_logged)
+        finally:
+            ASGI_REQUEST_SECONDS.labels(scope['path']).observe(time.perf_counter() - started)
+            end_request(access_log, started, scope['method'], scope['path'], status[0])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.users.close()
+                self.pool.shutdown(wait=False)
+                self.wsgi.shutdown()
+                # Write out assessments still queued for the database
+                health_records.writer.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def respond(self, scope, send, body, status=200, headers=None):
+        payload = json.dumps(body).encode()
+        raw_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), str(value).encode()))
+        # Mirror Flask-CORS for the routes that bypass Flask; a non-UTF-8 origin matches none
+        origin = dict(scope.get('headers', ())).get(b'origin', b'').decode(errors='replace')
+        if origin in self.cors_origins:
+            raw_headers += [
+                (b'access-control-allow-origin', origin.encode()),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    @staticmethod
+    def parse_json(body):
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def session_user_id(self, scope):
+        """Id of the user signed in through Flask-Login's session cookie, or None"""
+        cookies = parse_cookie(dict(scope['headers']).get(b'cookie', b'').decode('latin-1'))
+        cookie = cookies.get(self.session_cookie)
+        if not cookie or self.session_serializer is None:
+            return None
+        try:
+            user_id = int(self.session_serializer.loads(cookie, max_age=self.session_max_age).get('_user_id'))
+        except (BadSignature, TypeError, ValueError):
+            return None
+        # Like Flask-Login's user_loader: a deleted account is not signed in
+        started = time.perf_counter()
+        exists = await self.users.user_exists(user_id)
+        _async_session_user_seconds.observe(time.perf_counter() - started)
+        return user_id if exists else None
+
+    async def chatbot(self, scope, body, send):
+        data = self.parse_json(body)
+        try:
+            patient_id = await self.session_user_id(scope)
+            result, status, headers = await self.pool.run(chatbot_answer, data, self.warmup_timeout)
+        except PoolSaturated:
+            await self.respond(scope, send, {
+                'error': 'The server is busy. Please try again in a moment.',
+                'status': 'busy',
+            }, 503, {'Retry-After': '1'})
+            return
+        except Exception as e:
+            logger.exception("API error", extra={'error_type': type(e).__name__})
+            await self.respond(scope, send, {'error': f'Internal server error: {str(e)}'}, 500)
+            return
+        # Recorded here rather than in chatbot_answer: a process pool worker has no writer thread
+        if patient_id is not None and status == 200:
+            record_assessment(patient_id, result['result'])
+        await self.respond(scope, send, result, status, headers)
+
+    async def register(self, scope, body, send):
+        data = self.parse_json(body) or {}
+        email = data.get('email')
+        password = data.get('password')
+        name = data.get('name')
+        role = data.get('role', 'patient')
+
+        if not all([email, password, name]):
+            await self.respond(scope, send, {'error': 'All fields are required'}, 400)
+            return
+        try:
+            # The unique index on email settles races between concurrent sign-ups
+            started = time.perf_counter()
+            user_id = await self.users.create_user(name, email, password, role)
+            _async_insert_seconds.observe(time.perf_counter() - started)
+        except Exception as e:
+            await self.respond(scope, send, {'error': str(e)}, 500)
+            return
+        if user_id is None:
+            await self.respond(scope, send, {'error': 'User already exists'}, 400)
+            return
+        await self.respond(scope, send, {
+            'message': 'User created successfully',
+            'user_id': user_id,
+            'status': 'success'
+        }, 201)
+
+    async def pool_status(self, scope, body, send):
+        await self.respond(scope, send, {'pool': self.pool.stats(), 'status': 'success'})
+
+
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from . import create_app
+        flask_app = create_app()
+    return PulsePalASGI(flask_app)
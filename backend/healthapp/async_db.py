@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+
+import aiosqlite
+
+
+class AsyncUserStore:
+    """Async access to the `user` table for the ASGI app.
+
+    Uses the same SQLite file as Flask-SQLAlchemy through one shared
+    aiosqlite connection, so registration never blocks the event loop or an
+    inference worker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connection(self):
+        if self._conn is None:
+            async with self._connect_lock:
+                if self._conn is None:
+                    conn = await aiosqlite.connect(self.path)
+                    await conn.execute('PRAGMA busy_timeout = 5000')
+                    self._conn = conn
+        return self._conn
+
+    async def create_user(self, name, email, password, role='patient'):
+        """Insert a user and return its id, or None if the email is taken"""
+        conn = await self.connection()
+        try:
+            cursor = await conn.execute(
+                'INSERT INTO user (name, email, password, role, created_at) '
+                'VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)',
+                (name, email, password, role),
+            )
+            await conn.commit()
+        except sqlite3.IntegrityError:
+            await conn.rollback()
+            return None
+        return cursor.lastrowid
+
+    async def user_exists(self, user_id):
+        conn = await self.connection()
+        async with conn.execute('SELECT 1 FROM user WHERE id = ?', (user_id,)) as cursor:
+            return await cursor.fetchone() is not None
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,194 @@
+import math
+import os
+import threading
+import time
+
+from sqlalchemy import func, select, union_all, update
+
+from . import data_version
+from . import db
+from .models import ChatMessage, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_MESSAGE_CHARS = 5000
+# Longest a sync request may be held open, in seconds
+MAX_WAIT_SECONDS = 25.0
+# How often a held sync request looks for commits made by other processes
+POLL_INTERVAL = 0.25
+# Sync requests that may be held at once; each holds a server thread, so keep
+# this below PULSEPAL_WSGI_THREADS (and the WSGI server's thread count)
+MAX_WAITERS = int(os.environ.get('PULSEPAL_CHAT_MAX_WAITERS', '16'))
+
+
+class TooManyWaiters(Exception):
+    """Raised when MAX_WAITERS sync requests are already being held"""
+
+
+class ChatNotifier:
+    """Wakes held sync requests in this process when a message is sent.
+
+    It also remembers, per user, the newest message id found at a given
+    version of the chat_message table, so a poll that has nothing to fetch
+    is answered without a query.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._changed = threading.Condition()
+        # user id -> (table version, id above which that user had no messages)
+        self._quiet = {}
+        self._waiters = threading.BoundedSemaphore(MAX_WAITERS)
+
+    def version(self):
+        # Commits to other tables (health records, chatbot turns) leave this alone
+        return data_version.table('chat_message')
+
+    def nothing_new(self, user_id, after_id, version):
+        quiet = self._quiet.get(user_id)
+        return quiet is not None and quiet[0] == version and after_id >= quiet[1]
+
+    def remember_quiet(self, user_id, after_id, version):
+        self._quiet[user_id] = (version, after_id)
+
+    def publish(self, *user_ids):
+        for user_id in user_ids:
+            self._quiet.pop(user_id, None)
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait(self, timeout):
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def start_waiting(self):
+        return self._waiters.acquire(blocking=False)
+
+    def stop_waiting(self):
+        self._waiters.release()
+
+
+notifier = ChatNotifier()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=notifier._reset)
+
+
+def can_chat(sender, receiver):
+    """Chat is between a doctor and a patient"""
+    return receiver is not None and sender.id != receiver.id and 'doctor' in (sender.role, receiver.role)
+
+
+def send_message(sender, receiver_id, text):
+    receiver = db.session.get(User, receiver_id)
+    if not can_chat(sender, receiver):
+        raise ValueError("Messages can only be sent between a doctor and a patient")
+    message = ChatMessage(sender_id=sender.id, receiver_id=receiver_id, message=text, is_read=False)
+    db.session.add(message)
+    db.session.commit()
+    notifier.publish(sender.id, receiver_id)
+    return message
+
+
+def _first_of_each(conditions, order, limit):
+    """Up to `limit` messages in `order` matching any condition.
+
+    Each condition is its own index range capped at `limit` rows and only
+    their union is sorted, so a page costs O(limit) however long the
+    history is; an OR query would collect and sort every matching row.
+    """
+    branches = [
+        select(ChatMessage.id).where(*condition).order_by(order).limit(limit).subquery()
+        for condition in conditions
+    ]
+    ids = union_all(*(select(branch.c.id) for branch in branches))
+    return ChatMessage.query.filter(ChatMessage.id.in_(ids)).order_by(order).limit(limit).all()
+
+
+def messages_since(user_id, after_id, limit=DEFAULT_PAGE_SIZE):
+    """Messages to or from a user with id > after_id, oldest first"""
+    newer = ChatMessage.id > after_id
+    return _first_of_each(
+        [(ChatMessage.receiver_id == user_id, newer), (ChatMessage.sender_id == user_id, newer)],
+        ChatMessage.id, limit,
+    )
+
+
+def _poll(user_id, after_id, limit):
+    version = notifier.version()
+    if notifier.nothing_new(user_id, after_id, version):
+        return []
+    rows = messages_since(user_id, after_id, limit)
+    if not rows:
+        notifier.remember_quiet(user_id, after_id, version)
+        # Hand the connection back to the pool while this request sleeps
+        db.session.rollback()
+    return rows
+
+
+def sync(user_id, after_id, wait=0.0, limit=DEFAULT_PAGE_SIZE):
+    """Messages newer than `after_id`, holding the request up to `wait` seconds until one arrives.
+
+    While held, the database is only queried after a commit somewhere has
+    changed the chat_message table; a sleeping request costs a PRAGMA per
+    POLL_INTERVAL and is woken at once by sends from this process. Raises
+    TooManyWaiters when there is nothing new and MAX_WAITERS requests are
+    already held.
+    """
+    # NaN would never reach the deadline; treat any non-finite wait as no wait
+    wait = min(max(wait, 0.0), MAX_WAIT_SECONDS) if math.isfinite(wait) else 0.0
+    deadline = time.monotonic() + wait
+    rows = _poll(user_id, after_id, limit)
+    if rows or wait == 0:
+        return rows
+    if not notifier.start_waiting():
+        raise TooManyWaiters(f"{MAX_WAITERS} sync requests are already waiting")
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            notifier.wait(min(remaining, POLL_INTERVAL))
+            rows = _poll(user_id, after_id, limit)
+            if rows:
+                return rows
+    finally:
+        notifier.stop_waiting()
+
+
+def conversation(user_id, other_id, before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of the messages between two users, newest first, older than `before_id`"""
+    older = () if before_id is None else (ChatMessage.id < before_id,)
+    return _first_of_each(
+        [
+            (ChatMessage.sender_id == user_id, ChatMessage.receiver_id == other_id, *older),
+            (ChatMessage.sender_id == other_id, ChatMessage.receiver_id == user_id, *older),
+        ],
+        ChatMessage.id.desc(), limit,
+    )
+
+
+def unread_counts(user_id):
+    """{sender id: unread messages}, counted from the (receiver_id, is_read, sender_id) index alone"""
+    rows = (
+        db.session.query(ChatMessage.sender_id, func.count())
+        .filter(ChatMessage.receiver_id == user_id, ChatMessage.is_read == db.false())
+        .group_by(ChatMessage.sender_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def mark_read(user_id, up_to_id, sender_id=None):
+    """Mark a user's unread messages up to `up_to_id` (from one sender, if given) read in one UPDATE"""
+    statement = update(ChatMessage).where(
+        ChatMessage.receiver_id == user_id,
+        ChatMessage.is_read == db.false(),
+        ChatMessage.id <= up_to_id,
+    )
+    if sender_id is not None:
+        statement = statement.where(ChatMessage.sender_id == sender_id)
+    result = db.session.execute(statement.values(is_read=True), execution_options={'synchronize_session': False})
+    db.session.commit()
+    return result.rowcount
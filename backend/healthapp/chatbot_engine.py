@@ -1,23 +1,48 @@
-import pandas as pd
-import numpy as np
-import re
-import csv
+import logging
 import os
-from sklearn import preprocessing, tree
-from sklearn.model_selection import train_test_split
+import threading
+import time
+from collections import Counter
+from dataclasses import replace
+from itertools import chain
+import numpy as np
+from . import metrics
+from . import model_artifact
+from . import rendering
+from .log import annotate
+from .prediction import PredictionResult
+from .prediction_cache import PredictionCache
+from .shared_cache import SharedPredictionCache
+from .fuzzy_index import FuzzyIndex
+from .symptom_extractor import NATURAL_LANGUAGE_SYNONYMS, SymptomExtractor, split_symptom_message
+from .symptom_matcher import PhraseMatcher
 
-# Define absolute paths to data
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+logger = logging.getLogger(__name__)
+
+# Model lifecycle: not_loaded -> loading -> ready | failed
+MODEL_NOT_LOADED = 'not_loaded'
+MODEL_LOADING = 'loading'
+MODEL_READY = 'ready'
+MODEL_FAILED = 'failed'
 
 # Global variables
+MODEL_STATE = MODEL_NOT_LOADED
+MODEL_ERROR = None
+MODEL_LOAD_SECONDS = None
 MODEL_LOADED = False
-clf = None
+MODEL_VERSION = None
+estimators = {}
+estimator_metrics = {}
+signature_index = None
 le = None
 cols = None
+col_index = {}
 reduced_data = None
 severity_dict = {}
 description_dict = {}
 precaution_dict = {}
+# Prebuilt reply fragments per disease, see rendering.DiseaseFragments
+disease_fragments = {}
 
 # Common symptom mappings to dataset columns
 SYMPTOM_MAPPINGS = {
@@ -122,235 +147,665 @@ SYMPTOM_MAPPINGS = {
     'yellow crust': ['yellow_crust_ooze']
 }
 
-def load_model():
-    global MODEL_LOADED, clf, le, cols, reduced_data, severity_dict, description_dict, precaution_dict
+def build_symptom_matcher(columns=()):
+    """Compile SYMPTOM_MAPPINGS and the dataset column names into one phrase matcher"""
+    column_phrases = {col.replace('_', ' '): [col] for col in columns}
+    return PhraseMatcher(SYMPTOM_MAPPINGS, column_phrases)
+
+def build_symptom_extractor(columns=None):
+    """Free-text extractor over SYMPTOM_MAPPINGS, column names and natural-language synonyms"""
+    column_phrases = {col.replace('_', ' '): [col] for col in columns or ()}
+    return SymptomExtractor([SYMPTOM_MAPPINGS, column_phrases], columns)
+
+def build_fuzzy_index(columns=()):
+    """Trigram index over the column names and every synonym table, for the fuzzy fallback"""
+    column_phrases = {col.replace('_', ' '): [col] for col in columns}
+    return FuzzyIndex(SYMPTOM_MAPPINGS, NATURAL_LANGUAGE_SYNONYMS, column_phrases)
+
+# Recompiled with the column names once the model is loaded
+symptom_matcher = build_symptom_matcher()
+symptom_extractor = build_symptom_extractor()
+fuzzy_index = build_fuzzy_index()
+
+# Most chatbot traffic repeats a few symptom combinations: cache inference
+# results and rendered replies, both tied to the loaded model version
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('PULSEPAL_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('PULSEPAL_CACHE_TTL', '600')),
+)
+render_cache = PredictionCache(maxsize=prediction_cache.maxsize, ttl=prediction_cache.ttl)
+# Optional second tier shared by all workers on the node (PULSEPAL_SHARED_CACHE)
+shared_cache = SharedPredictionCache.from_environ()
+
+# Where a chat request spends its time, plus mapping outcomes; served on /metrics
+STAGE_SECONDS = metrics.Histogram(
+    'pulsepal_engine_stage_seconds', 'Time spent in each stage of a symptom analysis', ['stage'])
+_extract_seconds = STAGE_SECONDS.labels('extract')
+_mapping_seconds = STAGE_SECONDS.labels('mapping')
+_fuzzy_seconds = STAGE_SECONDS.labels('fuzzy_fallback')
+_feature_seconds = STAGE_SECONDS.labels('feature_build')
+_predict_seconds = STAGE_SECONDS.labels('predict')
+_render_seconds = STAGE_SECONDS.labels('render')
+_batch_predict_seconds = STAGE_SECONDS.labels('batch_predict')
+MODEL_LOAD_HISTOGRAM = metrics.Histogram(
+    'pulsepal_model_load_seconds', 'Duration of load_model calls', buckets=metrics.LOAD_BUCKETS)
+# outcome: direct, fuzzy (only the fallback matched), extracted (columns came
+# from the free-text extractor), unrecognized, no_match
+MAPPING_OUTCOMES = metrics.Counter(
+    'pulsepal_mapping_outcomes_total', 'Symptom mapping attempts by outcome', ['outcome'])
+PREDICTION_STATUSES = metrics.Counter(
+    'pulsepal_prediction_status_total', 'Symptom analyses by result status', ['status'])
+
+_load_lock = threading.Lock()
+_load_done = threading.Event()
+_load_thread = None
+
+def load_model(force_rebuild=False):
+    global MODEL_STATE, MODEL_ERROR, MODEL_LOAD_SECONDS, MODEL_LOADED, MODEL_VERSION
+    global estimators, estimator_metrics, signature_index, le, cols, col_index, reduced_data, severity_dict, description_dict, precaution_dict, disease_fragments, symptom_matcher, symptom_extractor, fuzzy_index
     
+    MODEL_STATE = MODEL_LOADING
+    started = time.monotonic()
     try:
-        print("Loading ML model...")
-        
-        # Load training data
-        training_path = os.path.join(BASE_DIR, 'Data', 'Training.csv')
-        testing_path = os.path.join(BASE_DIR, 'Data', 'Testing.csv')
-        
-        print(f"Training data path: {training_path}")
-        print(f"File exists: {os.path.exists(training_path)}")
-        
-        training = pd.read_csv(training_path)
-        testing = pd.read_csv(testing_path)
-        
-        print(f"Training data shape: {training.shape}")
-        print(f"Columns: {list(training.columns[:5])}...")
-        
-        cols = training.columns[:-1]
-        x = training[cols]
-        y = training['prognosis']
+        logger.info("Loading ML model")
         
-        print(f"Features: {len(cols)}")
-        print(f"Unique diseases: {len(y.unique())}")
+        # Reuse the persisted artifact; retrains only when the source CSVs changed
+        artifact = model_artifact.load_or_build(force=force_rebuild)
         
-        # Label encoding
-        le = preprocessing.LabelEncoder()
-        y_encoded = le.fit_transform(y)
-        
-        # Train/test split
-        x_train, x_test, y_train, y_test = train_test_split(x, y_encoded, test_size=0.33, random_state=42)
-        
-        # Train model
-        clf = tree.DecisionTreeClassifier()
-        clf.fit(x_train, y_train)
-        
-        print(f"Model accuracy: {clf.score(x_test, y_test):.2f}")
-        
-        reduced_data = training.groupby(training['prognosis']).max()
-        
-        # Load additional data files
-        load_severity_dict()
-        load_description_dict()
-        load_precaution_dict()
+        estimators = artifact['estimators']
+        estimator_metrics = artifact['estimator_metrics']
+        signature_index = estimators['signature']
+        le = artifact['le']
+        cols = artifact['cols']
+        col_index = artifact['col_index']
+        reduced_data = artifact['reduced_data']
+        severity_dict = artifact['severity_dict']
+        description_dict = artifact['description_dict']
+        precaution_dict = artifact['precaution_dict']
+        disease_fragments = rendering.build_disease_fragments(le.classes_.tolist(), description_dict, precaution_dict)
+        MODEL_VERSION = artifact['model_version']
+        symptom_matcher = build_symptom_matcher(cols)
+        symptom_extractor = build_symptom_extractor(cols)
+        fuzzy_index = build_fuzzy_index(cols)
+        prediction_cache.bind_version(MODEL_VERSION)
+        render_cache.bind_version(MODEL_VERSION)
+        if shared_cache is not None:
+            shared_cache.bind_version(MODEL_VERSION)
         
         MODEL_LOADED = True
-        print("ML model loaded successfully!")
+        MODEL_ERROR = None
+        MODEL_STATE = MODEL_READY
+        logger.info("ML model loaded", extra={
+            'model_version': MODEL_VERSION,
+            'features': len(cols),
+            'diseases': len(le.classes_),
+            'accuracy': round(float(artifact['accuracy']), 4),
+            'load_seconds': round(time.monotonic() - started, 3),
+        })
         
     except Exception as e:
-        print(f"Error loading ML model: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading ML model")
         MODEL_LOADED = False
+        MODEL_ERROR = str(e)
+        MODEL_STATE = MODEL_FAILED
+    finally:
+        MODEL_LOAD_SECONDS = time.monotonic() - started
+        MODEL_LOAD_HISTOGRAM.observe(MODEL_LOAD_SECONDS)
 
-def load_severity_dict():
-    global severity_dict
+def _load_in_background():
     try:
-        severity_file = os.path.join(BASE_DIR, 'Data', 'Symptom_severity.csv')
-        if os.path.exists(severity_file):
-            with open(severity_file) as f:
-                reader = csv.reader(f)
-                next(reader, None)  # Skip header if present
-                for rows in reader:
-                    if len(rows) >= 2:
-                        try:
-                            severity_dict[rows[0]] = int(rows[1])
-                        except ValueError:
-                            severity_dict[rows[0]] = 1
-            print(f"Loaded {len(severity_dict)} severity mappings")
-    except Exception as e:
-        print(f"Error loading severity dict: {e}")
+        load_model()
+    finally:
+        _load_done.set()
 
-def load_description_dict():
-    global description_dict
-    try:
-        description_file = os.path.join(BASE_DIR, 'Data', 'symptom_Description.csv')
-        if os.path.exists(description_file):
-            with open(description_file) as f:
-                reader = csv.reader(f)
-                next(reader, None)  # Skip header if present
-                for rows in reader:
-                    if len(rows) >= 2:
-                        description_dict[rows[0]] = rows[1]
-            print(f"Loaded {len(description_dict)} descriptions")
-    except Exception as e:
-        print(f"Error loading description dict: {e}")
+def start_background_load():
+    """Start loading the model on a daemon thread unless it is loading or loaded already"""
+    global _load_thread, MODEL_STATE
+    with _load_lock:
+        if MODEL_STATE in (MODEL_LOADING, MODEL_READY):
+            return
+        # A failed load is retried, matching the old load-on-demand behaviour
+        _load_done.clear()
+        MODEL_STATE = MODEL_LOADING
+        _load_thread = threading.Thread(target=_load_in_background, name='model-warmup', daemon=True)
+        _load_thread.start()
 
-def load_precaution_dict():
-    global precaution_dict
-    try:
-        precaution_file = os.path.join(BASE_DIR, 'Data', 'symptom_precaution.csv')
-        if os.path.exists(precaution_file):
-            with open(precaution_file) as f:
-                reader = csv.reader(f)
-                next(reader, None)  # Skip header if present
-                for rows in reader:
-                    if len(rows) >= 2:
-                        precautions = [p.strip() for p in rows[1:] if p.strip()]
-                        if precautions:
-                            precaution_dict[rows[0]] = precautions
-            print(f"Loaded {len(precaution_dict)} precaution sets")
-    except Exception as e:
-        print(f"Error loading precaution dict: {e}")
+def ensure_model_loaded(timeout=None):
+    """Make sure loading has started and wait up to `timeout` seconds (None waits forever).
+
+    Returns True once the model is ready.
+    """
+    if MODEL_STATE == MODEL_READY:
+        return True
+    start_background_load()
+    _load_done.wait(timeout)
+    return MODEL_STATE == MODEL_READY
+
+def model_status():
+    """Snapshot of the model lifecycle for health and readiness checks"""
+    return {
+        'state': MODEL_STATE,
+        'version': MODEL_VERSION,
+        'error': MODEL_ERROR,
+        'load_seconds': round(MODEL_LOAD_SECONDS, 3) if MODEL_LOAD_SECONDS is not None else None,
+    }
+
+def _reset_after_fork():
+    # Threads do not survive fork(): a warm-up still running in the parent
+    # would leave the child stuck in 'loading' forever, so start over there.
+    global _load_lock, _load_done, _load_thread, MODEL_STATE
+    _load_lock = threading.Lock()
+    _load_done = threading.Event()
+    _load_thread = None
+    if MODEL_STATE == MODEL_READY:
+        _load_done.set()
+    elif MODEL_STATE == MODEL_LOADING:
+        MODEL_STATE = MODEL_NOT_LOADED
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 def map_symptoms_to_columns(symptoms):
     """Map user symptoms to dataset column names"""
-    mapped_columns = []
-    user_text = ' '.join(symptoms).lower()
+    mapped_columns = {}
     
-    # First try exact mappings
-    for user_symptom in symptoms:
-        user_symptom_lower = user_symptom.lower().strip()
-        if user_symptom_lower in SYMPTOM_MAPPINGS:
-            mapped_columns.extend(SYMPTOM_MAPPINGS[user_symptom_lower])
+    # One trie walk per symptom finds synonyms and direct column names alike,
+    # on word boundaries so "rash" no longer matches inside "crash"
+    for symptom in symptoms:
+        for column in symptom_matcher.find(symptom):
+            mapped_columns[column] = None
     
-    # Then try partial mappings
-    for mapped_symptom, column_names in SYMPTOM_MAPPINGS.items():
-        if mapped_symptom in user_text and mapped_symptom not in [s.lower() for s in symptoms]:
-            mapped_columns.extend(column_names)
+    return list(mapped_columns)
+
+def extract_symptoms(message):
+    """Run the compiled extractor over a free-text message; returns an Extraction"""
+    return symptom_extractor.extract(message)
+
+def symptoms_from_message(message):
+    """(symptoms, mapped_columns) for a chat message, shared by every entry point.
+
+    When the extractor recognises anything (including only negated symptoms)
+    its phrases and columns are used and phrase mapping is skipped; otherwise
+    the message is split the legacy way and mapped_columns is None.
+    """
+    started = time.perf_counter()
+    extraction = extract_symptoms(message)
+    _extract_seconds.observe(time.perf_counter() - started)
+    if extraction.recognized:
+        # Only denials ("no fever"): echo the message back rather than nothing
+        return list(extraction.phrases) or [message.strip()], list(extraction.columns)
+    return split_symptom_message(message), None
+
+# Dice similarity a fuzzy match needs; below it a symptom stays unrecognized
+FUZZY_MIN_SCORE = 0.5
+# How far the best phrase must lead the runner-up to be trusted
+FUZZY_MIN_MARGIN = 0.1
+
+def fuzzy_matches(symptom, limit=5):
+    """Ranked FuzzyMatch(phrase, columns, score) candidates for one symptom"""
+    return fuzzy_index.search(symptom, limit=limit, min_score=FUZZY_MIN_SCORE)
+
+def fuzzy_match_columns(symptom_list):
+    """Fallback for symptoms the phrase matcher missed: the best-scoring phrase's columns.
+
+    A symptom whose best phrase barely beats the next one ("pain": hip pain,
+    back pain, knee pain...) is ambiguous and maps to nothing rather than to
+    whichever column happens to score first.
+    """
+    matched_symptoms = {}
+    for symptom in symptom_list:
+        ranked = fuzzy_matches(symptom, limit=2)
+        if not ranked or (len(ranked) > 1 and ranked[0].score - ranked[1].score < FUZZY_MIN_MARGIN):
+            continue
+        for column in ranked[0].columns:
+            matched_symptoms[column] = None
+    return list(matched_symptoms)
+
+def resolve_feature_columns(mapped_columns):
+    """Split mapped columns into those known to the model and their feature indices"""
+    final_matched_symptoms = []
+    feature_indices = []
+    for symptom_col in mapped_columns:
+        idx = col_index.get(symptom_col)
+        if idx is not None:
+            feature_indices.append(idx)
+            final_matched_symptoms.append(symptom_col)
+    return final_matched_symptoms, feature_indices
+
+def assess_risk(matched_symptoms, days=1):
+    """Severity score of the matched symptoms and the duration-weighted risk level"""
+    severity_score = sum(severity_dict.get(sym.replace('_', ' '), 1) for sym in matched_symptoms)
+    risk_level = (severity_score * max(days, 1)) / (len(matched_symptoms) + 1)
+    return severity_score, risk_level
+
+def risk_category(risk_level):
+    if risk_level > 10:
+        return 'urgent'
+    if risk_level > 5:
+        return 'consult'
+    return 'monitor'
+
+_feature_buffers = threading.local()
+
+def feature_row(indices):
+    """Reusable per-thread (1, n_features) float32 row with only `indices` set to 1"""
+    row = getattr(_feature_buffers, 'row', None)
+    if row is None or row.shape[1] != len(cols):
+        row = np.zeros((1, len(cols)), dtype=np.float32)
+        _feature_buffers.row = row
+    else:
+        row.fill(0)
+    row[0, indices] = 1
+    return row
+
+# Upper bound on top_k so a request cannot ask for every class
+MAX_TOP_K = 10
+# Probability model used when no estimator was named, whatever top_k is, so
+# the primary diagnosis does not change with k
+DEFAULT_ESTIMATOR = 'tree'
+
+def select_estimator(top_k=1, estimator=None):
+    """Resolve (name, model) for a request.
+
+    Every name maps to exactly one model, so the name can key caches.
+    Raises ValueError for unknown estimators or an out-of-range top_k.
+    """
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+    if estimator is None:
+        estimator = DEFAULT_ESTIMATOR
+    if estimator not in model_artifact.TOP_K_ESTIMATORS:
+        raise ValueError(f"estimator must be one of {', '.join(model_artifact.TOP_K_ESTIMATORS)}")
+    return estimator, estimators[estimator]
+
+def top_k_candidates(model, proba, k):
+    """The k most likely (disease_id, disease, probability) per row of a probability matrix, best first"""
+    k = min(k, proba.shape[1])
+    # argpartition is O(n_classes); only the k survivors get sorted
+    top = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    top_proba = np.take_along_axis(proba, top, axis=1)
+    order = np.argsort(-top_proba, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_proba = np.take_along_axis(top_proba, order, axis=1)
+    disease_ids = model.classes_[top]
+    diseases = le.classes_[disease_ids]
+    return [
+        tuple(zip(ids, names, probabilities))
+        for ids, names, probabilities in zip(disease_ids.tolist(), diseases.tolist(), top_proba.tolist())
+    ]
+
+def match_stage(symptom_list, mapped_columns=None):
+    """Mapping stage: phrase mapping, the fuzzy fallback and feature lookup.
+
+    Returns (status, matched_columns, feature_indices), where status is None
+    when at least one model feature matched, else 'unrecognized' or 'no_match'.
+    """
+    outcome = 'extracted'
+    if mapped_columns is None:
+        # Map symptoms to dataset columns
+        started = time.perf_counter()
+        mapped_columns = map_symptoms_to_columns(symptom_list)
+        mapped = time.perf_counter()
+        _mapping_seconds.observe(mapped - started)
+        outcome = 'direct'
+        
+        if not mapped_columns:
+            # Try fuzzy matching as fallback
+            mapped_columns = fuzzy_match_columns(symptom_list)
+            _fuzzy_seconds.observe(time.perf_counter() - mapped)
+            outcome = 'fuzzy'
     
-    # Finally try direct column matches
-    for symptom in symptoms:
-        clean_symptom = symptom.lower().replace(' ', '_')
-        if clean_symptom in cols:
-            mapped_columns.append(clean_symptom)
+    if not mapped_columns:
+        MAPPING_OUTCOMES.labels('unrecognized').inc()
+        return 'unrecognized', [], []
     
-    return list(set(mapped_columns))  # Remove duplicates
+    # Resolve feature positions with the precomputed column -> index dict
+    final_matched_symptoms, feature_indices = resolve_feature_columns(mapped_columns)
+    MAPPING_OUTCOMES.labels(outcome if final_matched_symptoms else 'no_match').inc()
+    
+    # Counts only: symptom text and columns are patient data and stay out of the logs
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Matched symptoms", extra={
+            'symptom_count': len(symptom_list or ()),
+            'matched_count': len(final_matched_symptoms),
+        })
+    
+    if not final_matched_symptoms:
+        return 'no_match', [], []
+    return None, final_matched_symptoms, feature_indices
 
-def predict_disease(symptom_list, days=1):
-    global MODEL_LOADED, clf, le, cols, reduced_data, severity_dict, description_dict, precaution_dict
+def predict_stage(symptoms, final_matched_symptoms, feature_indices, days, top_k, estimator_name, model):
+    """Prediction stage: cache lookup, predict_proba and risk scoring for matched features"""
+    # The prediction depends only on the set of matched columns, not on the
+    # user's wording or column order, so that set is the cache key; the model
+    # class keeps entries from differently built estimators of one name apart
+    cache_key = (tuple(sorted(final_matched_symptoms)), days, top_k, estimator_name, type(model).__name__)
+    cached = prediction_cache.get(cache_key)
+    if cached is None and shared_cache is not None:
+        shared_key = SharedPredictionCache.make_key(cache_key)
+        shared = shared_cache.get(shared_key)
+        if shared is not None:
+            cached = PredictionResult.from_dict(shared)
+            prediction_cache.put(cache_key, cached)
+    annotate(cache_hit=cached is not None)
+    if cached is not None:
+        return replace(cached, symptoms=symptoms, matched_columns=tuple(final_matched_symptoms))
     
-    # Load model if not already loaded
-    if not MODEL_LOADED:
-        load_model()
+    # Make prediction straight from the feature buffer, no DataFrame involved;
+    # one predict_proba call yields every candidate
+    started = time.perf_counter()
+    row = feature_row(feature_indices)
+    built = time.perf_counter()
+    proba = model.predict_proba(row)
+    candidates = top_k_candidates(model, proba, top_k)[0]
+    _feature_seconds.observe(built - started)
+    _predict_seconds.observe(time.perf_counter() - built)
+    disease_id, predicted_disease, probability = candidates[0]
+    
+    # Calculate severity
+    severity_score, risk_level = assess_risk(final_matched_symptoms, days)
+    
+    result = PredictionResult(
+        'ok',
+        symptoms,
+        matched_columns=tuple(final_matched_symptoms),
+        disease_id=disease_id,
+        disease=predicted_disease,
+        probability=probability,
+        severity_score=severity_score,
+        risk_level=risk_level,
+        risk_category=risk_category(risk_level),
+        days=days,
+        estimator=estimator_name,
+        candidates=candidates,
+    )
+    prediction_cache.put(cache_key, result)
+    if shared_cache is not None:
+        shared_cache.put(shared_key, result.to_dict())
+    return result
+
+def analyze_symptoms(symptom_list, days=1, top_k=1, estimator=None, mapped_columns=None):
+    """Run inference for one symptom list and return a PredictionResult (no rendering).
+
+    The diagnosis comes from `estimator` ('tree', 'forest', 'naive_bayes' or
+    the 'signature' bitset index; the calibrated tree by default, for every top_k);
+    with top_k > 1 the result also carries the k most likely conditions.
+    `mapped_columns` passes dataset columns that were already extracted,
+    skipping phrase mapping and the fuzzy fallback.
+    """
+    result = _analyze_symptoms(symptom_list, days, top_k, estimator, mapped_columns)
+    PREDICTION_STATUSES.labels(result.status).inc()
+    return result
+
+def _analyze_symptoms(symptom_list, days, top_k, estimator, mapped_columns):
+    symptoms = tuple(symptom_list or ())
     
-    if not MODEL_LOADED:
-        return "❌ The AI model failed to load. Please check the data files and try again."
+    # Load model if not already loaded (blocks until the warm-up finishes)
+    if not ensure_model_loaded():
+        return PredictionResult('model_unavailable', symptoms, days=days, message=MODEL_ERROR)
     
-    if not symptom_list:
-        return "⚠️ Please provide some symptoms to analyze."
+    if not symptoms and mapped_columns is None:
+        return PredictionResult('no_symptoms', symptoms, days=days)
+    
+    # Raises ValueError for a bad top_k/estimator before any work is done
+    estimator_name, model = select_estimator(top_k, estimator)
     
     try:
-        print(f"Analyzing symptoms: {symptom_list}")
+        status, final_matched_symptoms, feature_indices = match_stage(symptom_list, mapped_columns)
+        if status is not None:
+            annotate(prediction_status=status)
+            return PredictionResult(status, symptoms, days=days, estimator=estimator_name)
+        result = predict_stage(symptoms, final_matched_symptoms, feature_indices, days, top_k, estimator_name, model)
+        annotate(prediction_status=result.status, estimator=estimator_name, top_k=top_k,
+                 matched_count=len(final_matched_symptoms))
+        return result
         
-        # Map symptoms to dataset columns
+    except Exception as e:
+        logger.exception("Error in analyze_symptoms", extra={'error_type': type(e).__name__})
+        return PredictionResult('error', symptoms, days=days, estimator=estimator_name, message=str(e))
+
+RENDERERS = {
+    'markdown': rendering.render_markdown,
+    'html': rendering.render_html,
+    'json': rendering.render_json,
+}
+
+def render_result(result, fmt='markdown'):
+    """Render a PredictionResult as 'markdown', 'html' or 'json' using the loaded disease tables"""
+    started = time.perf_counter()
+    rendered = _render_result(result, fmt)
+    _render_seconds.observe(time.perf_counter() - started)
+    return rendered
+
+def fragments_for(disease):
+    """Prebuilt DiseaseFragments of a disease; built on the spot for one the model does not know"""
+    fragments = disease_fragments.get(disease)
+    if fragments is None:
+        fragments = rendering.DiseaseFragments.build(disease, description_dict.get(disease), precaution_dict.get(disease))
+    return fragments
+
+def _render_result(result, fmt):
+    renderer = RENDERERS[fmt]
+    if not result.ok:
+        return renderer(result)
+    if fmt == 'json':
+        return renderer(result, fragments_for(result.disease))
+    
+    # Text replies depend only on these fields, never on the user's raw wording
+    cache_key = (fmt, result.disease, result.matched_columns, result.candidates[1:], result.risk_category)
+    text = render_cache.get(cache_key)
+    if text is None:
+        text = renderer(result, fragments_for(result.disease))
+        render_cache.put(cache_key, text)
+    return text
+
+def cache_stats():
+    stats = {'predictions': prediction_cache.stats(), 'rendered': render_cache.stats()}
+    if shared_cache is not None:
+        stats['shared'] = shared_cache.stats()
+    return stats
+
+def _cache_stat(field):
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items() if field in stats}
+
+# Read from the caches' own counters at scrape time, so they cost the request path nothing
+metrics.Callback('pulsepal_cache_hits_total', 'Cache hits', _cache_stat('hits'), ['cache'], type='counter')
+metrics.Callback('pulsepal_cache_misses_total', 'Cache misses', _cache_stat('misses'), ['cache'], type='counter')
+metrics.Callback('pulsepal_cache_evictions_total', 'Cache evictions', _cache_stat('evictions'), ['cache'], type='counter')
+metrics.Callback('pulsepal_cache_entries', 'Entries held by the in-process caches', _cache_stat('size'), ['cache'])
+metrics.Callback(
+    'pulsepal_model_state', 'Current model lifecycle state (1 for the active one)',
+    lambda: {(state,): int(MODEL_STATE == state) for state in (MODEL_NOT_LOADED, MODEL_LOADING, MODEL_READY, MODEL_FAILED)},
+    ['state'],
+)
+metrics.Callback(
+    'pulsepal_model_info', 'Version of the loaded model artifact',
+    lambda: {(MODEL_VERSION,): 1} if MODEL_VERSION else {}, ['version'],
+)
+
+def predict_disease(symptom_list, days=1):
+    """Analyze symptoms and return the markdown reply shown by the chatbot"""
+    return render_result(analyze_symptoms(symptom_list, days))
+
+def stream_analysis(symptom_list, days=1, top_k=1, estimator=None, mapped_columns=None, fmt='markdown'):
+    """Yield (event, data) pairs for one analysis as each stage of analyze_symptoms completes.
+
+    Events: 'symptoms' right after mapping, then 'prediction', 'description',
+    'precautions' and 'risk', and finally 'done' carrying the same
+    {'result', 'response'} payload /api/chatbot returns. Failures skip
+    straight to 'done'. Bad top_k/estimator values raise ValueError before
+    the first event, so callers can still answer with a 400.
+    """
+    symptoms = tuple(symptom_list or ())
+    estimator_name, model = select_estimator(top_k, estimator)
+
+    def done(result):
+        PREDICTION_STATUSES.labels(result.status).inc()
+        payload = {'result': render_result(result, 'json'), 'status': 'success'}
+        if fmt != 'json':
+            payload['response'] = render_result(result, fmt)
+        return 'done', payload
+
+    if not ensure_model_loaded():
+        yield done(PredictionResult('model_unavailable', symptoms, days=days, message=MODEL_ERROR))
+        return
+    if not symptoms and mapped_columns is None:
+        yield done(PredictionResult('no_symptoms', symptoms, days=days))
+        return
+
+    try:
+        status, final_matched_symptoms, feature_indices = match_stage(symptom_list, mapped_columns)
+        yield 'symptoms', {
+            'symptoms': list(symptoms),
+            'matched_columns': final_matched_symptoms,
+            'labels': [rendering.symptom_label(col) for col in final_matched_symptoms],
+        }
+        if status is not None:
+            yield done(PredictionResult(status, symptoms, days=days, estimator=estimator_name))
+            return
+        result = predict_stage(symptoms, final_matched_symptoms, feature_indices, days, top_k, estimator_name, model)
+    except Exception as e:
+        logger.exception("Error in stream_analysis", extra={'error_type': type(e).__name__})
+        yield done(PredictionResult('error', symptoms, days=days, estimator=estimator_name, message=str(e)))
+        return
+
+    yield 'prediction', result.to_dict()
+    fragments = fragments_for(result.disease)
+    yield 'description', {'disease': result.disease, 'description': fragments.description}
+    yield 'precautions', {'disease': result.disease, 'precautions': list(fragments.precautions)}
+    yield 'risk', {
+        'risk_category': result.risk_category,
+        'risk_level': result.risk_level,
+        'severity_score': result.severity_score,
+        'advice': rendering.RISK_ADVICE[result.risk_category],
+        'disclaimer': rendering.DISCLAIMER,
+    }
+    yield done(result)
+
+def suggest_followup_symptoms(symptom_list, k=5, mapped_columns=None):
+    """Signature-index view of a symptom list: exact matches, Jaccard-ranked
+    candidates and the unreported symptoms that would best tell them apart.
+    """
+    if not ensure_model_loaded():
+        raise RuntimeError(f"The AI model failed to load: {MODEL_ERROR}")
+    
+    if mapped_columns is None:
         mapped_columns = map_symptoms_to_columns(symptom_list)
+    matched, _ = resolve_feature_columns(mapped_columns)
+    query_bits = signature_index.encode(matched)
+    if not query_bits:
+        return {'matched_columns': [], 'exact_matches': [], 'candidates': [], 'ask_about': []}
+    
+    exact = signature_index.exact_matches(query_bits)
+    # Narrow to the diseases consistent with every symptom when there are several
+    if len(exact) > 1:
+        candidates = signature_index.encode_diseases(exact)
+    else:
+        candidates = signature_index.candidate_mask(query_bits)
+    
+    return {
+        'matched_columns': matched,
+        'exact_matches': exact,
+        'candidates': [
+            {'disease': disease, 'jaccard': jaccard, 'overlap': overlap}
+            for disease, jaccard, overlap in signature_index.rank(query_bits, k)
+        ],
+        'ask_about': [
+            {'symptom': col, 'label': rendering.symptom_label(col), 'diseases_with': with_symptom, 'diseases_without': without}
+            for col, with_symptom, without in signature_index.disambiguating_symptoms(query_bits, candidates, k)
+        ],
+    }
+
+# Rows per feature matrix in predict_batch; bounds peak memory for huge batches
+BATCH_CHUNK_SIZE = 8192
+
+def predict_batch(symptom_lists, days=1, top_k=1, estimator=None, mapped_columns=None):
+    """Score many symptom lists with one feature matrix and one predict_proba call per chunk.
+
+    `days` is either one duration for every list or a sequence with one per list;
+    `top_k` and `estimator` work as in analyze_symptoms. `mapped_columns`, when
+    given, is a parallel list whose entries are pre-extracted columns or None.
+    Returns one PredictionResult per input, in input order.
+    """
+    if not ensure_model_loaded():
+        raise RuntimeError(f"The AI model failed to load: {MODEL_ERROR}")
+    estimator_name, model = select_estimator(top_k, estimator)
+    
+    symptom_lists = [tuple(symptoms or ()) for symptoms in symptom_lists]
+    if isinstance(days, (list, tuple)):
+        days_list = list(days)
+        if len(days_list) != len(symptom_lists):
+            raise ValueError("days must be a single value or one value per symptom list")
+    else:
+        days_list = [days] * len(symptom_lists)
+    
+    if mapped_columns is None:
+        mapped_columns = [None] * len(symptom_lists)
+    elif len(mapped_columns) != len(symptom_lists):
+        raise ValueError("mapped_columns must have one entry per symptom list")
+    
+    # Repeated symptom combinations are the norm in historical records: map each once
+    resolved = {}
+    rows = []
+    for symptoms, premapped in zip(symptom_lists, mapped_columns):
+        key = (symptoms, tuple(premapped) if premapped is not None else None)
+        if key not in resolved:
+            if premapped is not None:
+                columns = list(premapped)
+            else:
+                columns = map_symptoms_to_columns(symptoms) or fuzzy_match_columns(symptoms)
+            matched, indices = resolve_feature_columns(columns)
+            if not symptoms and premapped is None:
+                status = 'no_symptoms'
+            elif not columns:
+                status = 'unrecognized'
+            else:
+                status = 'ok' if matched else 'no_match'
+            resolved[key] = (status, tuple(matched), indices)
+        rows.append(resolved[key])
+    
+    results = []
+    for symptoms, (status, matched, _), row_days in zip(symptom_lists, rows, days_list):
+        if status == 'no_symptoms':
+            results.append(PredictionResult(status, symptoms, days=row_days))
+            continue
+        if status != 'ok':
+            results.append(PredictionResult(status, symptoms, days=row_days, estimator=estimator_name))
+            continue
+        severity_score, risk_level = assess_risk(matched, row_days)
+        results.append(PredictionResult(
+            status,
+            symptoms,
+            matched_columns=matched,
+            severity_score=severity_score,
+            risk_level=risk_level,
+            risk_category=risk_category(risk_level),
+            days=row_days,
+            estimator=estimator_name,
+        ))
+    
+    scored = [i for i, row in enumerate(rows) if row[0] == 'ok']
+    for start in range(0, len(scored), BATCH_CHUNK_SIZE):
+        chunk = scored[start:start + BATCH_CHUNK_SIZE]
         
-        print(f"Mapped columns: {mapped_columns}")
-        
-        if not mapped_columns:
-            # Try fuzzy matching as fallback
-            matched_symptoms = []
-            for symptom in symptom_list:
-                clean_symptom = symptom.lower().replace(' ', '_')
-                for col in cols:
-                    if clean_symptom in col.lower() or any(word in col.lower() for word in clean_symptom.split('_')):
-                        matched_symptoms.append(col)
-                        break
-            
-            if not matched_symptoms:
-                common_symptoms = ['fever', 'headache', 'cough', 'fatigue', 'nausea', 'stomach pain', 'chest pain', 'back pain', 'joint pain', 'diarrhea']
-                return f"⚠️ Could not match your symptoms to our database.\n\nYou mentioned: {', '.join(symptom_list)}\n\nTry using common terms like: {', '.join(common_symptoms)}"
-            
-            mapped_columns = matched_symptoms
-        
-        # Create input vector
-        input_vector = np.zeros(len(cols))
-        final_matched_symptoms = []
-        
-        for symptom_col in mapped_columns:
-            if symptom_col in cols:
-                idx = list(cols).index(symptom_col)
-                input_vector[idx] = 1
-                final_matched_symptoms.append(symptom_col)
-        
-        print(f"Final matched symptoms: {final_matched_symptoms}")
-        
-        if not final_matched_symptoms:
-            return "⚠️ No symptoms could be matched to our medical database. Please try using different medical terminology."
-        
-        # Make prediction
-        input_df = pd.DataFrame([input_vector], columns=cols)
-        prediction = clf.predict(input_df)[0]
-        predicted_disease = le.inverse_transform([prediction])[0]
-        
-        print(f"Predicted disease: {predicted_disease}")
-        
-        # Build response
-        response = f"🩺 **Medical Analysis Results**\n\n"
-        response += f"**Possible Condition:** {predicted_disease}\n\n"
-        response += f"**Symptoms Analyzed:** {', '.join([s.replace('_', ' ').title() for s in final_matched_symptoms])}\n\n"
-        
-        # Add description
-        if predicted_disease in description_dict:
-            response += f"**About this condition:** {description_dict[predicted_disease]}\n\n"
-        
-        # Add precautions
-        if predicted_disease in precaution_dict:
-            response += "**Recommended Actions:**\n"
-            for i, precaution in enumerate(precaution_dict[predicted_disease], 1):
-                if precaution.strip():
-                    response += f"{i}. {precaution.strip()}\n"
-            response += "\n"
-        
-        # Calculate severity
-        severity_score = sum(severity_dict.get(sym.replace('_', ' '), 1) for sym in final_matched_symptoms)
-        risk_level = (severity_score * max(days, 1)) / (len(final_matched_symptoms) + 1)
-        
-        if risk_level > 10:
-            response += "🚨 **URGENT:** Based on symptom severity and duration, please seek immediate medical attention."
-        elif risk_level > 5:
-            response += "⚠️ **RECOMMENDATION:** Consider consulting a healthcare professional if symptoms persist or worsen."
-        else:
-            response += "ℹ️ **ADVICE:** Monitor your symptoms and follow the recommended actions. Seek medical care if symptoms worsen."
-        
-        response += "\n\n⚕️ **Medical Disclaimer:** This AI analysis is for informational purposes only and should not replace professional medical diagnosis or treatment. Always consult qualified healthcare professionals for medical concerns."
+        # Scatter every row's feature indices into one matrix in a single assignment
+        matrix = np.zeros((len(chunk), len(cols)), dtype=np.float32)
+        row_ids = np.repeat(np.arange(len(chunk)), [len(rows[i][2]) for i in chunk])
+        col_ids = np.fromiter(chain.from_iterable(rows[i][2] for i in chunk), dtype=np.intp, count=len(row_ids))
+        matrix[row_ids, col_ids] = 1
         
-        print("Response generated successfully")
-        return response
+        started = time.perf_counter()
+        proba = model.predict_proba(matrix)
+        _batch_predict_seconds.observe(time.perf_counter() - started)
         
-    except Exception as e:
-        print(f"Error in predict_disease: {e}")
-        import traceback
-        traceback.print_exc()
-        return f"❌ An error occurred during medical analysis: {str(e)}. Please try again or consult a healthcare professional immediately."
-
-# Initialize on import
-load_model()
+        for i, candidates in zip(chunk, top_k_candidates(model, proba, top_k)):
+            result = results[i]
+            result.disease_id, result.disease, result.probability = candidates[0]
+            result.candidates = candidates
+    
+    for status, count in Counter(result.status for result in results).items():
+        PREDICTION_STATUSES.labels(status).inc(count)
+    return results
 
 if __name__ == "__main__":
     print("Testing enhanced chatbot engine...")
@@ -0,0 +1,37 @@
+import secrets
+
+from . import db
+from .models import ChatbotTurn
+
+# Turns the /chatbot page shows at once; older ones load a window at a time
+HISTORY_WINDOW = 20
+MAX_PAGE_SIZE = 100
+MAX_MESSAGE_CHARS = 2000
+
+
+def new_conversation_id():
+    return secrets.token_urlsafe(16)
+
+
+def append_exchange(conversation_id, user_id, user_text, bot_text):
+    """Store a user message and the bot's reply in one commit"""
+    db.session.add_all([
+        ChatbotTurn(conversation_id=conversation_id, user_id=user_id, sender='user', text=user_text),
+        ChatbotTurn(conversation_id=conversation_id, user_id=user_id, sender='bot', text=bot_text),
+    ])
+    db.session.commit()
+
+
+def window(conversation_id, user_id, before_id=None, limit=HISTORY_WINDOW):
+    """Up to `limit` turns older than `before_id` (default: the latest), oldest first.
+
+    Returns (turns, older) where `older` is the id to pass as before_id for
+    the previous window, or None at the start of the conversation. One
+    range scan on (conversation_id, id), however long the conversation is.
+    """
+    query = ChatbotTurn.query.filter(ChatbotTurn.conversation_id == conversation_id, ChatbotTurn.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(ChatbotTurn.id < before_id)
+    turns = query.order_by(ChatbotTurn.id.desc()).limit(limit + 1).all()
+    older = turns[limit - 1].id if len(turns) > limit else None
+    return turns[:limit][::-1], older
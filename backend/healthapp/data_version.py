@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+
+from sqlalchemy import text
+
+from . import db
+
+# Tables whose writes bump a counter in `table_version`, so caches over them
+# are not invalidated by commits to busier tables (health records, chatbot turns)
+TRACKED_TABLES = ('chat_message',)
+
+
+class DataVersion:
+    """SQLite's PRAGMA data_version on a private read-only connection.
+
+    The value changes whenever any other connection, in this process or
+    another one, commits to the database file. Reading it touches no table,
+    so callers can tell "nothing changed" apart from "maybe changed" for a
+    few microseconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        # table -> (data version, table version) as last read
+        self._tables = {}
+
+    def table(self, name):
+        """Change counter of one tracked table, looked up only after some commit.
+
+        Falls back to the data version (any commit counts as a change) when
+        the table is not tracked in this database.
+        """
+        with self._lock:
+            version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            cached = self._tables.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            try:
+                row = self._conn.execute('SELECT version FROM table_version WHERE name = ?', (name,)).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            changes = ('table', row[0]) if row is not None else ('database', version)
+            self._tables[name] = (version, changes)
+            return changes
+
+
+# One connection per database file; never shared across fork()
+_versions = {}
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_versions.clear)
+
+
+def _for_app():
+    path = db.engine.url.database
+    version = _versions.get(path)
+    if version is None:
+        version = _versions.setdefault(path, DataVersion(path))
+    return version
+
+
+def table(name):
+    """Change marker of one of TRACKED_TABLES in the app's database"""
+    return _for_app().table(name)
+
+
+def track_changes(engine, tables=TRACKED_TABLES):
+    """Create `table_version` and the triggers that bump it; safe to run on every start"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS table_version (name TEXT PRIMARY KEY, version INTEGER NOT NULL)'))
+        for name in tables:
+            connection.execute(text('INSERT OR IGNORE INTO table_version (name, version) VALUES (:name, 0)'),
+                               {'name': name})
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                connection.execute(text(
+                    f'CREATE TRIGGER IF NOT EXISTS {name}_{operation.lower()}_version AFTER {operation} ON {name} '
+                    f"BEGIN UPDATE table_version SET version = version + 1 WHERE name = '{name}'; END"))
@@ -0,0 +1,81 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from .symptom_matcher import tokenize
+
+# Longer input is truncated so one query's cost is bounded
+MAX_QUERY_CHARS = 80
+
+
+def trigrams(text):
+    """Character trigrams of each word, padded the way pg_trgm pads them ("  p", " pa", ..., "in ")"""
+    grams = set()
+    for token in tokenize(text[:MAX_QUERY_CHARS]):
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyMatch(NamedTuple):
+    phrase: str
+    columns: tuple
+    score: float
+
+
+class FuzzyIndex:
+    """Trigram index over symptom phrases (column names and synonyms), built once.
+
+    Phrases and their trigrams form a dense trigram x phrase matrix, so scoring
+    a query against every phrase is one row gather and one column sum: the
+    cost depends on the query's trigram count, never on the order of the
+    columns. Scores are the Dice coefficient of the two trigram sets, in [0, 1].
+    """
+
+    __slots__ = ('phrases', 'columns', 'vocabulary', '_matrix', '_sizes')
+
+    def __init__(self, *tables):
+        entries = {}
+        for table in tables:
+            for phrase, values in table.items():
+                phrase = ' '.join(tokenize(phrase))
+                if not phrase:
+                    continue
+                columns = entries.setdefault(phrase, [])
+                for value in [values] if isinstance(values, str) else values:
+                    if value not in columns:
+                        columns.append(value)
+        # Sorted so equal scores always rank in the same order
+        self.phrases = sorted(entries)
+        self.columns = [tuple(entries[phrase]) for phrase in self.phrases]
+        grams = [trigrams(phrase) for phrase in self.phrases]
+        self.vocabulary = {gram: i for i, gram in enumerate(sorted(set().union(*grams)))}
+        self._matrix = np.zeros((len(self.vocabulary), len(self.phrases)), dtype=np.uint8)
+        for j, phrase_grams in enumerate(grams):
+            self._matrix[[self.vocabulary[gram] for gram in phrase_grams], j] = 1
+        self._sizes = np.array([len(phrase_grams) for phrase_grams in grams], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def search(self, text, limit=5, min_score=0.0):
+        """Best phrases for `text`, highest score first, one entry per distinct column set"""
+        query = trigrams(text)
+        rows = [self.vocabulary[gram] for gram in query if gram in self.vocabulary]
+        if not rows or not self.phrases:
+            return []
+        overlap = self._matrix[rows].sum(axis=0, dtype=np.float32)
+        scores = 2.0 * overlap / (len(query) + self._sizes)
+        candidates = np.flatnonzero((overlap > 0) & (scores >= min_score))
+        # Stable sort on -score keeps the alphabetical phrase order among ties
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        matches = []
+        seen = set()
+        for j in candidates.tolist():
+            if self.columns[j] in seen:
+                continue
+            seen.add(self.columns[j])
+            matches.append(FuzzyMatch(self.phrases[j], self.columns[j], round(float(scores[j]), 4)))
+            if len(matches) == limit:
+                break
+        return matches
@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from . import metrics
+from .models import HealthRecord
+
+logger = logging.getLogger(__name__)
+
+# Assessments waiting for the writer; a full queue means SQLite is falling behind
+QUEUE_SIZE = int(os.environ.get('PULSEPAL_HEALTH_RECORD_QUEUE', '10000'))
+# Rows per INSERT transaction
+BATCH_SIZE = int(os.environ.get('PULSEPAL_HEALTH_RECORD_BATCH', '500'))
+# How long the writer lets a batch fill after its first row, in seconds
+FLUSH_INTERVAL = float(os.environ.get('PULSEPAL_HEALTH_RECORD_FLUSH_SECONDS', '0.2'))
+# Longest close() waits for the queue to drain, in seconds
+CLOSE_TIMEOUT = 10.0
+WRITE_ATTEMPTS = 3
+
+# outcome: written, dropped (queue full), failed (the INSERT kept failing)
+HEALTH_RECORDS = metrics.Counter(
+    'pulsepal_health_records_total', 'Chatbot assessments by write-behind outcome', ['outcome'])
+_written = HEALTH_RECORDS.labels('written')
+_dropped = HEALTH_RECORDS.labels('dropped')
+_failed = HEALTH_RECORDS.labels('failed')
+FLUSH_SECONDS = metrics.Histogram(
+    'pulsepal_health_record_flush_seconds', 'Duration of one batched HealthRecord INSERT transaction',
+    buckets=metrics.REQUEST_BUCKETS)
+
+_STOP = object()
+
+
+def assessment_row(patient_id, result, model_version=None):
+    """HealthRecord column values for a PredictionResult.to_dict() (or the 'json' rendering)"""
+    ok = result['status'] == 'ok'
+    return {
+        'patient_id': patient_id,
+        'symptoms': json.dumps(result['symptoms']),
+        'diagnosis': result['disease'],
+        'matched_columns': json.dumps(result['matched_columns']),
+        'status': result['status'],
+        'probability': result['probability'] if ok else None,
+        'risk_level': result['risk_level'] if ok else None,
+        'risk_category': result['risk_category'] if ok else None,
+        'model_version': model_version,
+        # Stamped now, not when the batch lands
+        'created_at': datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+class HealthRecordWriter:
+    """Write-behind queue for HealthRecord rows.
+
+    Requests enqueue rows and return; one daemon thread inserts them in
+    batches of up to BATCH_SIZE with a single executemany per transaction,
+    so the request path never waits on SQLite's commit. close() (run at
+    exit and on ASGI shutdown) drains whatever is still queued.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.engine = None
+        self._reset()
+
+    def _reset(self):
+        # Threads do not survive fork(); a child starts its own writer on first use
+        self._queue = queue.Queue(self.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def bind(self, engine):
+        self.engine = engine
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='health-record-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, row):
+        """Queue one row without blocking; returns False (and counts a drop) if the queue is full"""
+        if self.engine is None:
+            raise RuntimeError("HealthRecordWriter is not bound to an engine")
+        self._ensure_thread()
+        try:
+            # Never blocks: this runs on request threads and on the ASGI event loop
+            self._queue.put_nowait(row)
+        except queue.Full:
+            _dropped.inc()
+            logger.warning("Health record queue full; assessment dropped", extra={'queue_depth': self.depth()})
+            return False
+        return True
+
+    def _next_batch(self):
+        """Block for one item, then collect more until the batch is full or flush_interval passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(HealthRecord.__table__.insert(), rows)
+            except Exception:
+                if attempt == WRITE_ATTEMPTS:
+                    _failed.inc(len(rows))
+                    logger.exception("Could not write health records", extra={'rows': len(rows)})
+                    return
+                # Usually "database is locked" while another connection commits
+                time.sleep(0.1 * attempt)
+                continue
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            _written.inc(len(rows))
+            return
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            rows = batch[:-1] if stop else batch
+            try:
+                if rows:
+                    self._write(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout=None):
+        """Wait until every queued row has been written (or given up on); False on timeout"""
+        done = self._queue.all_tasks_done
+        with done:
+            return done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Drain the queue and stop the writer thread; a later submit() starts a new one"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("Health record writer did not drain in time", extra={'queue_depth': self.depth()})
+
+
+writer = HealthRecordWriter()
+atexit.register(writer.close)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=writer._reset)
+metrics.Callback('pulsepal_health_record_queue_depth', 'Assessments waiting to be written', lambda: {(): writer.depth()})
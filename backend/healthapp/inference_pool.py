@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import functools
+import gc
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+
+class PoolSaturated(Exception):
+    """Raised when the wait queue is full or a request waited too long for a worker"""
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+class InferencePool:
+    """Bounded executor for running CPU-bound inference from async code.
+
+    At most `max_workers` jobs run at once. Further requests wait on the
+    event loop, in arrival order and without holding a thread, for a free
+    worker. That wait is the backpressure: once `max_pending` requests are
+    already waiting, or a request has waited `queue_timeout` seconds,
+    run() raises PoolSaturated so the server answers 503 instead of letting
+    the queue and tail latency grow without bound.
+    """
+
+    def __init__(self, max_workers=None, max_pending=1024, queue_timeout=5.0, executor=None, kind='thread'):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.kind = kind
+        self._executor = executor or ThreadPoolExecutor(self.max_workers, thread_name_prefix='inference')
+        self.worker_pids = []
+        # Created on first use so it belongs to the server's event loop
+        self._slots = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+
+    @classmethod
+    def with_processes(cls, max_workers=None, **options):
+        """Pool of worker processes forked from this one, sharing its memory copy-on-write.
+
+        Load the model before calling this: every worker is forked here, at
+        once, and inherits whatever the parent holds, so the artifact, the
+        DataFrames and the estimators exist once per node rather than once
+        per worker.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        # Move every live object to the permanent generation: the collector
+        # would otherwise write to their headers in each child and turn the
+        # shared model pages into private copies
+        gc.freeze()
+        executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('fork'))
+        pool = cls(max_workers, executor=executor, kind='process', **options)
+        # With fork, the first submit starts every worker at once
+        executor.submit(_worker_pid, None).result()
+        pool.worker_pids = sorted(executor._processes)
+        return pool
+
+    @classmethod
+    def from_environ(cls, before_fork=None):
+        """Build the pool from PULSEPAL_INFERENCE_EXECUTOR ('thread' or 'process'),
+        PULSEPAL_INFERENCE_WORKERS, _QUEUE and _QUEUE_TIMEOUT.
+
+        `before_fork` runs first in process mode, typically to load the model.
+        """
+        kind = os.environ.get('PULSEPAL_INFERENCE_EXECUTOR', 'thread')
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"PULSEPAL_INFERENCE_EXECUTOR must be one of {', '.join(EXECUTOR_KINDS)}")
+        workers = int(os.environ.get('PULSEPAL_INFERENCE_WORKERS', '0')) or None
+        options = {
+            'max_pending': int(os.environ.get('PULSEPAL_INFERENCE_QUEUE', '1024')),
+            'queue_timeout': float(os.environ.get('PULSEPAL_INFERENCE_QUEUE_TIMEOUT', '5')),
+        }
+        if kind == 'process':
+            if before_fork is not None:
+                before_fork()
+            return cls.with_processes(workers, **options)
+        return cls(workers, **options)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a worker once one is free and await its result"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self._slots.locked():
+            if self.waiting >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.waiting} requests already waiting for an inference worker")
+        self.waiting += 1
+        queued = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise PoolSaturated(f"no inference worker free within {self.queue_timeout}s")
+        finally:
+            self.waiting -= 1
+        self.wait_seconds += time.monotonic() - queued
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(fn, *args, **kwargs)
+            if self.kind == 'thread':
+                # Carry the request's logging context (request id, annotations) into the worker
+                call = functools.partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'worker_pids': self.worker_pids,
+            'max_pending': self.max_pending,
+            'queue_timeout': self.queue_timeout,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'mean_wait_ms': round(self.wait_seconds / self.completed * 1e3, 3) if self.completed else 0.0,
+        }
@@ -0,0 +1,177 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+
+# Everything under the `healthapp` logger is routed through one queue
+ROOT_LOGGER = 'healthapp'
+
+# Structured fields a record may carry (via `extra=`), emitted as JSON keys
+FIELDS = (
+    'request_id', 'method', 'path', 'status', 'latency_ms', 'cache_hit', 'prediction_status',
+    'estimator', 'top_k', 'symptom_count', 'matched_count', 'model_version', 'features',
+    'diseases', 'accuracy', 'load_seconds', 'error_type', 'queue_depth', 'rows',
+)
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+# Per-request fields collected along the way and emitted with the access log line
+request_fields_var = contextvars.ContextVar('request_fields', default=None)
+
+_listener = None
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any structured fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request id"""
+
+    def filter(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; warnings and errors always pass.
+
+    The decision is made per request id, so a sampled request keeps all of
+    its log lines and a dropped one loses all of them.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        request_id = getattr(record, 'request_id', None)
+        if request_id is None:
+            return random.random() < self.rate
+        return zlib.crc32(request_id.encode()) % 10000 < self.rate * 10000
+
+
+class _EnqueueHandler(QueueHandler):
+    # QueueHandler.prepare formats the record on the caller's thread; the
+    # listener thread does that here, so logging costs the request one put()
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level=None, sample_rate=None, stream=None):
+    """Route `healthapp.*` loggers through a queue to a JSON stream handler.
+
+    PULSEPAL_LOG_LEVEL (default INFO) and PULSEPAL_LOG_SAMPLE_RATE (default
+    1.0, the fraction of requests whose info/debug lines are kept) apply
+    when the arguments are omitted. Safe to call more than once.
+    """
+    global _listener, _handler
+    level = level or os.environ.get('PULSEPAL_LOG_LEVEL', 'INFO')
+    if sample_rate is None:
+        sample_rate = float(os.environ.get('PULSEPAL_LOG_SAMPLE_RATE', '1.0'))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    _handler = _EnqueueHandler(queue.SimpleQueue())
+    _handler.addFilter(ContextFilter())
+    _handler.addFilter(SamplingFilter(sample_rate))
+    logger.addHandler(_handler)
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def shutdown_logging():
+    """Flush queued records; registered with atexit"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    # The listener thread does not survive fork(): give the child a fresh
+    # queue and listener, or its records would pile up unwritten
+    global _listener
+    if _listener is not None:
+        _handler.queue = queue.SimpleQueue()
+        _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def begin_request(request_id=None):
+    """Start the logging context of one request; returns (request_id, start time).
+
+    A caller-supplied id (e.g. an X-Request-ID header) is kept when it is short
+    and alphanumeric, so requests can be traced across services.
+    """
+    if not (request_id and len(request_id) <= 64 and request_id.replace('-', '').isalnum()):
+        request_id = new_request_id()
+    request_id_var.set(request_id)
+    request_fields_var.set({})
+    return request_id, time.perf_counter()
+
+
+def annotate(**fields):
+    """Attach structured fields to the current request's access log line (no-op outside a request)"""
+    current = request_fields_var.get()
+    if current is not None:
+        current.update(fields)
+
+
+def end_request(logger, started, method, path, status):
+    """Emit the access log line for the current request with its collected fields, then clear the context"""
+    fields = request_fields_var.get() or {}
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('request', extra={
+            'method': method,
+            'path': path,
+            'status': status,
+            'latency_ms': round((time.perf_counter() - started) * 1e3, 3),
+            **fields,
+        })
+    request_fields_var.set(None)
+    request_id_var.set(None)
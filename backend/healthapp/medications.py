@@ -0,0 +1,358 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import func
+
+from . import db
+from .models import Medication, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Longest window /api/medications/due expands, in hours
+MAX_DUE_HOURS = 24 * 7
+DAY = 24 * 60
+# Clock time of the first dose when the prescription names none
+FIRST_DOSE = 8 * 60
+# Default clock times for "N times a day"
+DAILY_TIMES = {
+    1: (8 * 60,),
+    2: (8 * 60, 20 * 60),
+    3: (8 * 60, 14 * 60, 20 * 60),
+    4: (8 * 60, 12 * 60, 16 * 60, 20 * 60),
+}
+NAMED_TIMES = {
+    'morning': 8 * 60, 'breakfast': 8 * 60, 'qam': 8 * 60,
+    'noon': 12 * 60, 'midday': 12 * 60, 'lunch': 12 * 60,
+    'evening': 20 * 60, 'dinner': 20 * 60, 'supper': 20 * 60, 'qpm': 20 * 60,
+    'night': 22 * 60, 'nightly': 22 * 60, 'bedtime': 22 * 60, 'qhs': 22 * 60,
+}
+COUNT_WORDS = {'once': 1, 'twice': 2, 'thrice': 3, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+# Latin abbreviations -> doses per day
+ABBREVIATIONS = {'qd': 1, 'od': 1, 'bid': 2, 'bd': 2, 'tid': 3, 'tds': 3, 'qid': 4, 'qds': 4}
+UNIT_MINUTES = {'h': 60, 'hr': 60, 'hrs': 60, 'hour': 60, 'hours': 60,
+                'd': DAY, 'day': DAY, 'days': DAY, 'week': 7 * DAY, 'weeks': 7 * DAY}
+
+_AS_NEEDED_RE = re.compile(r'\b(prn|as needed|when needed|if needed|as required)\b')
+_CLOCK_RE = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b')
+_INTERVAL_RE = re.compile(r'\b(?:every|q)\s*(\d+)(?:\s*(?:-|to)\s*\d+)?\s*(hours|hour|hrs|hr|h|days|day|d|weeks|week)\b')
+_COUNT_RE = re.compile(r'\b(once|twice|thrice|(?:\d+|one|two|three|four|five|six)\s*(?:x|times))\s*'
+                       r'(?:a|per|each|every)?\s*(day|daily|week|weekly)?\b')
+
+
+class Schedule(NamedTuple):
+    """Doses at `offsets` minutes past the start date's midnight, repeating every `period` minutes.
+
+    Clock times are naive UTC, like appointment times. Daily regimens are
+    normalised to a one-day period, so "q12h", "bid" and "8am and 8pm" are
+    the same Schedule.
+    """
+    period: int
+    offsets: tuple
+    as_needed: bool = False
+
+    def to_dict(self):
+        return {
+            'as_needed': self.as_needed,
+            'period_minutes': self.period,
+            'offsets_minutes': list(self.offsets),
+            'times': [f'{offset % DAY // 60:02d}:{offset % 60:02d}' for offset in self.offsets],
+            'doses_per_day': round(len(self.offsets) * DAY / self.period, 2) if self.period else 0,
+        }
+
+
+AS_NEEDED = Schedule(0, (), True)
+
+
+def _clock_times(text):
+    times = set()
+    for hour, minute, meridiem, hour24, minute24 in _CLOCK_RE.findall(text):
+        if meridiem:
+            hour, minute = int(hour), int(minute or 0)
+            if not 1 <= hour <= 12:
+                raise ValueError(f"Invalid time of day in frequency: {text!r}")
+            hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+        else:
+            hour, minute = int(hour24), int(minute24)
+        if hour > 23 or minute > 59:
+            raise ValueError(f"Invalid time of day in frequency: {text!r}")
+        times.add(hour * 60 + minute)
+    times.update(minute for word, minute in NAMED_TIMES.items() if re.search(rf'\b{word}\b', text))
+    return sorted(times)
+
+
+def _daily(count):
+    if count in DAILY_TIMES:
+        return DAILY_TIMES[count]
+    step = DAY // count
+    return tuple(sorted((FIRST_DOSE + i * step) % DAY for i in range(count)))
+
+
+def _normalise(period, offsets):
+    """Fold sub-daily periods that divide a day into an explicit list of daily times"""
+    if period < DAY and DAY % period == 0:
+        offsets = {(offset + k * period) % DAY for offset in offsets for k in range(DAY // period)}
+        period = DAY
+    return Schedule(period, tuple(sorted(offsets)))
+
+
+def parse_frequency(frequency):
+    """Free-text prescription frequency -> Schedule; raises ValueError when it names no schedule.
+
+    Understands counts ("twice daily", "3 times a day", "bid", "twice a
+    week"), intervals ("every 8 hours", "q6h", "every other day", "weekly"),
+    clock times ("at 9am and 9pm", "08:00", "at bedtime") and "as needed".
+    """
+    if not isinstance(frequency, str) or not frequency.strip():
+        raise ValueError("frequency is required")
+    text = re.sub(r'\b([ap])\.\s*m\b\.?', r'\1m', frequency.lower())
+    text = ' '.join(re.sub(r'[^a-z0-9:\s-]', ' ', text).split())
+    if _AS_NEEDED_RE.search(text):
+        return AS_NEEDED
+
+    times = _clock_times(text)
+    interval = _INTERVAL_RE.search(text)
+    if interval:
+        period = int(interval.group(1)) * UNIT_MINUTES[interval.group(2)]
+        if period < 60:
+            raise ValueError(f"Doses must be at least an hour apart: {frequency!r}")
+        if period < DAY:
+            return _normalise(period, times[:1] or [FIRST_DOSE % period])
+        return _normalise(period, times or [FIRST_DOSE])
+
+    if re.search(r'\b(every other day|alternate days|qod)\b', text):
+        days = 2
+    elif re.search(r'\b(weekly|once a week|every week)\b', text):
+        days = 7
+    else:
+        days = 1
+
+    count = None
+    match = _COUNT_RE.search(text)
+    if match:
+        word = match.group(1).split()[0].rstrip('x')
+        count = int(word) if word.isdigit() else COUNT_WORDS[word]
+        if match.group(2) in ('week', 'weekly'):
+            if not 1 <= count <= 7:
+                raise ValueError(f"Unsupported frequency: {frequency!r}")
+            # Spread over the week, at the first dose time of each chosen day
+            first = times[0] if times else FIRST_DOSE
+            return Schedule(7 * DAY, tuple(i * 7 // count * DAY + first for i in range(count)))
+    else:
+        count = next((per_day for word, per_day in ABBREVIATIONS.items() if re.search(rf'\b{word}\b', text)), None)
+    if count is not None and not 1 <= count <= 24:
+        raise ValueError(f"Unsupported frequency: {frequency!r}")
+
+    if times:
+        return Schedule(days * DAY, tuple(times))
+    if count is not None:
+        return Schedule(days * DAY, _daily(count))
+    if days > 1 or re.search(r'\b(daily|every day|each day|a day|per day)\b', text):
+        return Schedule(days * DAY, (FIRST_DOSE,))
+    raise ValueError(f"Unrecognised frequency: {frequency!r}")
+
+
+@lru_cache(maxsize=4096)
+def cached_schedule(frequency):
+    """parse_frequency for stored rows; None when the text names no schedule.
+
+    Prescriptions reuse a handful of phrasings, so a MedicationView over
+    many rows parses each distinct one once.
+    """
+    try:
+        return parse_frequency(frequency)
+    except ValueError:
+        return None
+
+
+def schedule_dict(frequency):
+    schedule = cached_schedule(frequency)
+    return None if schedule is None else schedule.to_dict()
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def utc_today():
+    return utc_now().date()
+
+
+def parse_date(value, field):
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be an ISO 8601 date string")
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{field} must be an ISO 8601 date string") from None
+
+
+EPOCH = date(1970, 1, 1).toordinal()
+# End of an open-ended prescription, in epoch minutes
+OPEN_END = np.iinfo(np.int64).max // 2
+
+
+def to_minutes(when):
+    """datetime -> whole minutes since 1970-01-01"""
+    return (when.toordinal() - EPOCH) * DAY + when.hour * 60 + when.minute + (1 if when.second or when.microsecond else 0)
+
+
+class Dose(NamedTuple):
+    due_at: datetime
+    medication_id: int
+    patient_id: int
+
+
+class DueDoses(NamedTuple):
+    """Expanded doses as parallel arrays, sorted by (due, patient, medication); `due` is in epoch minutes"""
+    due: np.ndarray
+    medication_ids: np.ndarray
+    patient_ids: np.ndarray
+
+    def __len__(self):
+        return len(self.due)
+
+    def doses(self):
+        epoch = datetime(1970, 1, 1)
+        return [Dose(epoch + timedelta(minutes=int(due)), int(medication_id), int(patient_id))
+                for due, medication_id, patient_id in zip(self.due, self.medication_ids, self.patient_ids)]
+
+
+class MedicationView:
+    """Active medications grouped by schedule, as numpy columns ready to expand.
+
+    Built from active_rows: (id, patient_id, frequency, start day, end day)
+    with days counted from 1970-01-01. Rows are grouped by the parsed
+    schedule of their frequency text, so dose times for a window are a few
+    vector operations per group, whatever the number of patients.
+    """
+
+    def __init__(self, rows):
+        self.groups = []
+        self.medications = self.unscheduled = 0
+        if not rows:
+            return
+        ids, patient_ids, frequencies, start_days, end_days = zip(*rows)
+        texts = {}
+        codes = np.fromiter((texts.setdefault(text, len(texts)) for text in frequencies), dtype=np.int64, count=len(rows))
+        table = np.array([
+            ids,
+            patient_ids,
+            start_days,
+            [OPEN_END // DAY if day is None else day + 1 for day in end_days],
+        ], dtype=np.int64).T
+        table[:, 2:] *= DAY
+
+        by_schedule = {}
+        for text, code in texts.items():
+            schedule = cached_schedule(text)
+            if schedule is None:
+                self.unscheduled += int(np.count_nonzero(codes == code))
+            elif not schedule.as_needed:
+                by_schedule.setdefault(schedule, []).append(code)
+        for schedule, schedule_codes in by_schedule.items():
+            members = table[np.isin(codes, schedule_codes)]
+            self.groups.append((schedule, members))
+            self.medications += len(members)
+
+    def due(self, start, end):
+        """Doses due in [start, end) as DueDoses"""
+        window_start, window_end = to_minutes(start), to_minutes(end)
+        due, medication_ids, patient_ids = [], [], []
+        for schedule, members in self.groups:
+            period = schedule.period
+            first, last = members[:, 2], members[:, 3]
+            stop = np.minimum(last, window_end)
+            # Most doses one offset can have in the window
+            repeats = -(-(window_end - window_start) // period) + 1
+            for offset in schedule.offsets:
+                anchor = first + offset
+                # First repetition at or after the window start, never before the start date
+                k = np.maximum(-(-(window_start - anchor) // period), 0)
+                times = anchor + k * period
+                for _ in range(repeats):
+                    hit = np.flatnonzero(times < stop)
+                    if not len(hit):
+                        break
+                    due.append(times[hit])
+                    medication_ids.append(members[hit, 0])
+                    patient_ids.append(members[hit, 1])
+                    times = times + period
+        if not due:
+            empty = np.empty(0, dtype=np.int64)
+            return DueDoses(empty, empty, empty)
+        due, medication_ids, patient_ids = np.concatenate(due), np.concatenate(medication_ids), np.concatenate(patient_ids)
+        order = np.lexsort((medication_ids, patient_ids, due))
+        return DueDoses(due[order], medication_ids[order], patient_ids[order])
+
+
+def _epoch_day(column):
+    # Days since 1970-01-01, computed by SQLite so the rows skip date parsing
+    return db.cast(func.julianday(column) - 2440587.5, db.Integer)
+
+
+_VIEW_COLUMNS = (Medication.id, Medication.patient_id, Medication.frequency,
+                 _epoch_day(Medication.start_date), _epoch_day(Medication.end_date))
+
+
+def active_rows(since, patient_id=None, doctor_id=None):
+    """One query: active medications not finished before `since`"""
+    query = db.session.query(*_VIEW_COLUMNS).filter(
+        Medication.is_active == db.true(),
+        (Medication.end_date == None) | (Medication.end_date >= since),  # noqa: E711
+    )
+    if patient_id is not None:
+        query = query.filter(Medication.patient_id == patient_id)
+    if doctor_id is not None:
+        query = query.filter(Medication.doctor_id == doctor_id)
+    return query.all()
+
+
+def due_for(start, hours=24, patient_id=None, doctor_id=None):
+    """Doses due in the window for one patient's or one prescriber's active medications"""
+    view = MedicationView(active_rows(start.date(), patient_id, doctor_id))
+    return view.due(start, start + timedelta(hours=hours))
+
+
+def list_medications(user_id, as_doctor=False, patient_id=None, include_inactive=False,
+                     before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of a user's medications, newest first, older than `before_id`"""
+    query = Medication.query.filter((Medication.doctor_id if as_doctor else Medication.patient_id) == user_id)
+    if as_doctor and patient_id is not None:
+        query = query.filter(Medication.patient_id == patient_id)
+    if not include_inactive:
+        query = query.filter(Medication.is_active == db.true())
+    if before_id is not None:
+        query = query.filter(Medication.id < before_id)
+    return query.order_by(Medication.id.desc()).limit(limit).all()
+
+
+def prescribe(doctor_id, data):
+    """Insert an active medication from a request body; raises ValueError for bad input"""
+    patient_id = data.get('patient_id')
+    if not isinstance(patient_id, int):
+        raise ValueError("patient_id must be an integer")
+    patient = db.session.get(User, patient_id)
+    if patient is None or patient.role != 'patient':
+        raise ValueError("patient_id does not name a patient")
+    fields = {}
+    for field, size in (('medication_name', 200), ('dosage', 100), ('frequency', 100)):
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"{field} is required")
+        if len(value) > size:
+            raise ValueError(f"{field} is limited to {size} characters")
+        fields[field] = value.strip()
+    parse_frequency(fields['frequency'])
+    start_date = parse_date(data['start_date'], 'start_date') if 'start_date' in data else utc_today()
+    end_date = parse_date(data['end_date'], 'end_date') if data.get('end_date') is not None else None
+    if end_date is not None and end_date < start_date:
+        raise ValueError("end_date must not be before start_date")
+
+    medication = Medication(patient_id=patient_id, doctor_id=doctor_id, start_date=start_date, end_date=end_date,
+                            instructions=data.get('instructions'), is_active=True, **fields)
+    db.session.add(medication)
+    db.session.commit()
+    return medication
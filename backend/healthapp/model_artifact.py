@@ -0,0 +1,361 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import NamedTuple
+
+from .signature_index import SignatureIndex
+
+logger = logging.getLogger(__name__)
+
+# Define absolute paths to data and the persisted artifact
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'Data')
+ARTIFACT_PATH = os.path.join(BASE_DIR, 'model', 'chatbot_engine.joblib')
+
+# Bump when the layout of the artifact dict changes so old files get rebuilt
+ARTIFACT_FORMAT = 4
+
+# Every file that feeds into the artifact; a change to any of them forces a rebuild
+SOURCE_FILES = [
+    'Training.csv',
+    'Testing.csv',
+    'Symptom_severity.csv',
+    'symptom_Description.csv',
+    'symptom_precaution.csv',
+]
+
+RANDOM_STATE = 42
+
+# Estimators available for top-k differential diagnosis
+TOP_K_ESTIMATORS = ('tree', 'forest', 'naive_bayes', 'signature')
+
+# Simulated patient reports per training row, used to fit and calibrate the
+# top-k estimators on the sparse symptom sets users actually type
+PARTIAL_REPORT_REPEATS = 3
+PARTIAL_REPORT_MAX_SYMPTOMS = 4
+
+
+def simulate_partial_reports(x, y, rng, repeats=PARTIAL_REPORT_REPEATS, max_symptoms=PARTIAL_REPORT_MAX_SYMPTOMS):
+    """Keep a random 1..max_symptoms subset of each row's symptoms, `repeats` times per row"""
+    import numpy as np
+
+    rows = np.zeros((len(x) * repeats, x.shape[1]), dtype=x.dtype)
+    labels = np.tile(y, repeats)
+    present = [np.flatnonzero(row) for row in x]
+    for r in range(repeats):
+        for i, on in enumerate(present):
+            if not len(on):
+                continue
+            k = rng.integers(1, min(max_symptoms, len(on)) + 1)
+            rows[r * len(x) + i, rng.choice(on, k, replace=False)] = 1
+    return rows, labels
+
+
+def build_top_k_estimators(clf, x, y, x_partial, y_partial):
+    """Probability models for top-k mode, keyed by the names in TOP_K_ESTIMATORS.
+
+    The single tree only ever emits 0/1 probabilities, so it is wrapped with a
+    sigmoid calibrator fitted on partial reports. The forest and naive Bayes are
+    trained on full rows plus partial reports, which already gives them graded,
+    well-calibrated scores (lower log-loss than with an extra calibrator).
+    """
+    import numpy as np
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.frozen import FrozenEstimator
+    from sklearn.naive_bayes import MultinomialNB
+
+    x_all = np.vstack([x, x_partial])
+    y_all = np.concatenate([y, y_partial])
+
+    calibrated_tree = CalibratedClassifierCV(FrozenEstimator(clf), method='sigmoid')
+    calibrated_tree.fit(x_partial, y_partial)
+
+    # Small, shallow-leaved forest keeps the artifact a few MB and predict_proba ~ms
+    forest = RandomForestClassifier(n_estimators=30, min_samples_leaf=5, random_state=RANDOM_STATE)
+    forest.fit(x_all, y_all)
+
+    naive_bayes = MultinomialNB()
+    naive_bayes.fit(x_all, y_all)
+
+    return {'tree': calibrated_tree, 'forest': forest, 'naive_bayes': naive_bayes}
+
+
+def score_estimators(estimators, x_eval, y_eval, k=3):
+    """Top-1, top-k accuracy and log-loss of each estimator on held-out partial reports"""
+    import numpy as np
+    from sklearn.metrics import log_loss
+
+    metrics = {}
+    for name, estimator in estimators.items():
+        proba = estimator.predict_proba(x_eval)
+        top = estimator.classes_[np.argsort(proba, axis=1)[:, -k:]]
+        metrics[name] = {
+            'top1_accuracy': float((estimator.classes_[proba.argmax(axis=1)] == y_eval).mean()),
+            f'top{k}_accuracy': float((top == y_eval[:, None]).any(axis=1).mean()),
+            'log_loss': float(log_loss(y_eval, proba, labels=estimator.classes_)),
+        }
+    return metrics
+
+
+def hash_sources(data_dir=DATA_DIR):
+    """Content hash of the source CSVs the artifact is built from"""
+    digest = hashlib.sha256()
+    digest.update(f"format={ARTIFACT_FORMAT}".encode())
+    for name in SOURCE_FILES:
+        path = os.path.join(data_dir, name)
+        digest.update(name.encode())
+        if not os.path.exists(path):
+            digest.update(b'<missing>')
+            continue
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TrainingData(NamedTuple):
+    columns: list
+    # (rows, symptoms) uint8 0/1 matrix
+    matrix: object
+    # Disease name of each row
+    labels: object
+
+
+def training_cache_paths(csv_path):
+    """Binary copy of a training CSV: the uint8 matrix (.npy) and its columns/labels (.json)"""
+    return f"{csv_path}.uint8.npy", f"{csv_path}.meta.json"
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unique_columns(names):
+    # Same renaming as pandas.read_csv: a repeated name gets ".1", ".2", ...
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(f"{name}.{count}" if count else name)
+    return unique
+
+
+def parse_training_csv(path):
+    """Parse a symptom-matrix CSV (0/1 columns, label last) straight into uint8.
+
+    Rows of single-digit fields are decoded in one vectorized pass over the
+    raw bytes; any other layout goes through pandas with uint8 columns.
+    """
+    import numpy as np
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    header, *lines = raw.decode().splitlines()
+    columns = _unique_columns(next(csv.reader([header])))
+    features = columns[:-1]
+    width = 2 * len(features)
+    lines = [line for line in lines if line]
+    fixed = b''.join(line[:width].encode() for line in lines)
+    if len(fixed) == width * len(lines):
+        cells = np.frombuffer(fixed, dtype=np.uint8).reshape(len(lines), width)
+        digits = cells[:, ::2] - ord('0')
+        labels = [line[width:] for line in lines]
+        if (cells[:, 1::2] == ord(',')).all() and (digits <= 1).all() and not any('"' in label for label in labels):
+            return TrainingData(features, digits, np.array(labels, dtype=object))
+
+    import pandas as pd
+
+    training = pd.read_csv(path, dtype={col: np.uint8 for col in features})
+    return TrainingData(features, training[features].to_numpy(), training[columns[-1]].to_numpy())
+
+
+def read_training_data(data_dir=DATA_DIR, name='Training.csv'):
+    """The training matrix as TrainingData, reusing the binary copy while the CSV is unchanged.
+
+    The .npy is memory-mapped, so a warm load neither parses text nor
+    copies the matrix. A cache that cannot be written (read-only data
+    directory) only costs the parse.
+    """
+    import numpy as np
+
+    csv_path = os.path.join(data_dir, name)
+    matrix_path, meta_path = training_cache_paths(csv_path)
+    source_hash = _file_hash(csv_path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('source_hash') == source_hash:
+            matrix = np.load(matrix_path, mmap_mode='r')
+            return TrainingData(meta['columns'], matrix, np.array(meta['labels'], dtype=object))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    data = parse_training_csv(csv_path)
+    try:
+        suffix = f".{os.getpid()}.tmp"
+        with open(matrix_path + suffix, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data.matrix, dtype=np.uint8))
+        with open(meta_path + suffix, 'w') as f:
+            json.dump({'source_hash': source_hash, 'columns': data.columns, 'labels': data.labels.tolist()}, f)
+        # Matrix first: a reader only trusts the .npy once the meta names its hash
+        os.replace(matrix_path + suffix, matrix_path)
+        os.replace(meta_path + suffix, meta_path)
+    except OSError as e:
+        logger.warning("Could not cache training matrix next to %s: %s", csv_path, e)
+    return data
+
+
+def read_severity_table(data_dir=DATA_DIR):
+    severity = {}
+    severity_file = os.path.join(data_dir, 'Symptom_severity.csv')
+    if os.path.exists(severity_file):
+        with open(severity_file) as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header if present
+            for rows in reader:
+                if len(rows) >= 2:
+                    try:
+                        severity[rows[0]] = int(rows[1])
+                    except ValueError:
+                        severity[rows[0]] = 1
+    return severity
+
+
+def read_description_table(data_dir=DATA_DIR):
+    descriptions = {}
+    description_file = os.path.join(data_dir, 'symptom_Description.csv')
+    if os.path.exists(description_file):
+        with open(description_file) as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header if present
+            for rows in reader:
+                if len(rows) >= 2:
+                    descriptions[rows[0]] = rows[1]
+    return descriptions
+
+
+def read_precaution_table(data_dir=DATA_DIR):
+    precautions_by_disease = {}
+    precaution_file = os.path.join(data_dir, 'symptom_precaution.csv')
+    if os.path.exists(precaution_file):
+        with open(precaution_file) as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header if present
+            for rows in reader:
+                if len(rows) >= 2:
+                    precautions = [p.strip() for p in rows[1:] if p.strip()]
+                    if precautions:
+                        precautions_by_disease[rows[0]] = precautions
+    return precautions_by_disease
+
+
+def build_artifact(data_dir=DATA_DIR, source_hash=None):
+    """Train the engine from the CSVs and return the artifact dict"""
+    import numpy as np
+    import pandas as pd
+    from sklearn import preprocessing, tree
+    from sklearn.model_selection import train_test_split
+
+    if source_hash is None:
+        source_hash = hash_sources(data_dir)
+
+    training = read_training_data(data_dir)
+
+    cols = training.columns
+    # Fit on a plain float32 array so the engine can predict from a NumPy row
+    # without wrapping it in a DataFrame to satisfy feature-name checks
+    x = training.matrix.astype(np.float32)
+    y = training.labels
+
+    # Label encoding
+    le = preprocessing.LabelEncoder()
+    y_encoded = le.fit_transform(y)
+
+    # Train/test split
+    x_train, x_test, y_train, y_test = train_test_split(x, y_encoded, test_size=0.33, random_state=RANDOM_STATE)
+
+    # Seeded so the same CSVs always produce the same tree
+    clf = tree.DecisionTreeClassifier(random_state=RANDOM_STATE)
+    clf.fit(x_train, y_train)
+    accuracy = clf.score(x_test, y_test)
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    x_partial, y_partial = simulate_partial_reports(x, y_encoded, rng)
+    x_eval, y_eval = simulate_partial_reports(x, y_encoded, rng, repeats=1)
+    estimators = build_top_k_estimators(clf, x, y_encoded, x_partial, y_partial)
+
+    reduced_data = pd.DataFrame(training.matrix, columns=cols).groupby(pd.Index(y, name='prognosis')).max()
+    # Per-disease symptom bitsets: exact-match / Jaccard ranking without pandas
+    estimators['signature'] = SignatureIndex.from_reduced_data(reduced_data, cols, le)
+
+    return {
+        'format': ARTIFACT_FORMAT,
+        'source_hash': source_hash,
+        'model_version': f"{ARTIFACT_FORMAT}-{source_hash[:12]}",
+        'built_at': time.time(),
+        'accuracy': accuracy,
+        'clf': clf,
+        'estimators': estimators,
+        'estimator_metrics': score_estimators(estimators, x_eval, y_eval),
+        'le': le,
+        'cols': list(cols),
+        'col_index': {col: i for i, col in enumerate(cols)},
+        'reduced_data': reduced_data,
+        'severity_dict': read_severity_table(data_dir),
+        'description_dict': read_description_table(data_dir),
+        'precaution_dict': read_precaution_table(data_dir),
+    }
+
+
+def save_artifact(artifact, path=ARTIFACT_PATH):
+    """Write the artifact atomically so concurrent workers never read a partial file"""
+    import joblib
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Uncompressed so the numpy arrays inside can be memory-mapped on load
+    joblib.dump(artifact, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path=ARTIFACT_PATH, mmap_mode='r'):
+    """Load a saved artifact, or return None if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return None
+    import joblib
+
+    try:
+        return joblib.load(path, mmap_mode=mmap_mode)
+    except Exception as e:
+        logger.warning("Could not read model artifact %s: %s", path, e)
+        return None
+
+
+def load_or_build(path=ARTIFACT_PATH, data_dir=DATA_DIR, force=False):
+    """Return an up-to-date artifact, retraining only when the source CSVs changed"""
+    source_hash = hash_sources(data_dir)
+
+    if not force:
+        artifact = read_artifact(path)
+        if (artifact is not None
+                and artifact.get('format') == ARTIFACT_FORMAT
+                and artifact.get('source_hash') == source_hash):
+            return artifact
+        logger.info("Model artifact missing or stale, rebuilding")
+
+    artifact = build_artifact(data_dir, source_hash)
+    try:
+        save_artifact(artifact, path)
+    except OSError as e:
+        # A read-only deploy can still serve from the freshly trained model
+        logger.warning("Could not save model artifact %s: %s", path, e)
+    return artifact
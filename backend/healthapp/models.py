@@ -1,6 +1,9 @@
+import logging
 from flask_login import UserMixin
 from . import db
 
+logger = logging.getLogger(__name__)
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -13,6 +16,15 @@ class User(db.Model, UserMixin):
         return f'<User {self.email}>'
 
 class Appointment(db.Model):
+    __table_args__ = (
+        # A doctor's calendar and a patient's list are both range scans on date
+        db.Index('ix_appointment_doctor_date', 'doctor_id', 'appointment_date'),
+        db.Index('ix_appointment_patient_date', 'patient_id', 'appointment_date'),
+        # Backstop for two bookings racing for the same slot
+        db.Index('uq_appointment_doctor_slot', 'doctor_id', 'appointment_date', unique=True,
+                 sqlite_where=db.text("status != 'cancelled'")),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -24,7 +36,25 @@ class Appointment(db.Model):
     patient = db.relationship('User', foreign_keys=[patient_id], backref='patient_appointments')
     doctor = db.relationship('User', foreign_keys=[doctor_id], backref='doctor_appointments')
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'patient_id': self.patient_id,
+            'doctor_id': self.doctor_id,
+            'appointment_date': self.appointment_date.isoformat(),
+            'status': self.status,
+            'notes': self.notes,
+        }
+
 class Medication(db.Model):
+    __table_args__ = (
+        # A patient's current medications
+        db.Index('ix_medication_patient_active', 'patient_id', 'is_active'),
+        db.Index('ix_medication_doctor', 'doctor_id'),
+        # active_rows over every patient reads only active rows
+        db.Index('ix_medication_active_end', 'end_date', sqlite_where=db.text('is_active = 1')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -40,7 +70,32 @@ class Medication(db.Model):
     patient = db.relationship('User', foreign_keys=[patient_id], backref='medications')
     doctor = db.relationship('User', foreign_keys=[doctor_id], backref='prescribed_medications')
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'patient_id': self.patient_id,
+            'doctor_id': self.doctor_id,
+            'medication_name': self.medication_name,
+            'dosage': self.dosage,
+            'frequency': self.frequency,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'instructions': self.instructions,
+            'is_active': bool(self.is_active),
+        }
+
 class ChatMessage(db.Model):
+    __table_args__ = (
+        # Unread counts and bulk mark-read never leave this index
+        db.Index('ix_chat_message_receiver_unread', 'receiver_id', 'is_read', 'sender_id'),
+        # Messages in and out after a cursor id (SQLite appends the rowid to every index)
+        db.Index('ix_chat_message_receiver', 'receiver_id'),
+        db.Index('ix_chat_message_sender', 'sender_id'),
+        # One conversation in either direction
+        db.Index('ix_chat_message_conversation', 'sender_id', 'receiver_id'),
+        db.Index('ix_chat_message_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -51,11 +106,86 @@ class ChatMessage(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref='received_messages')
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sender_id': self.sender_id,
+            'receiver_id': self.receiver_id,
+            'message': self.message,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'is_read': bool(self.is_read),
+        }
+
 class HealthRecord(db.Model):
+    """One chatbot assessment; written in batches by health_records.writer"""
+    __table_args__ = (
+        db.Index('ix_health_record_patient_created', 'patient_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    symptoms = db.Column(db.Text)
-    diagnosis = db.Column(db.Text)
+    symptoms = db.Column(db.Text)  # JSON list of the symptoms the user reported
+    diagnosis = db.Column(db.Text)  # predicted disease
+    matched_columns = db.Column(db.Text)  # JSON list of model features the symptoms mapped to
+    status = db.Column(db.String(20))  # PredictionResult status
+    probability = db.Column(db.Float)
+    risk_level = db.Column(db.Float)
+    risk_category = db.Column(db.String(20))
+    model_version = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
-    patient = db.relationship('User', backref='health_records')
\ No newline at end of file
+    patient = db.relationship('User', backref='health_records')
+
+class ChatbotTurn(db.Model):
+    """One message of a /chatbot conversation; the session cookie holds only conversation_id"""
+    __table_args__ = (
+        # A conversation's latest window and the pages before it
+        db.Index('ix_chatbot_turn_conversation', 'conversation_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.String(32), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    sender = db.Column(db.String(10), nullable=False)  # 'user' or 'bot'
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'sender': self.sender,
+            'text': self.text,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+def ensure_columns(engine):
+    """Add declared columns missing from existing tables; create_all never alters a table.
+
+    SQLite can only ADD COLUMN without constraints, so new columns must be nullable.
+    """
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                    f'{column.type.compile(dialect=engine.dialect)}')
+                logger.info("Added column %s.%s", table.name, column.name)
+
+def ensure_indexes(engine):
+    """Create declared indexes that are missing; create_all skips tables that already exist"""
+    from sqlalchemy.exc import IntegrityError
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except IntegrityError as e:
+                # Existing rows violate a unique index; the application checks still apply
+                logger.warning("Could not create index %s: %s", index.name, e.orig)
@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+
+# status values:
+#   ok                - a disease was predicted
+#   no_symptoms       - the caller sent an empty symptom list
+#   unrecognized      - nothing mapped, not even through the fuzzy fallback
+#   no_match          - mapped columns exist but none is a model feature
+#   model_unavailable - the model failed to load
+#   error             - inference raised; `message` holds the reason
+
+
+@dataclass(slots=True)
+class PredictionResult:
+    """Outcome of one symptom analysis, independent of how it is rendered"""
+    status: str
+    symptoms: tuple = ()
+    matched_columns: tuple = ()
+    disease_id: int = None
+    disease: str = None
+    probability: float = 0.0
+    severity_score: int = 0
+    risk_level: float = 0.0
+    risk_category: str = 'monitor'
+    days: int = 1
+    # The estimator that was selected; None when no model was consulted
+    estimator: str = None
+    # Ranked (disease_id, disease, probability) alternatives, best first
+    candidates: tuple = ()
+    message: str = None
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict, for results read back from a shared cache"""
+        return cls(
+            status=data['status'],
+            symptoms=tuple(data['symptoms']),
+            matched_columns=tuple(data['matched_columns']),
+            disease_id=data['disease_id'],
+            disease=data['disease'],
+            probability=data['probability'],
+            severity_score=data['severity_score'],
+            risk_level=data['risk_level'],
+            risk_category=data['risk_category'],
+            days=data['days'],
+            estimator=data['estimator'],
+            candidates=tuple(
+                (c['disease_id'], c['disease'], c['probability']) for c in data['candidates']
+            ),
+            message=data['message'],
+        )
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'symptoms': list(self.symptoms),
+            'matched_columns': list(self.matched_columns),
+            'disease_id': self.disease_id,
+            'disease': self.disease,
+            'probability': self.probability,
+            'severity_score': self.severity_score,
+            'risk_level': self.risk_level,
+            'risk_category': self.risk_category,
+            'days': self.days,
+            'estimator': self.estimator,
+            'candidates': [
+                {'disease_id': disease_id, 'disease': disease, 'probability': probability}
+                for disease_id, disease, probability in self.candidates
+            ],
+            'message': self.message,
+        }
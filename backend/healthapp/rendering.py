@@ -0,0 +1,126 @@
+import sys
+from dataclasses import dataclass
+from html import escape
+
+COMMON_SYMPTOMS = ['fever', 'headache', 'cough', 'fatigue', 'nausea', 'stomach pain', 'chest pain', 'back pain', 'joint pain', 'diarrhea']
+
+RISK_ADVICE = {
+    'urgent': "🚨 **URGENT:** Based on symptom severity and duration, please seek immediate medical attention.",
+    'consult': "⚠️ **RECOMMENDATION:** Consider consulting a healthcare professional if symptoms persist or worsen.",
+    'monitor': "ℹ️ **ADVICE:** Monitor your symptoms and follow the recommended actions. Seek medical care if symptoms worsen.",
+}
+
+DISCLAIMER = "⚕️ **Medical Disclaimer:** This AI analysis is for informational purposes only and should not replace professional medical diagnosis or treatment. Always consult qualified healthcare professionals for medical concerns."
+
+
+RESULTS_HEADING = "🩺 **Medical Analysis Results**\n\n"
+# Risk advice and disclaimer close every successful reply: one string per category
+RISK_TAILS = {category: f"{advice}\n\n{DISCLAIMER}" for category, advice in RISK_ADVICE.items()}
+
+
+def symptom_label(column):
+    return column.replace('_', ' ').title()
+
+
+def disease_section_markdown(description, precautions):
+    """Description and precaution block; identical for every prediction of a disease"""
+    section = ""
+    if description is not None:
+        section += f"**About this condition:** {description}\n\n"
+    if precautions is not None:
+        section += "**Recommended Actions:**\n"
+        for i, precaution in enumerate(precautions, 1):
+            if precaution.strip():
+                section += f"{i}. {precaution.strip()}\n"
+        section += "\n"
+    return section
+
+
+@dataclass(frozen=True, slots=True)
+class DiseaseFragments:
+    """The parts of a reply that depend only on the disease, rendered once per model load"""
+    disease: str
+    heading: str
+    section: str
+    description: str = None
+    precautions: tuple = ()
+
+    @classmethod
+    def build(cls, disease, description=None, precautions=None):
+        precautions = tuple(precautions) if precautions is not None else None
+        return cls(
+            disease,
+            sys.intern(f"**Possible Condition:** {disease}\n\n"),
+            sys.intern(disease_section_markdown(description, precautions)),
+            description,
+            precautions or (),
+        )
+
+
+def build_disease_fragments(diseases, description_dict, precaution_dict):
+    """{disease: DiseaseFragments} for every disease the model can predict"""
+    return {
+        disease: DiseaseFragments.build(disease, description_dict.get(disease), precaution_dict.get(disease))
+        for disease in diseases
+    }
+
+
+def alternatives_markdown(candidates):
+    if not candidates:
+        return ""
+    listed = ', '.join(f"{disease} ({probability:.0%})" for _, disease, probability in candidates)
+    return f"**Other Possibilities:** {listed}\n\n"
+
+
+def render_markdown(result, fragments=None):
+    """Render a PredictionResult as the chatbot's markdown reply.
+
+    `fragments` are the disease's prebuilt DiseaseFragments; only the
+    alternatives and the matched symptom line are formatted per request.
+    """
+    if result.status == 'model_unavailable':
+        return "❌ The AI model failed to load. Please check the data files and try again."
+    if result.status == 'no_symptoms':
+        return "⚠️ Please provide some symptoms to analyze."
+    if result.status == 'unrecognized':
+        return f"⚠️ Could not match your symptoms to our database.\n\nYou mentioned: {', '.join(result.symptoms)}\n\nTry using common terms like: {', '.join(COMMON_SYMPTOMS)}"
+    if result.status == 'no_match':
+        return "⚠️ No symptoms could be matched to our medical database. Please try using different medical terminology."
+    if result.status == 'error':
+        return f"❌ An error occurred during medical analysis: {result.message}. Please try again or consult a healthcare professional immediately."
+
+    if fragments is None:
+        fragments = DiseaseFragments.build(result.disease)
+    return "".join([
+        RESULTS_HEADING,
+        fragments.heading,
+        alternatives_markdown(result.candidates[1:]),
+        f"**Symptoms Analyzed:** {', '.join([symptom_label(s) for s in result.matched_columns])}\n\n",
+        fragments.section,
+        RISK_TAILS[result.risk_category],
+    ])
+
+
+def _markdown_line_to_html(line):
+    # Only the constructs the markdown renderer above emits: **bold** runs
+    parts = escape(line).split('**')
+    return ''.join(f"<strong>{part}</strong>" if i % 2 else part for i, part in enumerate(parts))
+
+
+def render_html(result, fragments=None):
+    """Render a PredictionResult as escaped HTML for the server-side chat page"""
+    markdown = render_markdown(result, fragments)
+    paragraphs = []
+    for block in markdown.split('\n\n'):
+        lines = [_markdown_line_to_html(line) for line in block.split('\n') if line]
+        if lines:
+            paragraphs.append(f"<p>{'<br>'.join(lines)}</p>")
+    return ''.join(paragraphs)
+
+
+def render_json(result, fragments=None):
+    """JSON-ready dict of the result plus the disease details, with no markdown"""
+    data = result.to_dict()
+    data['description'] = fragments.description if fragments is not None else None
+    data['precautions'] = list(fragments.precautions) if fragments is not None else []
+    return data
@@ -1,67 +1,290 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+import itertools
+import json
+import logging
+import math
+import time
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, abort, render_template, request, redirect, url_for, session, flash, jsonify, current_app, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_cors import CORS
-from .chatbot_engine import predict_disease
+from .chatbot_engine import analyze_symptoms, render_result, stream_analysis, predict_batch, suggest_followup_symptoms, symptoms_from_message, ensure_model_loaded, model_status, cache_stats, MODEL_READY, MODEL_FAILED
 from .forms import LoginForm
-from .models import User
+from .models import Appointment, Medication, User
+from . import appointments
+from . import chat
+from . import conversations
 from . import db
+from . import health_records
+from . import medications
+from . import metrics
 
 main = Blueprint('main', __name__)
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = metrics.Histogram(
+    'pulsepal_db_query_seconds', 'Latency of database queries made by API routes', ['query'],
+    buckets=metrics.REQUEST_BUCKETS)
+_user_lookup_seconds = DB_QUERY_SECONDS.labels('user_by_email')
+_user_insert_seconds = DB_QUERY_SECONDS.labels('insert_user')
+_appointment_book_seconds = DB_QUERY_SECONDS.labels('book_appointment')
+_appointment_list_seconds = DB_QUERY_SECONDS.labels('list_appointments')
+_doctor_calendar_seconds = DB_QUERY_SECONDS.labels('doctor_calendar')
+_chat_conversation_seconds = DB_QUERY_SECONDS.labels('chat_conversation')
+_chat_unread_seconds = DB_QUERY_SECONDS.labels('chat_unread_counts')
+_chat_mark_read_seconds = DB_QUERY_SECONDS.labels('chat_mark_read')
+_medication_insert_seconds = DB_QUERY_SECONDS.labels('insert_medication')
+_medication_list_seconds = DB_QUERY_SECONDS.labels('list_medications')
+_medication_due_seconds = DB_QUERY_SECONDS.labels('medications_due')
+_chatbot_history_seconds = DB_QUERY_SECONDS.labels('chatbot_history')
+
+# Upper bound on symptom sets per /api/chatbot/batch request
+BATCH_REQUEST_LIMIT = 10000
+
+def parse_top_k_options(data):
+    """Read the optional top_k / estimator request fields"""
+    try:
+        top_k = int(data.get('top_k', 1))
+    except (TypeError, ValueError):
+        raise ValueError('top_k must be an integer')
+    return top_k, data.get('estimator')
+
+def parse_batch_days(value, count):
+    """Validate /api/chatbot/batch "days": one positive number, or a list of them with one per entry"""
+    def is_duration(days):
+        return isinstance(days, (int, float)) and not isinstance(days, bool) and math.isfinite(days) and days > 0
+    if is_duration(value):
+        return value
+    if isinstance(value, list) and len(value) == count and all(is_duration(days) for days in value):
+        return value
+    raise ValueError('days must be a positive number or a list with one positive number per entry')
+
+def model_unavailable_payload():
+    """(body, status, headers) for requests that arrive while the model is warming up or failed"""
+    status = model_status()
+    if status['state'] == MODEL_FAILED:
+        return {
+            'error': 'The AI model failed to load. Please try again later.',
+            'status': 'unavailable',
+            'model': status
+        }, 503, {}
+    return {
+        'error': 'The AI model is warming up. Please try again in a few seconds.',
+        'status': 'warming_up',
+        'model': status
+    }, 503, {'Retry-After': '2'}
+
+def model_unavailable_response():
+    """Answer quickly while the model is still warming up (or failed to load)"""
+    body, status, headers = model_unavailable_payload()
+    return jsonify(body), status, headers
+
+def record_assessment(patient_id, result):
+    """Queue a HealthRecord for one analysis (a PredictionResult dict); never fails the request"""
+    try:
+        health_records.writer.submit(health_records.assessment_row(patient_id, result, model_status()['version']))
+    except Exception:
+        logger.exception("Could not queue health record")
+
+def chatbot_answer(data, warmup_timeout=None, patient_id=None):
+    """Validate an /api/chatbot body and run the analysis: (body, status, headers).
+
+    Shared by the Flask view and the ASGI app, which calls it on its
+    inference pool; it touches no request or app context. With a
+    patient_id the assessment is also recorded as a HealthRecord.
+    """
+    if not data:
+        return {'error': 'No data provided'}, 400, {}
+        
+    message = data.get('message', '')
+    
+    if not message:
+        return {'error': 'Message is required'}, 400, {}
+    
+    # 'markdown' (default) and 'html' add rendered text; 'json' skips rendering entirely
+    response_format = data.get('format', 'markdown')
+    if response_format not in ('markdown', 'html', 'json'):
+        return {'error': 'format must be one of markdown, html, json'}, 400, {}
+    
+    if not ensure_model_loaded(timeout=warmup_timeout):
+        return model_unavailable_payload()
+    
+    # One compiled extractor pass: phrases, pain patterns and negation
+    symptoms, mapped_columns = symptoms_from_message(message)
+    
+    try:
+        top_k, estimator = parse_top_k_options(data)
+        # Call the ML model
+        result = analyze_symptoms(symptoms, 2, top_k=top_k, estimator=estimator, mapped_columns=mapped_columns)
+    except ValueError as e:
+        return {'error': str(e)}, 400, {}
+    if patient_id is not None:
+        record_assessment(patient_id, result.to_dict())
+    response = {
+        'result': render_result(result, 'json'),
+        'status': 'success'
+    }
+    if response_format != 'json':
+        response['response'] = render_result(result, response_format)
+    return response, 200, {}
 
 # API Routes for frontend integration
 @main.route('/api/chatbot', methods=['POST'])
 def api_chatbot():
-    print("API chatbot route called")
     try:
-        print("Getting JSON data...")
         data = request.get_json()
-        print(f"Received data: {data}")
+        patient_id = current_user.id if current_user.is_authenticated else None
+        body, status, headers = chatbot_answer(data, current_app.config['CHATBOT_WARMUP_TIMEOUT'], patient_id)
+        return jsonify(body), status, headers
         
-        if not data:
-            print("No data received")
-            return jsonify({'error': 'No data provided'}), 400
-            
-        message = data.get('message', '')
-        print(f"Message: '{message}'")
+    except Exception as e:
+        logger.exception("API error", extra={'error_type': type(e).__name__})
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+def sse_event(event, data):
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@main.route('/api/chatbot/stream', methods=['GET', 'POST'])
+def api_chatbot_stream():
+    """/api/chatbot as Server-Sent Events, one event per analysis stage.
+
+    Takes the same fields as /api/chatbot, as a JSON body or (for EventSource)
+    query parameters. Emits 'symptoms' as soon as mapping is done, then
+    'prediction', 'description', 'precautions', 'risk', and a final 'done'
+    event whose data is exactly the /api/chatbot JSON response.
+    """
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    message = (data or {}).get('message', '')
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    response_format = data.get('format', 'markdown')
+    if response_format not in ('markdown', 'html', 'json'):
+        return jsonify({'error': 'format must be one of markdown, html, json'}), 400
+    
+    if not ensure_model_loaded(timeout=current_app.config['CHATBOT_WARMUP_TIMEOUT']):
+        return model_unavailable_response()
+    
+    symptoms, mapped_columns = symptoms_from_message(message)
+    try:
+        top_k, estimator = parse_top_k_options(data)
+        # Validates top_k/estimator up front so errors are still plain 400s
+        events = stream_analysis(symptoms, 2, top_k=top_k, estimator=estimator,
+                                 mapped_columns=mapped_columns, fmt=response_format)
+        first = next(events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    patient_id = current_user.id if current_user.is_authenticated else None
+    
+    def generate():
+        for event, payload in itertools.chain([first], events):
+            if event == 'done' and patient_id is not None:
+                record_assessment(patient_id, payload['result'])
+            yield sse_event(event, payload)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx-style proxies from buffering the stream
+        'X-Accel-Buffering': 'no',
+    })
+
+@main.route('/api/chatbot/batch', methods=['POST'])
+def api_chatbot_batch():
+    """Score many symptom sets in one call.
+
+    Body: {"symptoms": [["fever", "headache"], "cough, chest pain", ...], "days": 2}
+    where each entry is a list of symptoms or a chat-style message, and "days"
+    is one duration for all entries or a list with one per entry. Optional
+    "top_k" and "estimator" ask for ranked alternatives as in /api/chatbot.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('symptoms'), list):
+            return jsonify({'error': 'A "symptoms" list is required'}), 400
         
-        if not message:
-            print("No message provided")
-            return jsonify({'error': 'Message is required'}), 400
+        items = data['symptoms']
+        if len(items) > BATCH_REQUEST_LIMIT:
+            return jsonify({'error': f'At most {BATCH_REQUEST_LIMIT} symptom sets per request'}), 413
         
-        # Process symptoms - handle both comma-separated and single symptoms
-        if ',' in message:
-            symptoms = [s.strip() for s in message.split(',')]
-        else:
-            # Split by common separators or treat as single symptom
-            import re
-            # Split by 'and', 'or', semicolons, or periods
-            symptoms = re.split(r'[,;.]|\s+and\s+|\s+or\s+', message.lower())
-            symptoms = [s.strip() for s in symptoms if s.strip()]
-            
-            # If no separators found, treat the whole message as symptoms
-            if len(symptoms) <= 1:
-                symptoms = [message.strip()]
+        if not all(isinstance(item, str) or (isinstance(item, list) and all(isinstance(s, str) for s in item)) for item in items):
+            return jsonify({'error': 'Each entry must be a message or a list of symptom strings'}), 400
+        days = parse_batch_days(data.get('days', 1), len(items))
+        top_k, estimator = parse_top_k_options(data)
         
-        print(f"Processing symptoms: {symptoms}")
+        if not ensure_model_loaded(timeout=current_app.config['CHATBOT_WARMUP_TIMEOUT']):
+            return model_unavailable_response()
         
-        # Call the ML model
-        print("Calling predict_disease...")
-        result = predict_disease(symptoms, 2)
-        print(f"ML result: {result[:100]}...")
+        # Messages go through the extractor; explicit lists are mapped as before
+        symptom_lists = []
+        mapped_columns = []
+        for item in items:
+            symptoms, columns = symptoms_from_message(item) if isinstance(item, str) else (item, None)
+            symptom_lists.append(symptoms)
+            mapped_columns.append(columns)
         
-        response = {
-            'response': result,
+        results = predict_batch(symptom_lists, days, top_k=top_k, estimator=estimator, mapped_columns=mapped_columns)
+        return jsonify({
+            'results': [result.to_dict() for result in results],
+            'count': len(results),
             'status': 'success'
-        }
-        print("Returning successful response")
-        return jsonify(response)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@main.route('/api/chatbot/followup', methods=['POST'])
+def api_chatbot_followup():
+    """Candidate conditions for a message plus the symptoms worth asking about next"""
+    try:
+        data = request.get_json(silent=True)
+        message = (data or {}).get('message', '')
+        if not message:
+            return jsonify({'error': 'Message is required'}), 400
+        
+        if not ensure_model_loaded(timeout=current_app.config['CHATBOT_WARMUP_TIMEOUT']):
+            return model_unavailable_response()
         
+        try:
+            k = min(max(int(data.get('k', 5)), 1), 20)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'k must be an integer'}), 400
+        
+        symptoms, mapped_columns = symptoms_from_message(message)
+        followup = suggest_followup_symptoms(symptoms, k, mapped_columns=mapped_columns)
+        followup['status'] = 'success'
+        return jsonify(followup)
     except Exception as e:
-        print(f"API Error: {e}")
-        import traceback
-        traceback.print_exc()
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+@main.route('/api/chatbot/history', methods=['GET'])
+@login_required
+def api_chatbot_history():
+    """Turns of the caller's /chatbot conversation, oldest first: ?before=<turn id>&limit=
+
+    Without `before` this is the latest window; pass the returned `older`
+    as the next `before` to load earlier turns.
+    """
+    try:
+        conversation_id = session.get('conversation_id')
+        before_id = parse_int(request.args['before'], 'before') if 'before' in request.args else None
+        limit = min(max(parse_int(request.args.get('limit', conversations.HISTORY_WINDOW), 'limit'), 1), conversations.MAX_PAGE_SIZE)
+        turns, older = [], None
+        if conversation_id is not None:
+            started = time.perf_counter()
+            turns, older = conversations.window(conversation_id, current_user.id, before_id, limit)
+            _chatbot_history_seconds.observe(time.perf_counter() - started)
+        return jsonify({
+            'messages': [turn.to_dict() for turn in turns],
+            'older': older,
+            'status': 'success'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @main.route('/api/register', methods=['POST'])
 def api_register():
     try:
@@ -75,14 +298,18 @@ def api_register():
             return jsonify({'error': 'All fields are required'}), 400
         
         # Check if user already exists
+        started = time.perf_counter()
         existing_user = User.query.filter_by(email=email).first()
+        _user_lookup_seconds.observe(time.perf_counter() - started)
         if existing_user:
             return jsonify({'error': 'User already exists'}), 400
         
         # Create new user
         new_user = User(email=email, password=password, name=name, role=role)
+        started = time.perf_counter()
         db.session.add(new_user)
         db.session.commit()
+        _user_insert_seconds.observe(time.perf_counter() - started)
         
         return jsonify({
             'message': 'User created successfully',
@@ -102,7 +329,9 @@ def api_login():
         if not all([email, password]):
             return jsonify({'error': 'Email and password are required'}), 400
         
+        started = time.perf_counter()
         user = User.query.filter_by(email=email).first()
+        _user_lookup_seconds.observe(time.perf_counter() - started)
         if user and user.password == password:  # Note: In production, use proper password hashing
             login_user(user)
             return jsonify({
@@ -120,28 +349,134 @@ def api_login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_page_size(value):
+    try:
+        return min(max(int(value), 1), appointments.MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer") from None
+
 @main.route('/api/appointments', methods=['GET', 'POST'])
 @login_required
 def api_appointments():
     if request.method == 'POST':
         try:
-            data = request.get_json()
-            # Add appointment logic here
+            data = request.get_json(silent=True) or {}
+            start = appointments.parse_datetime(data.get('appointment_date'))
+            # Patients book for themselves; doctors book on behalf of a patient
+            if current_user.role == 'doctor':
+                patient_id = data.get('patient_id')
+                doctor_id = data.get('doctor_id', current_user.id)
+                if doctor_id != current_user.id:
+                    return jsonify({'error': 'Doctors can only book appointments on their own calendar'}), 403
+            else:
+                patient_id = current_user.id
+                doctor_id = data.get('doctor_id')
+            if not isinstance(patient_id, int) or not isinstance(doctor_id, int):
+                return jsonify({'error': 'patient_id and doctor_id must be integers'}), 400
+            
+            started = time.perf_counter()
+            appointment = appointments.book_appointment(patient_id, doctor_id, start, data.get('notes'))
+            _appointment_book_seconds.observe(time.perf_counter() - started)
             return jsonify({
                 'message': 'Appointment booked successfully',
+                'appointment': appointment.to_dict(),
                 'status': 'success'
-            })
+            }), 201
+        except appointments.SlotConflict as e:
+            body = {'error': str(e)}
+            if e.appointment is not None:
+                body['conflicting_appointment_date'] = e.appointment.appointment_date.isoformat()
+            return jsonify(body), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
-    # GET appointments
+    # GET appointments: keyset-paginated with ?limit=&cursor=, optional ?from=&to=&status=
+    try:
+        args = request.args
+        status = args.get('status')
+        if status is not None and status not in appointments.STATUSES:
+            return jsonify({'error': f"status must be one of {', '.join(appointments.STATUSES)}"}), 400
+        started = time.perf_counter()
+        rows, next_cursor = appointments.list_appointments(
+            current_user.id,
+            as_doctor=current_user.role == 'doctor',
+            start=appointments.parse_datetime(args['from'], 'from') if 'from' in args else None,
+            end=appointments.parse_datetime(args['to'], 'to') if 'to' in args else None,
+            status=status,
+            limit=parse_page_size(args.get('limit', appointments.DEFAULT_PAGE_SIZE)),
+            cursor=args.get('cursor'),
+        )
+        _appointment_list_seconds.observe(time.perf_counter() - started)
+        return jsonify({
+            'appointments': [appointment.to_dict() for appointment in rows],
+            'next_cursor': next_cursor,
+            'status': 'success'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/appointments/<int:appointment_id>', methods=['PATCH'])
+@login_required
+def api_appointment_status(appointment_id):
+    """Cancel or complete a scheduled appointment: {"status": "cancelled" | "completed"}"""
+    try:
+        appointment = db.session.get(Appointment, appointment_id)
+        if appointment is None or current_user.id not in (appointment.patient_id, appointment.doctor_id):
+            return jsonify({'error': 'Appointment not found'}), 404
+        
+        status = (request.get_json(silent=True) or {}).get('status')
+        # Patients may only cancel; a cancelled slot is rebooked, never reopened
+        allowed = ('cancelled', 'completed') if current_user.id == appointment.doctor_id else ('cancelled',)
+        if status not in allowed:
+            return jsonify({'error': f"status must be one of {', '.join(allowed)}"}), 400
+        if appointment.status != 'scheduled':
+            return jsonify({'error': f'Appointment is already {appointment.status}'}), 409
+        
+        appointment.status = status
+        db.session.commit()
+        return jsonify({'appointment': appointment.to_dict(), 'status': 'success'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/doctors/<int:doctor_id>/calendar', methods=['GET'])
+@login_required
+def api_doctor_calendar(doctor_id):
+    """A doctor's booked slots for the week starting on ?week=YYYY-MM-DD (default: this week's Monday).
+
+    The doctor sees full appointments; everyone else sees only busy slots.
+    """
     try:
-        # Add logic to fetch appointments
-        appointments = []  # Replace with actual query
+        if 'week' in request.args:
+            week_start = appointments.parse_datetime(request.args['week'], 'week')
+        else:
+            today = datetime.now(timezone.utc).replace(tzinfo=None)
+            week_start = today - timedelta(days=today.weekday())
+        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        started = time.perf_counter()
+        rows = appointments.doctor_week(doctor_id, week_start)
+        _doctor_calendar_seconds.observe(time.perf_counter() - started)
+        
+        slot = timedelta(minutes=appointments.SLOT_MINUTES)
+        if current_user.id == doctor_id:
+            entries = [appointment.to_dict() for appointment in rows]
+        else:
+            entries = [{'appointment_date': appointment.appointment_date.isoformat()} for appointment in rows]
+        for entry, appointment in zip(entries, rows):
+            entry['ends_at'] = (appointment.appointment_date + slot).isoformat()
         return jsonify({
-            'appointments': appointments,
+            'doctor_id': doctor_id,
+            'week_start': week_start.date().isoformat(),
+            'slot_minutes': appointments.SLOT_MINUTES,
+            'appointments': entries,
             'status': 'success'
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -149,63 +484,265 @@ def api_appointments():
 @login_required
 def api_medications():
     if request.method == 'POST':
+        if current_user.role != 'doctor':
+            return jsonify({'error': 'Only doctors can prescribe medications'}), 403
         try:
-            data = request.get_json()
-            # Add medication logic here
+            data = request.get_json(silent=True) or {}
+            started = time.perf_counter()
+            medication = medications.prescribe(current_user.id, data)
+            _medication_insert_seconds.observe(time.perf_counter() - started)
             return jsonify({
                 'message': 'Medication added successfully',
+                'medication': medication_dict(medication),
                 'status': 'success'
-            })
+            }), 201
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
-    # GET medications
+    # GET medications, newest first: ?before=<medication id>&limit=, ?all=1 to include stopped ones,
+    # and for doctors ?patient_id= to narrow their prescriptions to one patient
     try:
-        # Add logic to fetch medications
-        medications = []  # Replace with actual query
+        args = request.args
+        before_id = parse_int(args['before'], 'before') if 'before' in args else None
+        limit = min(max(parse_int(args.get('limit', medications.DEFAULT_PAGE_SIZE), 'limit'), 1), medications.MAX_PAGE_SIZE)
+        started = time.perf_counter()
+        rows = medications.list_medications(
+            current_user.id,
+            as_doctor=current_user.role == 'doctor',
+            patient_id=parse_int(args['patient_id'], 'patient_id') if 'patient_id' in args else None,
+            include_inactive=args.get('all') == '1',
+            before_id=before_id,
+            limit=limit,
+        )
+        _medication_list_seconds.observe(time.perf_counter() - started)
+        return jsonify({
+            'medications': [medication_dict(medication) for medication in rows],
+            'next_before': rows[-1].id if len(rows) == limit else None,
+            'status': 'success'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def medication_dict(medication):
+    entry = medication.to_dict()
+    entry['schedule'] = medications.schedule_dict(medication.frequency)
+    return entry
+
+@main.route('/api/medications/<int:medication_id>', methods=['PATCH'])
+@login_required
+def api_medication_stop(medication_id):
+    """Stop an active medication: {"is_active": false}, by its prescriber"""
+    try:
+        medication = db.session.get(Medication, medication_id)
+        if medication is None or current_user.id not in (medication.patient_id, medication.doctor_id):
+            return jsonify({'error': 'Medication not found'}), 404
+        if current_user.id != medication.doctor_id:
+            return jsonify({'error': 'Only the prescribing doctor can stop a medication'}), 403
+        if (request.get_json(silent=True) or {}).get('is_active') is not False:
+            return jsonify({'error': 'is_active must be false'}), 400
+        
+        medication.is_active = False
+        medication.end_date = min(medication.end_date or date.max, medications.utc_today())
+        db.session.commit()
+        return jsonify({'medication': medication_dict(medication), 'status': 'success'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/medications/due', methods=['GET'])
+@login_required
+def api_medications_due():
+    """Doses due from ?from=<ISO date-time> (default now) over the next ?hours= (default 24).
+
+    Patients see their own doses; doctors see those of the medications they
+    prescribed, optionally for one ?patient_id=.
+    """
+    try:
+        args = request.args
+        start = appointments.parse_datetime(args['from'], 'from') if 'from' in args else medications.utc_now()
+        hours = parse_int(args.get('hours', 24), 'hours')
+        if not 1 <= hours <= medications.MAX_DUE_HOURS:
+            return jsonify({'error': f'hours must be between 1 and {medications.MAX_DUE_HOURS}'}), 400
+        if current_user.role == 'doctor':
+            patient_id = parse_int(args['patient_id'], 'patient_id') if 'patient_id' in args else None
+            scope = {'doctor_id': current_user.id, 'patient_id': patient_id}
+        else:
+            scope = {'patient_id': current_user.id}
+        
+        started = time.perf_counter()
+        due = medications.due_for(start, hours, **scope)
+        _medication_due_seconds.observe(time.perf_counter() - started)
         return jsonify({
-            'medications': medications,
+            'from': start.isoformat(),
+            'hours': hours,
+            'doses': [
+                {'due_at': dose.due_at.isoformat(), 'medication_id': dose.medication_id, 'patient_id': dose.patient_id}
+                for dose in due.doses()
+            ],
             'status': 'success'
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer") from None
+
 @main.route('/api/chat', methods=['GET', 'POST'])
 @login_required
 def api_chat():
     if request.method == 'POST':
         try:
-            data = request.get_json()
-            # Add chat logic here
+            data = request.get_json(silent=True) or {}
+            text = data.get('message')
+            if not isinstance(text, str) or not text.strip():
+                return jsonify({'error': 'Message is required'}), 400
+            if len(text) > chat.MAX_MESSAGE_CHARS:
+                return jsonify({'error': f'Messages are limited to {chat.MAX_MESSAGE_CHARS} characters'}), 413
+            receiver_id = data.get('receiver_id')
+            if not isinstance(receiver_id, int):
+                return jsonify({'error': 'receiver_id must be an integer'}), 400
+            
+            message = chat.send_message(current_user, receiver_id, text)
             return jsonify({
                 'message': 'Message sent successfully',
+                'chat_message': message.to_dict(),
                 'status': 'success'
-            })
+            }), 201
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
-    # GET chat messages
+    # GET one conversation, newest first: ?with=<user id>&before=<message id>&limit=
+    try:
+        if 'with' not in request.args:
+            return jsonify({'error': 'with (the other user id) is required'}), 400
+        other_id = parse_int(request.args['with'], 'with')
+        before_id = parse_int(request.args['before'], 'before') if 'before' in request.args else None
+        limit = min(max(parse_int(request.args.get('limit', chat.DEFAULT_PAGE_SIZE), 'limit'), 1), chat.MAX_PAGE_SIZE)
+        
+        started = time.perf_counter()
+        messages = chat.conversation(current_user.id, other_id, before_id, limit)
+        _chat_conversation_seconds.observe(time.perf_counter() - started)
+        return jsonify({
+            'messages': [message.to_dict() for message in messages],
+            'next_before': messages[-1].id if len(messages) == limit else None,
+            'status': 'success'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/chat/sync', methods=['GET'])
+@login_required
+def api_chat_sync():
+    """Messages to or from the caller newer than ?after=<message id>.
+
+    With ?wait=<seconds> (at most 25) the request is held until a message
+    arrives or the time is up, so clients long-poll instead of hammering
+    the endpoint. A held request occupies a server thread for its whole
+    wait, so at most chat.MAX_WAITERS are held at once; past that the
+    answer is 503 with Retry-After. Pass the returned cursor as the next
+    ?after=.
+    """
     try:
-        # Add logic to fetch chat messages
-        messages = []  # Replace with actual query
+        after_id = parse_int(request.args.get('after', 0), 'after')
+        try:
+            wait = float(request.args.get('wait', 0))
+        except ValueError:
+            wait = None
+        # float() also accepts 'nan' and 'inf'
+        if wait is None or not math.isfinite(wait):
+            return jsonify({'error': 'wait must be a number of seconds'}), 400
+        limit = min(max(parse_int(request.args.get('limit', chat.DEFAULT_PAGE_SIZE), 'limit'), 1), chat.MAX_PAGE_SIZE)
+        
+        try:
+            messages = chat.sync(current_user.id, after_id, wait, limit)
+        except chat.TooManyWaiters:
+            return jsonify({
+                'error': 'Too many clients are waiting for messages. Please try again in a moment.',
+                'status': 'busy',
+            }), 503, {'Retry-After': '1'}
         return jsonify({
-            'messages': messages,
+            'messages': [message.to_dict() for message in messages],
+            'cursor': messages[-1].id if messages else after_id,
+            'has_more': len(messages) == limit,
             'status': 'success'
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/chat/unread', methods=['GET'])
+@login_required
+def api_chat_unread():
+    """Unread message counts for the caller, in total and per sender"""
+    try:
+        started = time.perf_counter()
+        counts = chat.unread_counts(current_user.id)
+        _chat_unread_seconds.observe(time.perf_counter() - started)
+        return jsonify({
+            'unread': sum(counts.values()),
+            'by_sender': {str(sender_id): count for sender_id, count in counts.items()},
+            'status': 'success'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/chat/read', methods=['POST'])
+@login_required
+def api_chat_read():
+    """Mark received messages read up to {"up_to": <message id>}, optionally only {"sender_id": ...}'s"""
+    try:
+        data = request.get_json(silent=True) or {}
+        up_to = data.get('up_to')
+        sender_id = data.get('sender_id')
+        if not isinstance(up_to, int) or (sender_id is not None and not isinstance(sender_id, int)):
+            return jsonify({'error': 'up_to (and sender_id, if given) must be integers'}), 400
+        
+        started = time.perf_counter()
+        updated = chat.mark_read(current_user.id, up_to, sender_id)
+        _chat_mark_read_seconds.observe(time.perf_counter() - started)
+        return jsonify({'updated': updated, 'status': 'success'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of every registered metric"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @main.route('/api/health', methods=['GET'])
 def health_check():
     try:
+        status = model_status()
         return jsonify({
             'status': 'healthy',
             'message': 'Backend is running properly',
-            'ml_model_loaded': True
+            'ml_model_loaded': status['state'] == MODEL_READY,
+            'ml_model': status,
+            'cache': cache_stats()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 only once the ML model can serve predictions"""
+    status = model_status()
+    ready = status['state'] == MODEL_READY
+    return jsonify({'ready': ready, 'ml_model': status}), 200 if ready else 503
+
 # Traditional web routes (for backend-only access)
 @main.route('/')
 def index():
@@ -225,26 +762,44 @@ def login():
 @main.route('/chatbot', methods=['GET', 'POST'])
 @login_required
 def chatbot():
-    if 'messages' not in session:
-        session['messages'] = []
+    """The server-rendered chat page; history lives in ChatbotTurn, the cookie holds only its id.
 
-    messages = session['messages']
+    The page shows the latest conversations.HISTORY_WINDOW turns; ?before=<turn id>
+    shows the window before that, so the page size stays flat however long
+    the conversation grows.
+    """
+    # Cookies from before the server-side store carried the whole history
+    session.pop('messages', None)
+    conversation_id = session.get('conversation_id')
 
     if request.method == 'POST':
         user_msg = request.form['message']
-        messages.append({'sender': 'user', 'text': user_msg})
+        if len(user_msg) > conversations.MAX_MESSAGE_CHARS:
+            abort(413)
+        if conversation_id is None:
+            conversation_id = session['conversation_id'] = conversations.new_conversation_id()
 
-        symptoms = [s.strip() for s in user_msg.split(',')]
-        response = predict_disease(symptoms, 2)
+        # Extraction needs the loaded model's tables; wait for the warm-up as /api/chatbot does
+        if ensure_model_loaded(timeout=current_app.config['CHATBOT_WARMUP_TIMEOUT']):
+            symptoms, mapped_columns = symptoms_from_message(user_msg)
+            result = analyze_symptoms(symptoms, 2, mapped_columns=mapped_columns)
+            record_assessment(current_user.id, result.to_dict())
+            response = render_result(result, 'html')
+        else:
+            response = model_unavailable_payload()[0]['error']
 
-        messages.append({'sender': 'bot', 'text': response})
-        session['messages'] = messages
+        conversations.append_exchange(conversation_id, current_user.id, user_msg, response)
         return redirect(url_for('main.chatbot'))
 
-    return render_template('chatbot.html', messages=messages, loading=False)
+    messages, older = [], None
+    if conversation_id is not None:
+        messages, older = conversations.window(conversation_id, current_user.id, request.args.get('before', type=int))
+    return render_template('chatbot.html', messages=messages, older=older, loading=False,
+                           max_chars=conversations.MAX_MESSAGE_CHARS)
 
 @main.route('/logout')
 @login_required
 def logout():
     logout_user()
+    session.pop('conversation_id', None)
     return redirect(url_for('main.login'))
\ No newline at end of file
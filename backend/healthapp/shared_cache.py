@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, 'instance', 'prediction_cache.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_cache (
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (version, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_prediction_cache_last_used ON prediction_cache (last_used);
+"""
+
+
+class SharedPredictionCache:
+    """Prediction cache shared by every worker process on a node.
+
+    Backed by a WAL-mode SQLite file so readers never block each other or the
+    writer. Values are JSON, entries are scoped to a model version, and the
+    table is kept under `max_entries` by dropping expired and least recently
+    used rows every `evict_every` writes. Lock contention or I/O errors are
+    treated as cache misses: the cache must never fail a prediction.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=50000, ttl=3600, evict_every=256,
+                 touch_interval=60, busy_timeout=0.05):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        # Refresh last_used at most this often per entry so hits stay read-only
+        self.touch_interval = touch_interval
+        self.busy_timeout = busy_timeout
+        self.version = None
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_environ(cls):
+        """Build the cache from PULSEPAL_SHARED_CACHE ('1' or a file path); None when unset"""
+        setting = os.environ.get('PULSEPAL_SHARED_CACHE', '').strip()
+        if setting in ('', '0'):
+            return None
+        path = DEFAULT_PATH if setting == '1' else setting
+        return cls(
+            path,
+            max_entries=int(os.environ.get('PULSEPAL_SHARED_CACHE_SIZE', '50000')),
+            ttl=float(os.environ.get('PULSEPAL_SHARED_CACHE_TTL', '3600')),
+        )
+
+    def _connection(self):
+        # One connection per thread and per process: sqlite3 connections must
+        # not cross threads, and must not be inherited through fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Losing the last few cache writes on power failure is harmless
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def bind_version(self, version):
+        """Scope lookups to a model version; rows of other versions age out via eviction"""
+        self.version = version
+
+    @staticmethod
+    def make_key(parts):
+        return json.dumps(parts, separators=(',', ':'))
+
+    def get(self, key):
+        """Decoded JSON value for `key` under the bound version, or None"""
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, expires_at, last_used FROM prediction_cache WHERE version = ? AND key = ?',
+                (self.version, key),
+            ).fetchone()
+            now = time.time()
+            if row is None or row[1] <= now:
+                self._count('misses')
+                return None
+            if now - row[2] > self.touch_interval:
+                conn.execute(
+                    'UPDATE prediction_cache SET last_used = ? WHERE version = ? AND key = ?',
+                    (now, self.version, key),
+                )
+            self._count('hits')
+            return json.loads(row[0])
+        except sqlite3.Error:
+            self._count('errors')
+            return None
+
+    def put(self, key, value):
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                'INSERT OR REPLACE INTO prediction_cache (key, version, value, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, self.version, json.dumps(value, separators=(',', ':')), now + self.ttl, now),
+            )
+            with self._counter_lock:
+                self._puts += 1
+                evict = self._puts % self.evict_every == 0
+            if evict:
+                self.evict()
+        except sqlite3.Error:
+            self._count('errors')
+
+    def evict(self):
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM prediction_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM prediction_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                'DELETE FROM prediction_cache WHERE (version, key) IN '
+                '(SELECT version, key FROM prediction_cache ORDER BY last_used LIMIT ?)',
+                (excess,),
+            ).rowcount
+        with self._counter_lock:
+            self.evictions += max(removed, 0)
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM prediction_cache')
+        except sqlite3.Error:
+            self._count('errors')
+
+    def _count(self, counter):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'version': self.version,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'errors': self.errors,
+            'evictions': self.evictions,
+        }
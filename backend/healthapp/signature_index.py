@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class SignatureIndex:
+    """Packed symptom signatures, one bitset per disease, built from reduced_data.
+
+    Bit j of a signature is set when any training row of that disease has
+    symptom column j. Queries are encoded the same way, so exact matching and
+    Jaccard ranking are a handful of integer ANDs/ORs and popcounts per disease
+    and never touch pandas.
+    """
+
+    __slots__ = ('columns', 'bit_of', 'classes_', 'diseases', 'disease_bit_of', 'signatures',
+                 'signature_sizes', 'column_masks', '_matrix')
+
+    def __init__(self, columns, disease_ids, diseases, signature_matrix):
+        self.columns = list(columns)
+        self.bit_of = {col: i for i, col in enumerate(self.columns)}
+        # classes_ holds label-encoder ids so the index can stand in for an estimator
+        self.classes_ = np.asarray(disease_ids)
+        self.diseases = list(diseases)
+        self.disease_bit_of = {disease: i for i, disease in enumerate(self.diseases)}
+        self._matrix = np.asarray(signature_matrix, dtype=np.float32)
+        self.signatures = [self._pack(np.flatnonzero(row)) for row in self._matrix]
+        self.signature_sizes = [sig.bit_count() for sig in self.signatures]
+        # Transposed view: for each symptom, the bitset of diseases that have it
+        self.column_masks = [
+            self._pack(np.flatnonzero(self._matrix[:, j])) for j in range(len(self.columns))
+        ]
+
+    @staticmethod
+    def _pack(positions):
+        bits = 0
+        for position in positions:
+            bits |= 1 << int(position)
+        return bits
+
+    @classmethod
+    def from_reduced_data(cls, reduced_data, columns, label_encoder):
+        diseases = list(reduced_data.index)
+        return cls(
+            columns,
+            label_encoder.transform(diseases),
+            diseases,
+            reduced_data[list(columns)].to_numpy() > 0,
+        )
+
+    def encode(self, columns):
+        """Bitset of the given symptom columns; unknown columns are ignored"""
+        bits = 0
+        for col in columns:
+            position = self.bit_of.get(col)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def encode_diseases(self, diseases):
+        """Bitset over the given diseases, for use as a candidate set"""
+        bits = 0
+        for disease in diseases:
+            bits |= 1 << self.disease_bit_of[disease]
+        return bits
+
+    def exact_matches(self, query_bits):
+        """Diseases whose signature contains every queried symptom"""
+        return [
+            disease for disease, sig in zip(self.diseases, self.signatures)
+            if sig & query_bits == query_bits
+        ]
+
+    def rank(self, query_bits, k=5):
+        """Top-k (disease, jaccard, overlap) by Jaccard similarity, best first"""
+        query_size = query_bits.bit_count()
+        scored = []
+        for disease, sig, size in zip(self.diseases, self.signatures, self.signature_sizes):
+            overlap = (sig & query_bits).bit_count()
+            if overlap:
+                scored.append((overlap / (size + query_size - overlap), overlap, disease))
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(disease, jaccard, overlap) for jaccard, overlap, disease in scored[:k]]
+
+    def candidate_mask(self, query_bits):
+        """Bitset over diseases whose signature shares at least one queried symptom"""
+        mask = 0
+        for i, sig in enumerate(self.signatures):
+            if sig & query_bits:
+                mask |= 1 << i
+        return mask
+
+    def disambiguating_symptoms(self, query_bits, candidates=None, k=5):
+        """Symptoms not yet reported that split the candidate diseases most evenly.
+
+        `candidates` is a disease bitset (defaults to every disease overlapping the
+        query). Returns (column, diseases_with, diseases_without), best split first.
+        """
+        if candidates is None:
+            candidates = self.candidate_mask(query_bits)
+        total = candidates.bit_count()
+        splits = []
+        for position, (col, diseases_mask) in enumerate(zip(self.columns, self.column_masks)):
+            if query_bits >> position & 1:
+                continue
+            with_symptom = (diseases_mask & candidates).bit_count()
+            if 0 < with_symptom < total:
+                splits.append((min(with_symptom, total - with_symptom), with_symptom, col))
+        splits.sort(key=lambda item: (-item[0], item[2]))
+        return [(col, with_symptom, total - with_symptom) for _, with_symptom, col in splits[:k]]
+
+    def predict_proba(self, x):
+        """Jaccard similarity of each feature row to every signature, normalised per row.
+
+        Lets the index serve as a top-k estimator on the same feature matrices the
+        sklearn models take. Rows that overlap nothing get a uniform distribution.
+        """
+        x = np.asarray(x, dtype=np.float32) > 0
+        overlap = x.astype(np.float32) @ self._matrix.T
+        union = x.sum(axis=1, keepdims=True) + self._matrix.sum(axis=1) - overlap
+        scores = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+        totals = scores.sum(axis=1, keepdims=True)
+        uniform = np.full_like(scores, 1.0 / scores.shape[1])
+        return np.where(totals > 0, scores / np.where(totals > 0, totals, 1), uniform)
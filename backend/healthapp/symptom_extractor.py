@@ -0,0 +1,203 @@
+import re
+from dataclasses import dataclass
+
+from .symptom_matcher import PhraseMatcher
+
+# Words plus the punctuation that ends a negation scope, in one regex pass
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[.,;:!?]")
+_PUNCTUATION = frozenset('.,;:!?')
+
+# Everyday wording that SYMPTOM_MAPPINGS and the column names do not cover
+NATURAL_LANGUAGE_SYNONYMS = {
+    'feverish': ['high_fever', 'mild_fever'],
+    'temperature': ['high_fever', 'mild_fever'],
+    'high temperature': ['high_fever'],
+    'migraine': ['headache'],
+    'headaches': ['headache'],
+    'nauseous': ['nausea'],
+    'nauseated': ['nausea'],
+    'queasy': ['nausea'],
+    'vomit': ['vomiting'],
+    'vomited': ['vomiting'],
+    'throw up': ['vomiting'],
+    'throwing up': ['vomiting'],
+    'threw up': ['vomiting'],
+    'exhausted': ['fatigue'],
+    'exhaustion': ['fatigue'],
+    'weak': ['weakness_in_limbs', 'muscle_weakness'],
+    'coughing': ['cough'],
+    'breathless': ['breathlessness'],
+    'breathlessness': ['breathlessness'],
+    'short of breath': ['breathlessness'],
+    'difficulty breathing': ['breathlessness'],
+    'trouble breathing': ['breathlessness'],
+    'loose stool': ['diarrhoea'],
+    'loose stools': ['diarrhoea'],
+    'runny stool': ['diarrhoea'],
+    'constipated': ['constipation'],
+    'dizzy': ['dizziness'],
+    'lightheaded': ['dizziness'],
+    'light headed': ['dizziness'],
+    'itchy': ['itching'],
+    'itch': ['itching'],
+    'rashes': ['skin_rash'],
+    'sweaty': ['sweating'],
+    'sweats': ['sweating'],
+    'shivers': ['shivering'],
+    'heartburn': ['acidity'],
+    'stomachache': ['stomach_pain', 'abdominal_pain'],
+    'stomach ache': ['stomach_pain', 'abdominal_pain'],
+    'stomach cramps': ['stomach_pain', 'abdominal_pain'],
+    'tummy ache': ['stomach_pain', 'abdominal_pain'],
+    'bellyache': ['belly_pain', 'abdominal_pain'],
+    'backache': ['back_pain'],
+    'stuffy nose': ['congestion'],
+    'blocked nose': ['congestion'],
+    'sneezes': ['continuous_sneezing'],
+}
+
+# "<part> hurts", "pain in my <part>", "sore <part>", "my <part> is aching"
+BODY_PART_PAIN = {
+    'head': ['headache'],
+    'stomach': ['stomach_pain', 'abdominal_pain'],
+    'tummy': ['stomach_pain', 'abdominal_pain'],
+    'abdomen': ['stomach_pain', 'abdominal_pain'],
+    'belly': ['belly_pain', 'abdominal_pain', 'stomach_pain'],
+    'chest': ['chest_pain'],
+    'back': ['back_pain'],
+    'spine': ['back_pain'],
+    'throat': ['throat_irritation'],
+    'neck': ['neck_pain'],
+    'knee': ['knee_pain'],
+    'knees': ['knee_pain'],
+    'joint': ['joint_pain'],
+    'joints': ['joint_pain'],
+    'muscle': ['muscle_pain'],
+    'muscles': ['muscle_pain'],
+    'hip': ['hip_joint_pain'],
+    'hips': ['hip_joint_pain'],
+}
+PAIN_WORDS = frozenset(['pain', 'pains', 'painful', 'ache', 'aches', 'aching', 'hurt', 'hurts', 'hurting', 'sore', 'tender'])
+LOCATION_WORDS = frozenset(['in', 'at', 'on'])
+DETERMINERS = frozenset(['my', 'the', 'both', 'his', 'her', 'our', 'their', 'a'])
+LINKING_VERBS = frozenset(['is', 'are', 'feels', 'feel', 'been', 'was', 'were', 'keeps', 'keep'])
+
+# Negation: a cue opens a scope of NEGATION_WINDOW tokens that a terminator closes early
+NEGATION_CUES = frozenset(['no', 'not', 'without', 'never', 'denies', 'deny', 'denied', 'nor', 'neither',
+                           'dont', 'doesnt', 'didnt', 'havent', 'hasnt', 'hadnt', 'arent', 'isnt'])
+# "don't" tokenises as "don" + "t"
+CONTRACTION_STEMS = frozenset(['don', 'doesn', 'didn', 'haven', 'hasn', 'hadn', 'aren', 'isn', 'wasn', 'weren'])
+NEGATION_TERMINATORS = frozenset(['but', 'however', 'although', 'though', 'except', 'yet', 'and', 'apart'])
+NEGATION_WINDOW = 5
+
+
+def tokenize_message(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_symptom_message(message):
+    """Legacy split of a chat message into symptom phrases on commas, 'and', 'or', ';' and '.'"""
+    # Process symptoms - handle both comma-separated and single symptoms
+    if ',' in message:
+        return [s.strip() for s in message.split(',')]
+
+    # Split by 'and', 'or', semicolons, or periods
+    symptoms = re.split(r'[,;.]|\s+and\s+|\s+or\s+', message.lower())
+    symptoms = [s.strip() for s in symptoms if s.strip()]
+
+    # If no separators found, treat the whole message as symptoms
+    if len(symptoms) <= 1:
+        symptoms = [message.strip()]
+    return symptoms
+
+
+@dataclass(slots=True)
+class Extraction:
+    """Symptoms found in one free-text message"""
+    columns: tuple = ()   # dataset columns the user reports, first-seen order
+    negated: tuple = ()   # columns the user explicitly denies ("no fever")
+    phrases: tuple = ()   # surface phrases behind `columns`
+
+    @property
+    def recognized(self):
+        return bool(self.columns or self.negated)
+
+    def to_dict(self):
+        return {'columns': list(self.columns), 'negated': list(self.negated), 'phrases': list(self.phrases)}
+
+
+class SymptomExtractor:
+    """Free-text symptom extractor compiled once from every phrase table.
+
+    A message is tokenised once; a single left-to-right walk then runs the
+    phrase trie, the body-part pain patterns and negation scoping together.
+    """
+
+    def __init__(self, phrase_tables=(), columns=None):
+        known = set(columns) if columns is not None else None
+
+        def keep(values):
+            return [v for v in values if known is None or v in known]
+
+        tables = list(phrase_tables) + [NATURAL_LANGUAGE_SYNONYMS]
+        self.matcher = PhraseMatcher(*[{p: keep(v) for p, v in table.items()} for table in tables])
+        self.body_parts = {part: keep(values) for part, values in BODY_PART_PAIN.items()}
+
+    def _pain_match(self, tokens, i):
+        """(start, end, columns) for a body-part pain pattern starting at token i, or None"""
+        token = tokens[i]
+        n = len(tokens)
+        body_parts = self.body_parts
+        if token in body_parts:
+            j = i + 1
+            # "my back is sore", "knees keep aching"
+            if j < n and tokens[j] in LINKING_VERBS:
+                j += 1
+            if j < n and tokens[j] in PAIN_WORDS:
+                return i, j + 1, body_parts[token]
+        elif token in PAIN_WORDS:
+            j = i + 1
+            # "pain in my chest"
+            if j < n and tokens[j] in LOCATION_WORDS:
+                j += 1
+            if j < n and tokens[j] in DETERMINERS:
+                j += 1
+            # "sore knees" needs no preposition; other pain words do
+            if j < n and tokens[j] in body_parts and (j > i + 1 or token == 'sore'):
+                return i, j + 1, body_parts[tokens[j]]
+        return None
+
+    def extract(self, text):
+        tokens = tokenize_message(text)
+        negated_until = -1
+        starts = {}
+        for start, end, values in self.matcher.iter_matches(tokens):
+            starts.setdefault(start, []).append((end, values))
+
+        positive = {}
+        negated = {}
+        phrases = {}
+        for i, token in enumerate(tokens):
+            # Negation scope bookkeeping
+            if token in NEGATION_CUES or (token == 't' and i and tokens[i - 1] in CONTRACTION_STEMS):
+                negated_until = i + NEGATION_WINDOW
+            elif token in _PUNCTUATION or token in NEGATION_TERMINATORS:
+                negated_until = -1
+            is_negated = i <= negated_until
+
+            found = starts.get(i, [])
+            pain = self._pain_match(tokens, i)
+            if pain is not None:
+                found = found + [(pain[1], pain[2])]
+
+            for end, values in found:
+                target = negated if is_negated else positive
+                for value in values:
+                    target[value] = None
+                if not is_negated and values:
+                    phrases[' '.join(tokens[i:end])] = None
+
+        # An explicit mention elsewhere overrides a denial
+        for value in positive:
+            negated.pop(value, None)
+        return Extraction(tuple(positive), tuple(negated), tuple(phrases))
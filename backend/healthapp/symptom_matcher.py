@@ -0,0 +1,67 @@
+import re
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase word tokens; underscores and punctuation act as separators"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class PhraseMatcher:
+    """Token trie compiled once from {phrase: values} tables.
+
+    Every phrase is matched on whole-word boundaries in a single left-to-right
+    pass over the message. The work per token is bounded by the longest phrase,
+    so adding synonyms grows the trie but not the time spent per message.
+    """
+
+    __slots__ = ('_root', 'max_depth', 'phrase_count')
+
+    def __init__(self, *tables):
+        self._root = {}
+        self.max_depth = 0
+        self.phrase_count = 0
+        for table in tables:
+            for phrase, values in table.items():
+                self.add(phrase, values)
+
+    def add(self, phrase, values):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        if isinstance(values, str):
+            values = [values]
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # Terminal payload lives under the None key; tokens are never None
+        if None not in node:
+            node[None] = []
+            self.phrase_count += 1
+        for value in values:
+            if value not in node[None]:
+                node[None].append(value)
+        self.max_depth = max(self.max_depth, len(tokens))
+
+    def iter_matches(self, tokens):
+        """Yield (start, end, values) for every phrase occurrence in a token list"""
+        root = self._root
+        for start in range(len(tokens)):
+            node = root.get(tokens[start])
+            end = start + 1
+            while node is not None:
+                if None in node:
+                    yield start, end, node[None]
+                if end == len(tokens):
+                    break
+                node = node.get(tokens[end])
+                end += 1
+
+    def find(self, text):
+        """Values of every phrase found in `text`, deduplicated in first-seen order"""
+        found = {}
+        for _, _, values in self.iter_matches(tokenize(text)):
+            for value in values:
+                found[value] = None
+        return list(found)
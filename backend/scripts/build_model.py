@@ -0,0 +1,34 @@
+"""Build the versioned chatbot engine artifact from the Data/ CSVs.
+
+Run from the backend directory:
+
+    python scripts/build_model.py           # rebuild only if the CSVs changed
+    python scripts/build_model.py --force   # always retrain
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthapp import model_artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='retrain even if the artifact is up to date')
+    parser.add_argument('--output', default=model_artifact.ARTIFACT_PATH, help='artifact path')
+    args = parser.parse_args()
+
+    artifact = model_artifact.load_or_build(path=args.output, force=args.force)
+
+    print(f"Model version: {artifact['model_version']}")
+    print(f"Source hash:   {artifact['source_hash']}")
+    print(f"Features:      {len(artifact['cols'])}")
+    print(f"Diseases:      {len(artifact['le'].classes_)}")
+    print(f"Accuracy:      {artifact['accuracy']:.2f}")
+    print(f"Artifact:      {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app package the same way the benchmarks do: from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def engine():
+    """The chatbot engine with its model loaded (from the persisted artifact when it is current)"""
+    from healthapp import chatbot_engine
+    if not chatbot_engine.ensure_model_loaded():
+        pytest.skip(f"model could not be loaded: {chatbot_engine.MODEL_ERROR}")
+    return chatbot_engine
@@ -0,0 +1,23 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from healthapp.appointments import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize('when, appointment_id', [
+    (datetime(2026, 6, 1, 9, 30), 1),
+    (datetime(2026, 12, 31, 23, 30), 987654321),
+    (datetime(2026, 6, 1, 9, 30, 0, 250000), 42),
+])
+def test_cursor_round_trip(when, appointment_id):
+    cursor = encode_cursor(SimpleNamespace(appointment_date=when, id=appointment_id))
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (when, appointment_id)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'MjAyNi0wNi0wMQ', 'bm9uc2Vuc2V8MQ'])
+def test_bad_cursor_is_a_value_error(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor)
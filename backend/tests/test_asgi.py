@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from flask import Flask, Response
+
+from healthapp.asgi import PooledWsgiToAsgi, PulsePalASGI
+from healthapp.inference_pool import InferencePool
+
+
+@pytest.fixture
+def adapter():
+    app = Flask(__name__)
+    app.closed = []
+
+    @app.route('/thread')
+    def thread():
+        return threading.current_thread().name
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(0.3)
+        return 'done'
+
+    @app.route('/stream')
+    def stream():
+        response = Response(iter([b'one ', b'two']), headers={'Content-Length': '6'})
+        response.call_on_close(lambda: app.closed.append(True))
+        return response
+
+    adapter = PooledWsgiToAsgi(app, threads=2)
+    yield adapter
+    adapter.shutdown()
+
+
+async def get(adapter, path, headers=(), full=False):
+    """(status, body) of one GET through the adapter; the raw messages with `full`"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'http_version': '1.1',
+             'headers': list(headers)}
+    await adapter(scope, receive, send)
+    assert messages[0]['type'] == 'http.response.start'
+    if full:
+        return messages
+    return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def test_requests_run_on_the_adapter_pool(adapter):
+    status, body = asyncio.run(get(adapter, '/thread'))
+    assert status == 200
+    assert body.decode().startswith('wsgi')
+
+
+def test_slow_requests_do_not_queue_behind_each_other(adapter):
+    async def both():
+        return await asyncio.gather(get(adapter, '/slow'), get(adapter, '/slow'))
+    started = time.monotonic()
+    assert asyncio.run(both()) == [(200, b'done'), (200, b'done')]
+    assert time.monotonic() - started < 0.55
+
+
+def test_body_is_cut_to_content_length_and_closed(adapter):
+    assert asyncio.run(get(adapter, '/stream')) == (200, b'one tw')
+    assert adapter.wsgi_application.closed == [True]
+
+
+def test_too_many_duplicate_headers(adapter):
+    adapter.duplicate_header_limit = 2
+    status, body = asyncio.run(get(adapter, '/thread', [(b'x-a', b'1')] * 3))
+    assert status == 400
+    assert body == b'Bad Request: Too many duplicate headers'
+
+
+@pytest.fixture
+def native():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', CHATBOT_WARMUP_TIMEOUT=1, CORS_ORIGINS=['http://localhost:3000'])
+    pool = InferencePool(max_workers=1)
+    native = PulsePalASGI(app, pool=pool, user_store=object())
+    yield native
+    pool.shutdown(wait=False)
+    native.wsgi.shutdown()
+
+
+def response_headers(native, headers):
+    start = asyncio.run(get(native, '/api/pool', headers, full=True))[0]
+    assert start['status'] == 200
+    return dict(start['headers'])
+
+
+def test_request_id_and_origin_headers(native):
+    headers = response_headers(native, [(b'x-request-id', b'trace-42'), (b'origin', b'http://localhost:3000')])
+    assert headers[b'x-request-id'] == b'trace-42'
+    assert headers[b'access-control-allow-origin'] == b'http://localhost:3000'
+
+
+def test_undecodable_headers_are_ignored(native):
+    headers = response_headers(native, [(b'x-request-id', b'\xff\xfe-id'), (b'origin', b'http://localhost:3000\xff')])
+    assert headers[b'x-request-id'] != b'\xff\xfe-id'
+    assert headers[b'x-request-id'].decode().isalnum()
+    assert b'access-control-allow-origin' not in headers
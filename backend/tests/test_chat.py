@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from healthapp import chat, db
+from healthapp.data_version import track_changes
+from healthapp.models import HealthRecord, User
+
+DOCTOR, PATIENT = 1, 2
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'chat.sqlite3'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        track_changes(db.engine)
+        db.session.add_all([
+            User(id=DOCTOR, name='d', email='d@example.com', password='x', role='doctor'),
+            User(id=PATIENT, name='p', email='p@example.com', password='x', role='patient'),
+        ])
+        db.session.commit()
+        # The notifier's memo is per process; start each database from a clean one
+        chat.notifier._reset()
+        yield app
+    chat.notifier._reset()
+
+
+@pytest.fixture
+def queries(app):
+    executed = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: executed.append(args[2]))
+    return executed
+
+
+def send(text, sender=DOCTOR, receiver=PATIENT):
+    return chat.send_message(db.session.get(User, sender), receiver, text)
+
+
+def test_quiet_poll_is_answered_without_a_query(app, queries):
+    first = send('hello').id
+    assert [m.id for m in chat.sync(PATIENT, 0)] == [first]
+    assert chat.sync(PATIENT, first) == []
+    queries.clear()
+    assert chat.sync(PATIENT, first) == []
+    assert queries == []
+
+    # Commits to other tables leave the memo valid
+    db.session.add(HealthRecord(patient_id=PATIENT, symptoms='[]', diagnosis='x'))
+    db.session.commit()
+    queries.clear()
+    assert chat.sync(PATIENT, first) == []
+    assert queries == []
+
+    second = send('are you there?').id
+    assert [m.id for m in chat.sync(PATIENT, first)] == [second]
+
+
+def test_waiter_cap_answers_at_once(app, monkeypatch):
+    monkeypatch.setattr(chat, 'MAX_WAITERS', 0)
+    chat.notifier._reset()
+    started = time.monotonic()
+    with pytest.raises(chat.TooManyWaiters):
+        chat.sync(PATIENT, 0, wait=5)
+    assert time.monotonic() - started < 1
+    # Pending messages are still returned when every slot is taken
+    message = send('hello')
+    assert [m.id for m in chat.sync(PATIENT, 0, wait=5)] == [message.id]
+    # So is a poll that does not wait
+    assert chat.sync(PATIENT, message.id) == []
+
+
+def test_new_message_wakes_a_waiting_poll(app, monkeypatch):
+    # Only the notifier can wake the poll before its deadline
+    monkeypatch.setattr(chat, 'POLL_INTERVAL', 30)
+    result = {}
+
+    def poll():
+        with app.app_context():
+            started = time.monotonic()
+            result['messages'] = [m.id for m in chat.sync(PATIENT, 0, wait=20)]
+            result['seconds'] = time.monotonic() - started
+
+    waiter = threading.Thread(target=poll)
+    waiter.start()
+    time.sleep(0.3)
+    message = send('wake up')
+    waiter.join(10)
+    assert result['messages'] == [message.id]
+    assert result['seconds'] < 5
+
+
+def test_wait_is_bounded(app):
+    started = time.monotonic()
+    assert chat.sync(PATIENT, 0, wait=0.3) == []
+    assert chat.sync(PATIENT, 0, wait=float('nan')) == []
+    assert 0.25 <= time.monotonic() - started < 2
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from healthapp import chatbot_engine, model_artifact
+from healthapp.fuzzy_index import FuzzyIndex
+
+PHRASES = ['fever', 'headache', 'cough', 'itching', 'joint pain', 'vomiting', 'no fever', 'zzz', '']
+
+
+def random_inputs(engine, rng, count):
+    """Mixed pre-extracted column lists and free-text symptom lists"""
+    inputs = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            columns = rng.sample(engine.cols, rng.randint(1, 6))
+            inputs.append((columns, columns))
+        else:
+            inputs.append((rng.sample(PHRASES, rng.randint(0, 3)), None))
+    return inputs
+
+
+def comparable(result):
+    data = result.to_dict()
+    data['probability'] = pytest.approx(data['probability'], abs=1e-6)
+    data['candidates'] = [
+        dict(candidate, probability=pytest.approx(candidate['probability'], abs=1e-6))
+        for candidate in data['candidates']
+    ]
+    return data
+
+
+@pytest.mark.parametrize('estimator', model_artifact.TOP_K_ESTIMATORS)
+def test_predict_batch_matches_analyze_symptoms(engine, estimator):
+    rng = random.Random(estimator)
+    inputs = random_inputs(engine, rng, 60)
+    symptom_lists = [symptoms for symptoms, _ in inputs]
+    mapped_columns = [columns for _, columns in inputs]
+    days = [rng.randint(1, 14) for _ in inputs]
+    for top_k in (1, 3):
+        batch = engine.predict_batch(symptom_lists, days, top_k, estimator, mapped_columns)
+        single = [
+            engine.analyze_symptoms(symptoms, row_days, top_k, estimator, columns)
+            for symptoms, columns, row_days in zip(symptom_lists, mapped_columns, days)
+        ]
+        assert [comparable(result) for result in batch] == [comparable(result) for result in single]
+        assert any(result.ok for result in batch)
+
+
+@pytest.fixture
+def fuzzy(monkeypatch):
+    index = FuzzyIndex({
+        'hip pain': 'hip_pain', 'back pain': 'back_pain', 'knee pain': 'knee_pain',
+        'skin rash': 'skin_rash', 'chills': 'chills',
+    })
+    monkeypatch.setattr(chatbot_engine, 'fuzzy_index', index)
+    return index
+
+
+def test_fuzzy_near_tie_is_rejected(fuzzy):
+    best, runner_up = fuzzy.search('pain', limit=2, min_score=chatbot_engine.FUZZY_MIN_SCORE)
+    assert 0 < best.score - runner_up.score < chatbot_engine.FUZZY_MIN_MARGIN
+    assert chatbot_engine.fuzzy_match_columns(['pain']) == []
+
+
+def test_fuzzy_clear_best_match_is_accepted(fuzzy):
+    best, runner_up = fuzzy.search('bak pain', limit=2, min_score=chatbot_engine.FUZZY_MIN_SCORE)
+    assert best.score - runner_up.score >= chatbot_engine.FUZZY_MIN_MARGIN
+    assert chatbot_engine.fuzzy_match_columns(['bak pain']) == ['back_pain']
+    # A lone candidate needs no margin; an ambiguous symptom does not block the others
+    assert chatbot_engine.fuzzy_match_columns(['chils', 'pain', 'skin rsh']) == ['chills', 'skin_rash']
+
+
+def test_fuzzy_margin_is_the_only_reason_for_rejecting(fuzzy, monkeypatch):
+    monkeypatch.setattr(chatbot_engine, 'FUZZY_MIN_MARGIN', 0.0)
+    assert chatbot_engine.fuzzy_match_columns(['pain']) == ['hip_pain']
@@ -0,0 +1,72 @@
+import pytest
+from flask import Flask
+from flask_login import LoginManager
+
+from healthapp import db, routes
+from healthapp.models import ChatbotTurn, User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Named after the package so its templates are found
+    app = Flask('healthapp')
+    app.config.update(SECRET_KEY='test', CHATBOT_WARMUP_TIMEOUT=0.1,
+                      SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'chatbot.sqlite3'}")
+    db.init_app(app)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+    app.register_blueprint(routes.main)
+    monkeypatch.setattr(routes, 'record_assessment', lambda patient_id, result: None)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name='p', email='p@example.com', password='x'))
+        db.session.commit()
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    return client
+
+
+def turns():
+    return [(turn.sender, turn.text) for turn in ChatbotTurn.query.order_by(ChatbotTurn.id)]
+
+
+def test_message_waits_for_the_model_before_extracting(client, monkeypatch):
+    def not_loaded(symptoms):
+        raise AssertionError('symptoms extracted before the model loaded')
+    monkeypatch.setattr(routes, 'ensure_model_loaded', lambda timeout=None: False)
+    monkeypatch.setattr(routes, 'symptoms_from_message', not_loaded)
+    assert client.post('/chatbot', data={'message': 'fever and cough'}).status_code == 302
+    (sender, text), (bot, reply) = turns()
+    assert (sender, text) == ('user', 'fever and cough')
+    assert bot == 'bot' and 'warming up' in reply
+
+
+def test_message_is_answered_once_the_model_is_ready(engine, client):
+    assert client.post('/chatbot', data={'message': 'I have a high fever and chills'}).status_code == 302
+    (_, _), (bot, reply) = turns()
+    assert bot == 'bot' and 'Symptoms Analyzed' in reply
+
+
+def render_log(app, messages):
+    """The chat page's content block; base.html does not place it, so it is rendered directly"""
+    template = app.jinja_env.get_template('chatbot.html')
+    with app.test_request_context():
+        context = template.new_context({'messages': messages, 'older': None, 'loading': False, 'max_chars': 10})
+        return ''.join(template.blocks['content'](context))
+
+
+def test_user_turns_are_escaped(app):
+    html = render_log(app, [
+        ChatbotTurn(sender='user', text='<script>alert(1)</script> & fever'),
+        ChatbotTurn(sender='bot', text='<strong>Malaria</strong>'),
+    ])
+    assert '<script>' not in html
+    assert '&lt;script&gt;alert(1)&lt;/script&gt; &amp; fever' in html
+    assert '<strong>Malaria</strong>' in html
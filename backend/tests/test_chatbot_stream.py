@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from flask import Flask
+from flask_login import LoginManager
+
+STAGES = ['symptoms', 'prediction', 'description', 'precautions', 'risk', 'done']
+
+
+@pytest.fixture
+def client(engine):
+    from healthapp.routes import main
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.config['CHATBOT_WARMUP_TIMEOUT'] = 5
+    # Anonymous requests only, so no assessment is recorded
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: None)
+    app.register_blueprint(main)
+    return app.test_client()
+
+
+def read_events(response):
+    """(event, data) pairs of a text/event-stream body"""
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = []
+    for frame in response.get_data(as_text=True).split('\n\n'):
+        if not frame:
+            continue
+        event, data = frame.split('\n')
+        assert event.startswith('event: ') and data.startswith('data: ')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_stages_arrive_in_order(client):
+    body = {'message': 'I have a high fever, chills and a headache', 'format': 'html'}
+    events = read_events(client.post('/api/chatbot/stream', json=body))
+    assert [event for event, _ in events] == STAGES
+    data = dict(events)
+    assert data['symptoms']['matched_columns']
+    assert data['prediction']['disease'] == data['description']['disease'] == data['precautions']['disease']
+    # 'done' carries exactly what /api/chatbot answers
+    assert data['done'] == client.post('/api/chatbot', json=body).get_json()
+    assert data['done']['result']['status'] == 'ok'
+
+
+def test_event_source_query_parameters(client):
+    events = read_events(client.get('/api/chatbot/stream', query_string={'message': 'fever and cough', 'top_k': 3}))
+    assert [event for event, _ in events] == STAGES
+    assert len(dict(events)['prediction']['candidates']) == 3
+
+
+@pytest.mark.parametrize('body, error', [
+    ({}, 'Message is required'),
+    ({'message': 'fever', 'format': 'xml'}, 'format must be one of markdown, html, json'),
+    ({'message': 'fever', 'top_k': 0}, 'top_k'),
+    ({'message': 'fever', 'top_k': 3, 'estimator': 'oracle'}, 'estimator'),
+])
+def test_bad_input_is_a_plain_400(client, body, error):
+    response = client.post('/api/chatbot/stream', json=body)
+    assert response.status_code == 400
+    assert response.mimetype == 'application/json'
+    assert error in response.get_json()['error']
+
+
+def test_unrecognized_symptoms_skip_to_done(client):
+    events = read_events(client.post('/api/chatbot/stream', json={'message': 'qwxz zzvb'}))
+    assert [event for event, _ in events][-1] == 'done'
+    assert 'prediction' not in dict(events)
+    assert dict(events)['done']['result']['status'] == 'unrecognized'
+
+
+def test_failed_analysis_ends_with_an_error_done_event(client, engine, monkeypatch):
+    def broken(*args):
+        raise RuntimeError('estimator exploded')
+    monkeypatch.setattr(engine, 'predict_stage', broken)
+    events = read_events(client.post('/api/chatbot/stream', json={'message': 'fever and cough', 'format': 'json'}))
+    assert [event for event, _ in events] == ['symptoms', 'done']
+    result = dict(events)['done']['result']
+    assert result['status'] == 'error'
+    assert 'estimator exploded' in json.dumps(result)
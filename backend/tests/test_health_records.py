@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from healthapp import db, health_records
+from healthapp.health_records import HealthRecordWriter
+from healthapp.models import HealthRecord, User
+
+RESULT = {
+    'status': 'ok', 'symptoms': ['fever'], 'matched_columns': ['high_fever'],
+    'disease': 'Malaria', 'probability': 0.9, 'risk_level': 4.5, 'risk_category': 'consult',
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'records.sqlite3'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name='p', email='p@example.com', password='x'))
+        db.session.commit()
+        yield app
+
+
+def rows(count):
+    return [health_records.assessment_row(1, RESULT, 'test') for _ in range(count)]
+
+
+def test_writes_are_batched(app):
+    writer = HealthRecordWriter(batch_size=5, flush_interval=0.5)
+    writer.bind(db.engine)
+    commits = []
+    event.listen(db.engine, 'commit', lambda connection: commits.append(1))
+    for row in rows(12):
+        assert writer.submit(row)
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert HealthRecord.query.count() == 12
+    assert len(commits) == 3
+
+
+def test_full_queue_drops_without_blocking(app):
+    writer = HealthRecordWriter(maxsize=2)
+    writer.bind(db.engine)
+    # No writer thread, so nothing drains the queue
+    writer._ensure_thread = lambda: None
+    dropped = health_records._dropped.value
+    assert all(writer.submit(row) for row in rows(2))
+    started = time.perf_counter()
+    assert writer.submit(rows(1)[0]) is False
+    assert time.perf_counter() - started < 0.05
+    assert health_records._dropped.value == dropped + 1
+    assert writer.depth() == 2
+
+
+def test_close_drains_pending_records(app):
+    writer = HealthRecordWriter(batch_size=1000, flush_interval=10)
+    writer.bind(db.engine)
+    for row in rows(50):
+        writer.submit(row)
+    started = time.perf_counter()
+    writer.close()
+    # The _STOP marker ends the batch linger instead of waiting out flush_interval
+    assert time.perf_counter() - started < 5
+    assert writer.depth() == 0
+    assert HealthRecord.query.count() == 50
+
+
+def test_submit_requires_an_engine():
+    with pytest.raises(RuntimeError):
+        HealthRecordWriter().submit({})
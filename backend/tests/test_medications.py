@@ -0,0 +1,116 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from healthapp.medications import DAY, MedicationView, parse_frequency
+
+WEEK = 7 * DAY
+
+
+@pytest.mark.parametrize('frequency, period, times', [
+    ('once daily', DAY, ['08:00']),
+    ('Twice daily', DAY, ['08:00', '20:00']),
+    ('BID', DAY, ['08:00', '20:00']),
+    ('every 12 hours', DAY, ['08:00', '20:00']),
+    ('morning and evening', DAY, ['08:00', '20:00']),
+    ('TID', DAY, ['08:00', '14:00', '20:00']),
+    ('3 times a day', DAY, ['08:00', '14:00', '20:00']),
+    ('QID', DAY, ['08:00', '12:00', '16:00', '20:00']),
+    ('q6h', DAY, ['02:00', '08:00', '14:00', '20:00']),
+    ('at bedtime', DAY, ['22:00']),
+    ('at 9am and 9pm', DAY, ['09:00', '21:00']),
+    ('8 a.m.', DAY, ['08:00']),
+    ('every other day', 2 * DAY, ['08:00']),
+    ('every 2 days', 2 * DAY, ['08:00']),
+    ('weekly', WEEK, ['08:00']),
+])
+def test_parse_frequency_phrasings(frequency, period, times):
+    schedule = parse_frequency(frequency)
+    assert schedule.period == period
+    assert schedule.to_dict()['times'] == times
+    assert not schedule.as_needed
+
+
+def test_equivalent_daily_regimens_are_one_schedule():
+    assert parse_frequency('q12h') == parse_frequency('bid') == parse_frequency('8am and 8pm')
+
+
+def test_weekly_counts_spread_over_the_week():
+    assert parse_frequency('twice a week').offsets == (8 * 60, 3 * DAY + 8 * 60)
+
+
+def test_as_needed():
+    schedule = parse_frequency('as needed')
+    assert schedule.as_needed
+    assert schedule.offsets == ()
+    assert schedule.to_dict()['doses_per_day'] == 0
+
+
+@pytest.mark.parametrize('frequency', ['', '   ', None, 'banana', 'every 30 minutes', 'at 13pm'])
+def test_parse_frequency_rejects(frequency):
+    with pytest.raises(ValueError):
+        parse_frequency(frequency)
+
+
+FREQUENCIES = ['once daily', 'BID', 'TID', 'q6h', 'every 8 hours', 'at bedtime', 'at 9am and 9pm',
+               'every other day', 'weekly', 'twice a week', 'every 36 hours', 'as needed', 'take with food']
+EPOCH = date(1970, 1, 1)
+
+
+def per_dose(rows, start, end):
+    """Step through each prescription's doses one datetime at a time"""
+    doses = []
+    for medication_id, patient_id, frequency, start_day, end_day in rows:
+        try:
+            schedule = parse_frequency(frequency)
+        except ValueError:
+            continue
+        if schedule.as_needed:
+            continue
+        midnight = datetime.combine(EPOCH + timedelta(days=start_day), datetime.min.time())
+        stop = end if end_day is None else min(end, midnight + timedelta(days=end_day - start_day + 1))
+        for offset in schedule.offsets:
+            due = midnight + timedelta(minutes=offset)
+            while due < stop:
+                if due >= start:
+                    doses.append((due, patient_id, medication_id))
+                due += timedelta(minutes=schedule.period)
+    return sorted(doses)
+
+
+def random_rows(rng, count, today):
+    rows = []
+    for medication_id in range(1, count + 1):
+        start = today - timedelta(days=rng.randrange(-3, 60))
+        end = None if rng.random() < 0.5 else start + timedelta(days=rng.randrange(0, 20))
+        rows.append((medication_id, rng.randint(1, 20), rng.choice(FREQUENCIES),
+                     (start - EPOCH).days, end and (end - EPOCH).days))
+    return rows
+
+
+def test_due_matches_a_per_dose_expansion():
+    rng = random.Random(23)
+    today = date(2026, 6, 1)
+    rows = random_rows(rng, 300, today)
+    view = MedicationView(rows)
+    assert view.unscheduled == sum(row[2] == 'take with food' for row in rows)
+    for _ in range(40):
+        start = datetime.combine(today, datetime.min.time()) + timedelta(
+            days=rng.randrange(-2, 3), minutes=rng.randrange(DAY), seconds=rng.choice([0, 0, 30]))
+        end = start + timedelta(hours=rng.choice([1 / 60, 1, 24, 24 * 7]))
+        due = view.due(start, end)
+        assert [(d.due_at, d.patient_id, d.medication_id) for d in due.doses()] == per_dose(rows, start, end)
+
+
+def test_due_window_edges():
+    day = (date(2026, 6, 1) - EPOCH).days
+    view = MedicationView([(1, 7, 'at 9am and 9pm', day, day), (2, 7, 'weekly', day, None)])
+    start = datetime(2026, 6, 1, 9, 0)
+    # Start is inclusive, end exclusive, and nothing is due after the end date
+    assert [d.due_at for d in view.due(start, start + timedelta(hours=12)).doses()] == [start]
+    assert [d.due_at for d in view.due(start, start + timedelta(days=2)).doses()] == [
+        start, datetime(2026, 6, 1, 21, 0)]
+    # The weekly dose at 08:00 on the start date falls before the window, the next one inside it
+    assert [d.medication_id for d in view.due(start, start + timedelta(days=7)).doses()] == [1, 1, 2]
+    assert len(MedicationView([]).due(start, start + timedelta(days=1))) == 0
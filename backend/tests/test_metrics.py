@@ -0,0 +1,106 @@
+import re
+
+import pytest
+from flask import Flask
+
+from healthapp import metrics
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+UNESCAPE = {'\\\\': '\\', '\\n': '\n', '\\"': '"'}
+ODD_LABEL = 'say "hi"\\now\nnext'
+
+
+def parse_labels(text):
+    labels, position = {}, 0
+    while position < len(text):
+        match = LABEL_RE.match(text, position)
+        assert match, f'bad label set: {text!r}'
+        labels[match.group(1)] = re.sub(r'\\.', lambda m: UNESCAPE[m.group(0)], match.group(2))
+        position = match.end()
+    return labels
+
+
+def parse_exposition(text):
+    """{family: {'help', 'type', 'samples': [(name, labels, value)]}} from the text format"""
+    assert text.endswith('\n')
+    families, current = {}, None
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            name, help_text = line[len('# HELP '):].split(' ', 1)
+            assert name not in families, f'{name} declared twice'
+            current = families[name] = {'help': help_text, 'type': None, 'samples': []}
+        elif line.startswith('# TYPE '):
+            name, kind = line[len('# TYPE '):].split(' ')
+            assert current is families.get(name) and current['type'] is None, f'TYPE {name} without HELP'
+            assert kind in ('counter', 'gauge', 'histogram')
+            current['type'] = kind
+        else:
+            match = SAMPLE_RE.match(line)
+            assert match and current is not None, f'bad sample line: {line!r}'
+            name, labels, value = match.groups()
+            family = name
+            if current['type'] == 'histogram':
+                family = re.sub(r'_(bucket|sum|count)$', '', name)
+                assert family != name, f'{name} is not a histogram series'
+            assert families.get(family) is current, f'{name} outside its family'
+            current['samples'].append((name, parse_labels(labels or ''), float(value)))
+    return families
+
+
+@pytest.fixture
+def client():
+    from healthapp.routes import main
+    app = Flask(__name__)
+    app.register_blueprint(main)
+    return app.test_client()
+
+
+@pytest.fixture
+def test_metrics():
+    counter = metrics.Counter('pulsepal_test_events_total', 'Test events', ['kind'])
+    histogram = metrics.Histogram('pulsepal_test_seconds', 'Test latency', ['kind'], buckets=(0.1, 1.0))
+    yield counter, histogram
+    metrics.REGISTRY._metrics.remove(counter)
+    metrics.REGISTRY._metrics.remove(histogram)
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    return parse_exposition(response.get_data(as_text=True))
+
+
+def test_every_family_has_help_and_type(client):
+    families = scrape(client)
+    assert 'pulsepal_http_request_seconds' in families
+    for name, family in families.items():
+        assert family['help'] and family['type'], name
+
+
+def test_histogram_series(client, test_metrics):
+    _, histogram = test_metrics
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('query').observe(value)
+    family = scrape(client)['pulsepal_test_seconds']
+    assert family['type'] == 'histogram'
+    buckets = [(labels['le'], value) for name, labels, value in family['samples'] if name.endswith('_bucket')]
+    # Cumulative, upper bounds inclusive, ending with +Inf
+    assert buckets == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+    samples = {name: (labels, value) for name, labels, value in family['samples'] if not name.endswith('_bucket')}
+    assert samples['pulsepal_test_seconds_sum'] == ({'kind': 'query'}, pytest.approx(3.65))
+    assert samples['pulsepal_test_seconds_count'] == ({'kind': 'query'}, 4)
+
+
+def test_label_values_are_escaped(client, test_metrics):
+    counter, histogram = test_metrics
+    counter.labels(ODD_LABEL).inc(2)
+    counter.labels('plain').inc()
+    histogram.labels(ODD_LABEL).observe(0.5)
+    response = client.get('/metrics').get_data(as_text=True)
+    assert 'pulsepal_test_events_total{kind="say \\"hi\\"\\\\now\\nnext"} 2' in response.splitlines()
+    families = parse_exposition(response)
+    assert [(labels, value) for _, labels, value in families['pulsepal_test_events_total']['samples']] == [
+        ({'kind': 'plain'}, 1), ({'kind': ODD_LABEL}, 2)]
+    assert {labels['kind'] for _, labels, _ in families['pulsepal_test_seconds']['samples']} == {ODD_LABEL}
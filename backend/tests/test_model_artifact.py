@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from healthapp.model_artifact import DATA_DIR, parse_training_csv
+
+# The reference reader, kept before any test patches pandas
+read_csv = pd.read_csv
+
+
+def assert_matches_pandas(data, path):
+    expected = read_csv(path)
+    assert data.columns == list(expected.columns[:-1])
+    assert data.matrix.dtype == np.uint8
+    assert np.array_equal(data.matrix, expected.iloc[:, :-1].to_numpy())
+    assert list(data.labels) == list(expected.iloc[:, -1])
+
+
+@pytest.fixture
+def no_pandas(monkeypatch):
+    """Fail if parse_training_csv leaves the fast path"""
+    def refuse(*args, **kwargs):
+        raise AssertionError('fell back to pandas')
+    monkeypatch.setattr(pd, 'read_csv', refuse)
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'Training.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_fast_path_matches_pandas(tmp_path, no_pandas):
+    path = write(tmp_path, 'itching,skin_rash,chills,prognosis\n1,0,1,Fungal infection\n0,1,0,Allergy\n0,0,0,Drug Reaction\n\n')
+    assert_matches_pandas(parse_training_csv(path), path)
+
+
+def test_repeated_column_names_are_renamed_like_pandas(tmp_path, no_pandas):
+    path = write(tmp_path, 'chills,chills,fatigue,prognosis\n1,0,1,Malaria\n')
+    assert parse_training_csv(path).columns == ['chills', 'chills.1', 'fatigue']
+
+
+@pytest.mark.parametrize('text', [
+    # A quoted label containing a comma
+    'itching,chills,prognosis\n1,0,"Allergy, seasonal"\n0,1,Malaria\n',
+    # A value other than 0/1
+    'itching,chills,prognosis\n2,0,Allergy\n0,1,Malaria\n',
+    # A field wider than one digit
+    'itching,chills,prognosis\n10,0,Allergy\n0,1,Malaria\n',
+])
+def test_other_layouts_fall_back_to_pandas(tmp_path, text):
+    path = write(tmp_path, text)
+    assert_matches_pandas(parse_training_csv(path), path)
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(DATA_DIR, 'Training.csv')), reason='no training data')
+def test_shipped_training_data_matches_pandas(no_pandas):
+    path = os.path.join(DATA_DIR, 'Training.csv')
+    assert_matches_pandas(parse_training_csv(path), path)
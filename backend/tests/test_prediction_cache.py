@@ -0,0 +1,71 @@
+import pytest
+
+from healthapp.prediction_cache import PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(maxsize=10, ttl=60, clock=clock)
+    cache.put('key', 'value')
+    clock.now += 59.9
+    assert cache.get('key') == 'value'
+    clock.now += 0.1
+    assert cache.get('key') is None
+    assert len(cache) == 0
+    assert cache.stats()['expirations'] == 1
+
+
+def test_lru_eviction_order_at_capacity():
+    cache = PredictionCache(maxsize=3, ttl=60)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    # A hit makes 'a' the most recently used, so 'b' is the oldest
+    assert cache.get('a') == 'A'
+    cache.put('d', 'D')
+    assert cache.get('b') is None
+    cache.put('e', 'E')
+    assert cache.get('c') is None
+    assert [cache.get(key) for key in 'ade'] == ['A', 'D', 'E']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_version_bump_empties_the_cache():
+    cache = PredictionCache(maxsize=10, ttl=60)
+    cache.bind_version('v1')
+    cache.put('key', 'value')
+    cache.bind_version('v1')
+    assert cache.get('key') == 'value'
+    cache.bind_version('v2')
+    assert len(cache) == 0
+    assert cache.get('key') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+@pytest.fixture
+def prediction_cache(engine):
+    engine.prediction_cache.clear()
+    yield engine.prediction_cache
+    engine.prediction_cache.clear()
+
+
+def test_key_includes_estimator_and_top_k(engine, prediction_cache):
+    symptoms = ['fever', 'headache']
+    tree = engine.analyze_symptoms(symptoms, estimator='tree')
+    naive_bayes = engine.analyze_symptoms(symptoms, estimator='naive_bayes')
+    top_3 = engine.analyze_symptoms(symptoms, top_k=3, estimator='tree')
+    assert len(prediction_cache) == 3
+    assert (tree.estimator, naive_bayes.estimator) == ('tree', 'naive_bayes')
+    assert tree.probability != naive_bayes.probability
+    assert len(tree.candidates) == 1 and len(top_3.candidates) == 3
+
+    hits = prediction_cache.hits
+    assert engine.analyze_symptoms(symptoms, estimator='naive_bayes').probability == naive_bayes.probability
+    assert prediction_cache.hits == hits + 1
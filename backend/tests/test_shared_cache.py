@@ -0,0 +1,89 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from healthapp import shared_cache
+from healthapp.shared_cache import SharedPredictionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(shared_cache, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def make_cache(tmp_path, **options):
+    cache = SharedPredictionCache(str(tmp_path / 'cache.sqlite3'), **options)
+    cache.bind_version('v1')
+    return cache
+
+
+def test_eviction_keeps_the_most_recently_used(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=3, evict_every=1000, touch_interval=0)
+    for i in range(4):
+        clock.now += 1
+        cache.put(f'k{i}', i)
+    # A hit refreshes last_used, so k1 becomes the least recently used
+    clock.now += 1
+    assert cache.get('k0') == 0
+    cache.evict()
+    assert [cache.get(f'k{i}') for i in range(4)] == [0, None, 2, 3]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_runs_every_evict_every_puts(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2, evict_every=5)
+    for i in range(5):
+        clock.now += 1
+        cache.put(f'k{i}', i)
+    assert cache.stats()['evictions'] == 3
+    assert [cache.get(f'k{i}') for i in range(5)] == [None, None, None, 3, 4]
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put('key', {'disease': 'Malaria'})
+    clock.now += 60
+    assert cache.get('key') is None
+
+
+def test_keys_are_scoped_by_model_version(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    key = SharedPredictionCache.make_key([['cough', 'high_fever'], 1, 1, 'tree', 'CalibratedClassifierCV'])
+    cache.put(key, {'disease': 'Common Cold'})
+    cache.bind_version('v2')
+    assert cache.get(key) is None
+    cache.put(key, {'disease': 'Pneumonia'})
+    cache.bind_version('v1')
+    assert cache.get(key) == {'disease': 'Common Cold'}
+    # A second worker process sees the same rows
+    other = make_cache(tmp_path)
+    assert other.get(key) == {'disease': 'Common Cold'}
+
+
+def test_unusable_database_is_a_miss(tmp_path):
+    # A directory cannot be opened as a database
+    cache = SharedPredictionCache(str(tmp_path))
+    cache.bind_version('v1')
+    cache.put('key', {'disease': 'Malaria'})
+    assert cache.get('key') is None
+    cache.clear()
+    assert cache.stats()['errors'] == 3
+
+
+def test_locked_database_does_not_fail_writes(tmp_path):
+    cache = make_cache(tmp_path, busy_timeout=0.01)
+    cache.put('key', 1)
+    writer = sqlite3.connect(cache.path, isolation_level=None)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        cache.put('other', 2)
+        assert cache.stats()['errors'] == 1
+        # WAL readers are not blocked by the writer
+        assert cache.get('key') == 1
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+    assert cache.get('other') is None
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def signatures(engine):
+    """Each disease's symptom set, read straight from the training rows"""
+    data = engine.reduced_data[engine.cols]
+    return {disease: {col for col in engine.cols if row[col] > 0} for disease, row in data.iterrows()}
+
+
+def brute_exact(signatures, query):
+    return [disease for disease, symptoms in signatures.items() if query <= symptoms]
+
+
+def brute_rank(signatures, query, k):
+    scored = []
+    for disease, symptoms in signatures.items():
+        overlap = len(symptoms & query)
+        if overlap:
+            scored.append((-overlap / len(symptoms | query), -overlap, disease))
+    return [(disease, -jaccard, -overlap) for jaccard, overlap, disease in sorted(scored)[:k]]
+
+
+def test_full_signature_is_an_exact_match(engine, signatures):
+    index = engine.signature_index
+    for disease, symptoms in signatures.items():
+        query = index.encode(symptoms)
+        assert disease in index.exact_matches(query)
+        assert index.exact_matches(query) == brute_exact(signatures, symptoms)
+        best, jaccard, overlap = index.rank(query, 1)[0]
+        assert jaccard == 1.0 and overlap == len(symptoms)
+
+
+def test_subsets_match_a_brute_force_scan(engine, signatures):
+    index = engine.signature_index
+    rng = random.Random(8)
+    for disease, symptoms in signatures.items():
+        subset = set(rng.sample(sorted(symptoms), rng.randint(1, len(symptoms))))
+        query = index.encode(subset)
+        exact = index.exact_matches(query)
+        assert disease in exact
+        assert exact == brute_exact(signatures, subset)
+        assert index.rank(query, 5) == brute_rank(signatures, subset, 5)
+        expected_mask = index.encode_diseases(d for d, s in signatures.items() if s & subset)
+        assert index.candidate_mask(query) == expected_mask
+
+
+def test_random_queries_match_a_brute_force_scan(engine, signatures):
+    index = engine.signature_index
+    rng = random.Random(80)
+    for _ in range(200):
+        query = set(rng.sample(engine.cols, rng.randint(1, 5)))
+        bits = index.encode(query)
+        assert index.exact_matches(bits) == brute_exact(signatures, query)
+        assert index.rank(bits, 5) == brute_rank(signatures, query, 5)
+
+
+def test_empty_query(engine, signatures):
+    index = engine.signature_index
+    assert index.encode([]) == 0
+    assert index.encode(['not_a_symptom']) == 0
+    # Every signature contains the empty set, but nothing overlaps it
+    assert index.exact_matches(0) == list(signatures)
+    assert index.rank(0) == []
+    assert index.candidate_mask(0) == 0
+    assert engine.suggest_followup_symptoms([]) == {
+        'matched_columns': [], 'exact_matches': [], 'candidates': [], 'ask_about': [],
+    }
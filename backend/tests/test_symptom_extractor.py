@@ -0,0 +1,47 @@
+import pytest
+
+from healthapp.symptom_extractor import NEGATION_WINDOW, SymptomExtractor
+
+
+@pytest.fixture(scope='module')
+def extractor():
+    return SymptomExtractor([{'fever': ['high_fever'], 'cough': ['cough'], 'headache': ['headache']}])
+
+
+@pytest.mark.parametrize('message, columns, negated', [
+    ('I have a fever and a cough', ('high_fever', 'cough'), ()),
+    ('I have a fever but no cough', ('high_fever',), ('cough',)),
+    ("I don't have a headache", (), ('headache',)),
+    ('I dont have a headache', (), ('headache',)),
+    ('without headache', (), ('headache',)),
+    ('denies fever. Headache since Monday', ('headache',), ('high_fever',)),
+    ('no fever or cough', (), ('high_fever', 'cough')),
+    ('not feverish', (), ('high_fever', 'mild_fever')),
+])
+def test_negation_scope(extractor, message, columns, negated):
+    extraction = extractor.extract(message)
+    assert extraction.columns == columns
+    assert extraction.negated == negated
+
+
+@pytest.mark.parametrize('message', ['no sleep, fever', 'no sleep but fever', 'no sleep and fever'])
+def test_punctuation_and_terminators_close_the_scope(extractor, message):
+    extraction = extractor.extract(message)
+    assert extraction.columns == ('high_fever',)
+    assert extraction.negated == ()
+
+
+def test_scope_ends_after_the_window(extractor):
+    filler = ' '.join(['really'] * NEGATION_WINDOW)
+    assert extractor.extract(f'no {filler} fever').columns == ('high_fever',)
+    assert extractor.extract(f"no {' '.join(['really'] * (NEGATION_WINDOW - 1))} fever").negated == ('high_fever',)
+
+
+def test_explicit_mention_overrides_denial(extractor):
+    extraction = extractor.extract('no fever earlier but I do have a fever now')
+    assert extraction.columns == ('high_fever',)
+    assert extraction.negated == ()
+
+
+def test_denied_symptoms_are_not_phrases(extractor):
+    assert extractor.extract('a cough but no fever').phrases == ('cough',)